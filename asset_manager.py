@@ -0,0 +1,258 @@
+"""
+Content-addressed store for the images pages reference.
+
+AssetManager.fetch_all() downloads the images of a page concurrently through
+the crawl's shared session and streams each one to
+ASSET_DIR/<first two hex digits>/<sha1><extension>, so an image used by many
+pages, or published under several URLs, is stored once. An index of the URLs
+fetched so far is kept in SQLite, so later pages and later crawls reuse an
+asset without downloading it again. Thumbnails are optionally made by Pillow
+in worker processes.
+"""
+import hashlib
+import importlib.util
+import mimetypes
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+import config
+from error_log import log_error
+from fetcher import FetchError, fetch_binary
+
+class Asset:
+    __slots__ = ('url', 'hash', 'path', 'content_type', 'size')
+
+    def __init__(self, url, hash, path, content_type, size):
+        self.url = url
+        self.hash = hash
+        self.path = path
+        self.content_type = content_type
+        self.size = size
+
+    def __repr__(self):
+        return f"Asset({self.url!r}, {self.path!r})"
+
+def extension_for(content_type):
+    """File extension for an image MIME type"""
+    if content_type == 'image/jpeg':
+        return '.jpg'
+    return mimetypes.guess_extension(content_type) or ''
+
+def make_thumbnail(source, target, size):
+    """Worker process: write a JPEG thumbnail of an image"""
+    from PIL import Image
+    with Image.open(source) as image:
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(target + '.part', 'JPEG', quality=config.ASSET_THUMBNAIL_QUALITY)
+    os.replace(target + '.part', target)
+    return target
+
+class AssetManager:
+    """
+    Downloads page images into a content-addressed directory.
+
+    Each URL is fetched at most once: concurrent requests for the same URL
+    share one download, and URLs already in the index are only looked up.
+    """
+
+    def __init__(self, session, directory=None, db_file=None):
+        self.session = session
+        self.directory = directory or config.ASSET_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_file or os.path.join(self.directory, 'assets.db'),
+                                    timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.Lock()
+        self.create_tables()
+
+        self.downloads = ThreadPoolExecutor(max_workers=config.ASSET_DOWNLOAD_WORKERS,
+                                            thread_name_prefix='asset-download')
+        self.thumbnails = None
+        self.thumbnail_jobs = []
+        self.thumbnail_targets = set()
+        if config.ASSET_THUMBNAILS and importlib.util.find_spec('PIL') is None:
+            log_error("Asset thumbnails disabled: Pillow is not installed", stage='assets')
+        elif config.ASSET_THUMBNAILS:
+            # Spawned, not forked: the crawl process is full of threads
+            self.thumbnails = ProcessPoolExecutor(max_workers=config.ASSET_THUMBNAIL_PROCESSES,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+        self.fetches = {}
+        self.stats = dict.fromkeys(('referenced', 'downloaded', 'reused', 'deduplicated',
+                                    'failed', 'bytes', 'thumbnails'), 0)
+
+    def create_tables(self):
+        """Create the URL index"""
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS assets (
+                    url TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    content_type TEXT,
+                    size INTEGER,
+                    fetched REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS assets_hash ON assets (hash)')
+            self.conn.commit()
+
+    def fetch_all(self, urls):
+        """
+        Fetch several images concurrently.
+
+        Args:
+            urls (list): Absolute image URLs; only the first
+                ASSET_MAX_PER_PAGE distinct http(s) URLs are fetched
+
+        Returns:
+            dict: url -> Asset for every image that was stored
+        """
+        urls = [url for url in dict.fromkeys(urls)
+                if url.startswith(('http://', 'https://'))][:config.ASSET_MAX_PER_PAGE]
+        with self.lock:
+            self.stats['referenced'] += len(urls)
+        futures = {url: self._future(url) for url in urls}
+        wait(futures.values())
+        return {url: future.result() for url, future in futures.items() if future.result()}
+
+    def fetch(self, url):
+        """Fetch one image, or return the stored asset; None if it could not be stored"""
+        return self._future(url).result()
+
+    def close(self):
+        """Wait for pending thumbnails and release the workers"""
+        self.downloads.shutdown()
+        if self.thumbnails is not None:
+            for job in self.thumbnail_jobs:
+                try:
+                    job.result()
+                    self.stats['thumbnails'] += 1
+                except Exception as e:
+                    log_error(f"Thumbnail failed: {e}", stage='assets', error=e)
+            self.thumbnails.shutdown()
+        self.conn.close()
+        return dict(self.stats)
+
+    def path_for(self, digest, content_type):
+        return os.path.join(self.directory, digest[:2], digest + extension_for(content_type))
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.directory, 'thumbs', digest + '.jpg')
+
+    def _future(self, url):
+        """The shared future of a URL's fetch, starting the fetch if needed"""
+        with self.lock:
+            future = self.fetches.get(url)
+            if future is not None:
+                self.stats['reused'] += 1
+                return future
+            future = self.fetches[url] = Future()
+        self.downloads.submit(self._fetch, url, future)
+        return future
+
+    def _fetch(self, url, future):
+        try:
+            asset = self._lookup(url)
+            if asset is None:
+                asset = self._download(url)
+            else:
+                with self.lock:
+                    self.stats['reused'] += 1
+            future.set_result(asset)
+        except FetchError:
+            self._count('failed')
+            future.set_result(None)
+        except Exception as e:
+            self._count('failed')
+            log_error(f"Asset download failed: {url} - {e}", url=url, stage='assets', error=e)
+            future.set_result(None)
+
+    def _lookup(self, url):
+        """The indexed asset of a URL, if its file is still there"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT hash, path, content_type, size FROM assets WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(row[1]):
+            return None
+        return Asset(url, *row)
+
+    def _download(self, url):
+        """Stream an image to a temporary file, then move it to its hashed path"""
+        digest = hashlib.sha1()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                def write(chunk):
+                    digest.update(chunk)
+                    f.write(chunk)
+                response = fetch_binary(self.session, url, config.ASSET_CONTENT_TYPES,
+                                        config.ASSET_MAX_BYTES, sink=write)
+                size = f.tell()
+
+            asset = Asset(url, digest.hexdigest(), None, response.content_type, size)
+            asset.path = self.path_for(asset.hash, asset.content_type)
+            if os.path.exists(asset.path):
+                self._count('deduplicated')
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(asset.path), exist_ok=True)
+                os.replace(temp_path, asset.path)
+                self._count('downloaded')
+                self._count('bytes', size)
+            self._thumbnail(asset)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO assets (url, hash, path, content_type, size, fetched) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (url, asset.hash, asset.path, asset.content_type, asset.size, time.time())
+            )
+            self.conn.commit()
+        return asset
+
+    def _thumbnail(self, asset):
+        """Queue a thumbnail for a raster image that does not have one yet"""
+        if self.thumbnails is None or asset.content_type == 'image/svg+xml':
+            return
+        target = self.thumbnail_path(asset.hash)
+        with self.lock:
+            if target in self.thumbnail_targets or os.path.exists(target):
+                return
+            self.thumbnail_targets.add(target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        job = self.thumbnails.submit(make_thumbnail, asset.path, target, config.ASSET_THUMBNAIL_SIZE)
+        with self.lock:
+            self.thumbnail_jobs.append(job)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+def link_assets(result, assets):
+    """
+    Point a page's image references at its stored assets.
+
+    Args:
+        result (PageResult): The page; its content is rewritten to refer to
+            the asset files and every stored image is listed in its assets
+        assets (dict): url -> Asset as returned by AssetManager.fetch_all()
+    """
+    base_url = result.final_url
+    for source in dict.fromkeys(result.images):
+        asset = assets.get(urljoin(base_url, source))
+        if asset is not None:
+            result.content = result.content.replace(f"]({source})", f"]({asset.path})")
+    result.assets = [asset.path for asset in dict((asset.hash, asset) for asset in assets.values()).values()]
@@ -0,0 +1,142 @@
+"""
+Benchmark of the pre-extraction content gate on a labelled corpus.
+
+Pages labelled "keep" are ones the crawl should save: synthetic-site pages
+of several sizes and real-world shapes the rules could trip over (short
+articles, articles about 404 errors or signing in, pages with a comment
+login form, script-heavy server-rendered pages, non-English and legacy
+charset pages). Pages labelled "reject" are soft-404s, login walls and
+paywalls, empty script shells and placeholder pages. The report gives the
+false-reject and false-accept rates with the default rules, which pages
+were misjudged, and the time the gate takes per page next to the time
+extraction takes (when trafilatura and BeautifulSoup are installed).
+
+Usage:
+    python benchmarks/content_gate_benchmark.py [repeat]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from content_validator import ContentValidator
+from synthetic_site import WORDS, SiteSpec, SyntheticSite
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def page(title, body, head='', lang='en', charset='utf-8'):
+    return (f'<!DOCTYPE html><html lang="{lang}"><head><meta charset="{charset}">'
+            f'<title>{title}</title>{head}</head><body>{body}</body></html>').encode(charset)
+
+def chrome(rng):
+    """Navigation and footer shared by every page of a site"""
+    nav = '<nav>' + ''.join(f'<a href="/{word}">{word.title()}</a> ' for word in WORDS[:12]) + '</nav>'
+    footer = f'<footer><p>{text(rng, 40)}</p><p>Copyright 2024 Example Ltd.</p></footer>'
+    return nav, footer
+
+def article(rng, title, paragraphs, extra=''):
+    nav, footer = chrome(rng)
+    body = ''.join(f'<p>{text(rng, 50)}</p>' for _ in range(paragraphs))
+    return page(title, f'{nav}<article><h1>{title}</h1>{body}{extra}</article>{footer}')
+
+def corpus(seed=42):
+    """(name, label, body) triples"""
+    rng = random.Random(seed)
+    pages = []
+    for page_bytes in (2000, 20000, 200000):
+        site = SyntheticSite(SiteSpec(pages=20, page_bytes=page_bytes, seed=seed))
+        pages += [(f'synthetic_{page_bytes}_{n}', 'keep', body) for n, body in enumerate(site.bodies)]
+
+    nav, footer = chrome(rng)
+    bundle = '<script>' + 'window.__chunk=function(){return 42};' * 2000 + '</script>'
+    state = json.dumps({'props': [text(rng, 30) for _ in range(3000)]})
+    pages += [
+        ('short_article', 'keep', page('Release notes', f'<h1>Release 2.1</h1><p>{text(rng, 25)}</p>')),
+        ('article_about_404', 'keep',
+         article(rng, 'How to fix 404 Not Found errors on your site', 12)),
+        ('article_about_login', 'keep', article(rng, 'Log in to your router: a guide', 10)),
+        ('comment_login_form', 'keep', article(
+            rng, 'Scheduling crawls', 8,
+            '<form><input name="user"><input type="password" name="pw"></form>')),
+        ('script_heavy_ssr', 'keep', page(
+            'Dashboard docs', f'{nav}<main><h1>Dashboard</h1>'
+            + ''.join(f'<p>{text(rng, 50)}</p>' for _ in range(6))
+            + f'</main>{bundle}<script id="__NEXT_DATA__" type="application/json">{state}</script>')),
+        ('german_article', 'keep', page(
+            'Über den Crawler', '<h1>Über den Crawler</h1>'
+            + ''.join(f'<p>Größe und Länge: {text(rng, 40)}</p>' for _ in range(5)), lang='de')),
+        ('legacy_charset', 'keep', page(
+            'Café menu', '<h1>Café</h1>' + ''.join(f'<p>Crème brûlée. {text(rng, 40)}</p>'
+                                                  for _ in range(4)), charset='windows-1252')),
+
+        ('soft_404_title', 'reject', page('Page Not Found | Example', f'{nav}<p>{text(rng, 30)}</p>{footer}')),
+        ('soft_404_numeric', 'reject', page('404 - Example', f'{nav}<h1>Oops</h1>{footer}')),
+        ('soft_404_heading', 'reject', page(
+            'Example', f'{nav}<h1>Sorry, we could not find that page</h1><p>Try the search.</p>{footer}')),
+        ('soft_404_gone', 'reject', page(
+            'Example store', f'{nav}<h1>This product page no longer exists</h1>{footer}')),
+        ('login_wall', 'reject', page(
+            'Sign in - Example', f'{nav}<h1>Welcome back</h1><form><input name="email">'
+            f'<input type="password" name="password"><button>Sign in</button></form>{footer}')),
+        ('paywall', 'reject', page(
+            'Example Times', f'{nav}<h1>Subscribe to continue reading</h1><p>{text(rng, 20)}</p>{footer}')),
+        ('spa_shell', 'reject', page('App', f'<div id="root"></div><noscript>Enable JavaScript.</noscript>{bundle}')),
+        ('redirect_placeholder', 'reject', page(
+            'Redirecting', '<p>Redirecting...</p>', head='<meta http-equiv="refresh" content="0;url=/new">')),
+        ('tiny', 'reject', b'<html><body>OK</body></html>'),
+        ('empty', 'reject', b''),
+    ]
+    return pages
+
+def time_extraction(pages, repeat):
+    """Seconds per page spent by the crawl's extraction, or None without its libraries"""
+    try:
+        import trafilatura
+        import main
+        from page_result import PageResult
+    except ImportError:
+        return None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, _label, body in pages:
+            html = body.decode('utf-8', 'replace')
+            main.extract_specific_data(html, PageResult(name))
+            trafilatura.extract(html, **main.TRAFILATURA_OPTIONS)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+def run(repeat):
+    pages = corpus()
+    gate = ContentValidator({'content_filters': config.CONTENT_GATE_RULES})
+    verdicts = {name: gate.precheck(body, f'https://example.com/{name}') for name, _label, body in pages}
+    keep = [name for name, label, _body in pages if label == 'keep']
+    reject = [name for name, label, _body in pages if label == 'reject']
+    false_rejects = {name: verdicts[name] for name in keep if verdicts[name] is not None}
+    false_accepts = [name for name in reject if verdicts[name] is None]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, _label, body in pages:
+            gate.precheck(body, f'https://example.com/{name}')
+    gate_seconds = (time.perf_counter() - start) / (repeat * len(pages))
+    extract_seconds = time_extraction(pages, max(1, repeat // 10))
+
+    return {
+        'pages': {'keep': len(keep), 'reject': len(reject)},
+        'false_reject_rate': round(len(false_rejects) / len(keep), 4),
+        'false_accept_rate': round(len(false_accepts) / len(reject), 4),
+        'false_rejects': false_rejects,
+        'false_accepts': false_accepts,
+        'reasons': {name: verdicts[name] for name in reject},
+        'gate_ms_per_page': round(gate_seconds * 1000, 4),
+        'extraction_ms_per_page': round(extract_seconds * 1000, 3) if extract_seconds else None,
+        'corpus_bytes': sum(len(body) for _name, _label, body in pages),
+    }
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(json.dumps(run(repeat), indent=2))
@@ -0,0 +1,233 @@
+"""
+End-to-end crawl benchmark against a synthetic local site.
+
+Starts a seeded synthetic site (see synthetic_site.py) in a separate
+process, crawls it with one of the crawl engines and reports throughput,
+CPU time per page, peak memory, the number of requests the server saw and
+whether every reachable page was saved with its marker sentence. The same
+seed and parameters always produce the same site, so results can be
+compared between commits.
+
+Usage:
+    python benchmarks/crawl_benchmark.py [--pages 200] [--fanout 5] [--page-kb 20]
+        [--latency-ms 0] [--error-rate 0] [--duplicate-rate 0] [--seed 42] [--hosts 1]
+        [--workers 4] [--engine threads|sharded|distributed] [--processes 2]
+        [--output results.json]
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import requests
+import config
+from synthetic_site import SiteSpec, SyntheticSite, serve
+
+def run_threads(start_url, max_depth, output_dir, options):
+    """Crawl with the threaded engine in main.main()"""
+    import main
+    main.main(start_url, max_depth=max_depth, incremental=False)
+
+def run_sharded(start_url, max_depth, output_dir, options):
+    """Crawl with host-sharded processes (main.main(processes=N))"""
+    import main
+    main.main(start_url, max_depth=max_depth, incremental=False, processes=options.processes)
+
+def run_distributed(start_url, max_depth, output_dir, options):
+    """Crawl with a local coordinator and worker processes talking to it over HTTP"""
+    import distributed
+    coordinator = distributed.CrawlCoordinator(os.path.join(output_dir, 'coordinator.db'))
+    coordinator.seed(start_url, max_depth)
+    server = distributed.start_server(coordinator, '127.0.0.1', 0)
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+    processes = [
+        multiprocessing.Process(target=distributed_worker, args=(address, output_dir, options.workers))
+        for _ in range(options.processes)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+        coordinator.close()
+
+def distributed_worker(address, output_dir, workers):
+    """Worker process target for run_distributed"""
+    import distributed
+    configure(output_dir, workers)
+    config.INCREMENTAL_CRAWL = False
+    with contextlib.redirect_stdout(sys.stderr):
+        distributed.run_worker(distributed.connect(address))
+
+# Crawl engines that can be benchmarked, by name
+ENGINES = {
+    'threads': run_threads,
+    'sharded': run_sharded,
+    'distributed': run_distributed,
+}
+
+def configure(output_dir, workers):
+    """Point the crawler at a scratch directory and remove politeness waits"""
+    config.OUTPUT_DIR = output_dir
+    config.MAX_WORKERS = workers
+    config.REQUEST_DELAY = 0
+    config.BACKOFF_FACTOR = 0.01
+    config.TAKE_SCREENSHOTS = False
+    config.INSTRUMENTATION_ENABLED = False
+    # Every origin of a multi-host site is on 127.0.0.1
+    config.URL_FILTER_RULES = dict(config.URL_FILTER_RULES, allowed_domains=['127.0.0.1'])
+
+def check_extraction(site, pages, output_dir):
+    """Count reachable pages whose saved markdown contains their marker"""
+    from main import create_filename
+    saved = correct = 0
+    for page in pages:
+        url = site.url(page)
+        file_name = os.path.join(output_dir, create_filename(url) + config.MARKDOWN_EXTENSION)
+        if not os.path.exists(file_name):
+            continue
+        saved += 1
+        with open(file_name, encoding='utf-8') as f:
+            if site.marker(site.canonical[page]) in f.read():
+                correct += 1
+    return saved, correct
+
+def cpu_seconds():
+    """CPU time of this process and of its finished child processes"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def peak_rss_mb():
+    """Peak RSS of this process or of its largest finished child process"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@contextlib.contextmanager
+def stdout_to_stderr():
+    """
+    Send stdout to stderr, for this process and every process it starts.
+
+    The descriptor itself is redirected, not just sys.stdout, because
+    spawned crawl processes write to the descriptor they inherit.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+def run(spec, engine='threads', workers=4, max_depth=None, processes=2):
+    site = SyntheticSite(spec)
+    if max_depth is None:
+        max_depth = site.tree_depth()
+    expected = site.reachable(max_depth)
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(target=serve, args=(spec, sender), daemon=True)
+    server.start()
+    site.origins = [f"http://127.0.0.1:{port}" for port in receiver.recv()]
+    output_dir = tempfile.mkdtemp(prefix='crawl_benchmark_')
+
+    try:
+        configure(output_dir, workers)
+        # Keep stdout for the JSON report
+        with stdout_to_stderr():
+            options = argparse.Namespace(workers=workers, processes=processes)
+            cpu_start = cpu_seconds()
+            start = time.perf_counter()
+            ENGINES[engine](site.url(0), max_depth, output_dir, options)
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds() - cpu_start
+
+        stats = requests.get(f"{site.origins[0]}/__stats", timeout=10).json()
+        saved, correct = check_extraction(site, expected, output_dir)
+    finally:
+        server.terminate()
+        server.join()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'engine': engine,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'site': spec.as_dict(),
+        'workers': workers,
+        'processes': processes if engine != 'threads' else 1,
+        'max_depth': max_depth,
+        'pages_expected': len(expected),
+        'pages_saved': saved,
+        'pages_correct': correct,
+        'extraction_correctness': round(correct / len(expected), 4) if expected else None,
+        'seconds': round(elapsed, 3),
+        'pages_per_second': round(saved / elapsed, 2) if elapsed else None,
+        'cpu_seconds_per_page': round(cpu / saved, 5) if saved else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'requests': stats['requests'],
+        'requests_by_status': stats['by_status'],
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Crawl a synthetic local site and report performance')
+    parser.add_argument('--pages', type=int, default=200, help='pages on the site')
+    parser.add_argument('--fanout', type=int, default=5, help='links per page')
+    parser.add_argument('--page-kb', type=float, default=20, help='approximate HTML size per page')
+    parser.add_argument('--latency-ms', type=float, default=0, help='server delay per response')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='share of pages answering 503 to their first request')
+    parser.add_argument('--duplicate-rate', type=float, default=0,
+                        help='share of pages that are byte-identical copies of another page')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--hosts', type=int, default=1, help='origins the pages are spread over')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='crawl threads per process (config.MAX_WORKERS)')
+    parser.add_argument('--processes', type=int, default=2,
+                        help='worker processes for multi-process engines')
+    parser.add_argument('--max-depth', type=int, help='crawl depth (default: deep enough for every page)')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='threads')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    spec = SiteSpec(pages=args.pages, fanout=args.fanout, page_bytes=int(args.page_kb * 1024),
+                    latency=args.latency_ms / 1000, error_rate=args.error_rate,
+                    duplicate_rate=args.duplicate_rate, seed=args.seed, hosts=args.hosts)
+    report = json.dumps(run(spec, args.engine, args.workers, args.max_depth, args.processes), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
@@ -0,0 +1,116 @@
+"""
+Benchmark of the database reports against full scans of the stored pages.
+
+Saves page versions of a crawl history to a fresh database: hosts of
+different sizes, a month of days, a mix of HTTP statuses, refetches of
+the same URLs and boilerplate pages shared by many URLs. After each batch
+it times the reports, which read the aggregate tables kept up to date by
+the triggers, next to the same reports computed by scanning page_versions,
+and checks that both give the same answer. The report times should stay
+flat as the database grows while the scans grow with it.
+
+Usage:
+    python benchmarks/database_benchmark.py [--versions 20000 100000 200000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+from synthetic_site import WORDS
+
+STATUSES = [200] * 90 + [301] * 3 + [404] * 5 + [500] * 2
+
+SCANS = {
+    'host_report': '''
+        SELECT h.name, COUNT(*), SUM(v.bytes)
+        FROM page_versions v JOIN urls u ON u.id = v.url_id JOIN hosts h ON h.id = u.host_id
+        GROUP BY h.id ORDER BY COUNT(*) DESC, h.name
+    ''',
+    'daily_report': '''
+        SELECT date(fetched_at), COUNT(*), SUM(bytes) FROM page_versions
+        GROUP BY date(fetched_at) ORDER BY date(fetched_at)
+    ''',
+    'status_report': '''
+        SELECT COALESCE(status, 0), COUNT(*) FROM page_versions
+        GROUP BY COALESCE(status, 0) ORDER BY COALESCE(status, 0)
+    ''',
+    'top_duplicates': '''
+        SELECT content_hash, COUNT(DISTINCT url_id), COUNT(*) FROM page_versions
+        GROUP BY content_hash HAVING COUNT(DISTINCT url_id) > 1
+        ORDER BY COUNT(DISTINCT url_id) DESC LIMIT 10
+    ''',
+}
+
+def page_versions(count, seed=1):
+    """(url, content, metadata, status, size, fetched_at) tuples of a crawl history"""
+    rng = random.Random(seed)
+    hosts = [f'site{n}.example' for n in range(50)]
+    weights = [1 / (n + 1) for n in range(len(hosts))]
+    boilerplate = [f'Boilerplate page {n}: ' + ' '.join(WORDS[:40]) for n in range(20)]
+    for n in range(count):
+        host = rng.choices(hosts, weights)[0]
+        url = f'https://{host}/page/{rng.randrange(count // 4 + 1)}'
+        if rng.random() < 0.1:
+            content = rng.choice(boilerplate)
+        else:
+            content = f'{url} {n} ' + ' '.join(rng.choice(WORDS) for _ in range(30))
+        fetched_at = f'2024-03-{rng.randint(1, 30):02d} {rng.randrange(24):02d}:00:00'
+        size = rng.randint(5000, 200000)
+        yield url, content, {'title': url, 'words': 30}, rng.choice(STATUSES), size, fetched_at
+
+def timed(function, repeat=5):
+    """Result of the function and its fastest time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, round(best * 1000, 3)
+
+def reports(db):
+    results = {}
+    for name in SCANS:
+        report, report_ms = timed(getattr(db, name))
+        scan, scan_ms = timed(lambda: db.conn.execute(SCANS[name]).fetchall())
+        if name == 'top_duplicates':
+            report = sorted(row[:3] for row in report)
+            scan = sorted(scan)
+        results[name] = {'report_ms': report_ms, 'scan_ms': scan_ms, 'same': report == scan}
+    return results
+
+def run(sizes):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        with DatabaseManager(os.path.join(directory, 'benchmark.db')) as db:
+            crawl_id = db.start_crawl('https://site0.example/')
+            versions = page_versions(max(sizes))
+            saved = 0
+            for size in sorted(sizes):
+                before = saved
+                start = time.perf_counter()
+                for url, content, metadata, status, page_bytes, fetched_at in versions:
+                    db.save_result(url, content, metadata, status, page_bytes, crawl_id, fetched_at)
+                    saved += 1
+                    if saved == size:
+                        break
+                seconds = time.perf_counter() - start
+                results.append({
+                    'versions': saved,
+                    'insert_us_per_version': round(seconds / (saved - before) * 1e6, 1),
+                    'reports': reports(db),
+                })
+            db.finish_crawl(crawl_id)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the database reports")
+    parser.add_argument('--versions', type=int, nargs='+', default=[20000, 100000, 200000])
+    args = parser.parse_args()
+    print(json.dumps(run(args.versions), indent=2))
@@ -0,0 +1,161 @@
+"""
+Benchmark of the streaming HTML parser against the BeautifulSoup tree.
+
+First checks that html_stream gives the same results as the tree path:
+extract_specific_data() fields and ContentValidator.clean_html() markup
+on a corpus of synthetic-site pages, the content gate corpus, pages full
+of markup the tree rules treat specially (unclosed and stray tags, void
+elements, entities, whitespace, script and ruby text, CDATA) and the large
+pages below. Then measures, with tracemalloc, the peak memory of each path
+on a giant table and an infinite-scroll dump of growing size, next to the
+memory the results themselves take.
+
+Usage:
+    python benchmarks/html_stream_benchmark.py [--sizes-mb 1 4]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from content_validator import ContentValidator
+from page_result import PageResult
+import html_stream
+from synthetic_site import WORDS, SiteSpec, SyntheticSite
+from content_gate_benchmark import corpus as gate_corpus
+
+FIELDS = ('metadata', 'headings', 'paragraphs', 'tables', 'lists', 'images', 'links')
+
+QUIRKS = [
+    '<p>unclosed <p>paragraphs <div>and</p> stray</span> end tags<li>outside a list',
+    '<ul><li>one<li>two<ul><li>nested</ul><li>three</ul><ol><li></ol>',
+    '<table><tr><td>a<td>b<tr><th>c</th><td><table><tr><td>inner</table></td></table>',
+    '<h1>Title <b>bold</b>&nbsp;&amp;&copy &#150; &#x41; &#129; &unknown; x</h1>',
+    '<p>a<script>var x = "<p>";</script><!-- c -->b<ruby>k<rt>r</rt><rp>(</rp></ruby><![CDATA[cd]]></p>',
+    '<pre>  keep\n  spaces </pre><p>   </p><p>\n\n</p><textarea> t </textarea>',
+    '<img src="a.png"><img src><br><p>after<img src="b.png"/>inside<br/>text</p>',
+    '<title>First</title><title>Second</title><meta name="description" content="d">'
+    '<meta name="description" content="ignored"><meta name="author">',
+    '<!DOCTYPE html><?xml version="1.0"?><!weird><template><p>template</p></template>',
+    '<a href="/x?a=1&amp;b=2" class=" a  b ">link</a><a HREF=UP rel="nofollow  me">up</a>'
+    '<meta charset=latin1><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1">',
+    '<iframe><p>framed</p></iframe><noscript><img src="n.png"></noscript><style>p{}</style>',
+    "<p title='say \"hi\"' data-x=\"it's\">quotes</p><p id=1 id=2>dupes</p>",
+]
+
+def giant_table(size_bytes, seed=1):
+    """One table of many rows, like a data dump"""
+    rng = random.Random(seed)
+    parts = ['<html><head><title>Table dump</title></head><body><h1>Dump</h1><table>',
+             '<tr><th>id</th><th>name</th><th>value</th><th>note</th></tr>']
+    size, row = 0, 0
+    while size < size_bytes:
+        cells = (row, rng.choice(WORDS), rng.random(), ' '.join(rng.choice(WORDS) for _ in range(6)))
+        part = '<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>\n'
+        parts.append(part)
+        size += len(part)
+        row += 1
+    parts.append('</table></body></html>')
+    return ''.join(parts)
+
+def scroll_dump(size_bytes, seed=2):
+    """Cards of an infinite-scroll page, saved after scrolling for a long time"""
+    rng = random.Random(seed)
+    parts = ['<html><head><title>Feed</title><meta name="description" content="Feed"></head><body><main>']
+    size, card = 0, 0
+    while size < size_bytes:
+        text = ' '.join(rng.choice(WORDS) for _ in range(30))
+        part = (f'<article class="card"><h3><a href="/post/{card}">Post {card}</a></h3>'
+                f'<img src="/img/{card}.jpg" alt=""><p>{text}</p>'
+                f'<ul class="tags"><li>{rng.choice(WORDS)}</li><li>{rng.choice(WORDS)}</li></ul>'
+                f'<div class="meta"><span>{card} likes</span> &middot; <span>2 days ago</span></div>'
+                f'</article>\n')
+        parts.append(part)
+        size += len(part)
+        card += 1
+    parts.append('</main></body></html>')
+    return ''.join(parts)
+
+def tree_extract(html):
+    import main
+    threshold, config.STREAM_PARSE_THRESHOLD = config.STREAM_PARSE_THRESHOLD, float('inf')
+    try:
+        return main.extract_specific_data(html, PageResult('page'))
+    finally:
+        config.STREAM_PARSE_THRESHOLD = threshold
+
+def stream_extract(html):
+    return html_stream.PageParser(PageResult('page')).parse(html)
+
+def tree_clean(html):
+    threshold, config.STREAM_PARSE_THRESHOLD = config.STREAM_PARSE_THRESHOLD, float('inf')
+    try:
+        return ContentValidator({}).clean_html(html)
+    finally:
+        config.STREAM_PARSE_THRESHOLD = threshold
+
+def differences(tree, stream):
+    """Names of the PageResult fields that differ; the timestamps always do"""
+    different = [name for name in FIELDS[1:] if getattr(tree, name) != getattr(stream, name)]
+    if dict(tree.metadata, timestamp=None) != dict(stream.metadata, timestamp=None):
+        different.insert(0, 'metadata')
+    return different
+
+def check_corpus(pages):
+    mismatches = {}
+    for name, html in pages:
+        different = differences(tree_extract(html), stream_extract(html))
+        if tree_clean(html) != html_stream.clean_html(html):
+            different.append('clean_html')
+        if different:
+            mismatches[name] = different
+    return {'pages': len(pages), 'mismatches': mismatches}
+
+def measure(function, html):
+    """Time of one call, then its peak traced memory and the memory its result holds"""
+    gc.collect()
+    start = time.perf_counter()
+    function(html)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = function(html)
+    gc.collect()  # the tree has reference cycles
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'peak_mb': round(peak / 2**20, 1), 'results_mb': round(held / 2**20, 1),
+            'seconds': round(seconds, 2)}
+
+def run(sizes_mb):
+    site = SyntheticSite(SiteSpec(pages=30, page_bytes=20000))
+    pages = [(f'synthetic_{n}', body.decode('utf-8')) for n, body in enumerate(site.bodies)]
+    pages += [(name, body.decode('utf-8', 'replace')) for name, _label, body in gate_corpus()]
+    pages += [(f'quirks_{n}', html) for n, html in enumerate(QUIRKS)]
+    pages.append(('all_quirks', ''.join(QUIRKS)))
+    pages += [('giant_table', giant_table(512 * 1024)), ('scroll_dump', scroll_dump(512 * 1024))]
+
+    results = {'parity': check_corpus(pages), 'memory': []}
+    for shape, generate in (('giant_table', giant_table), ('scroll_dump', scroll_dump)):
+        for size in sizes_mb:
+            html = generate(int(size * 2**20))
+            results['memory'].append({
+                'page': shape,
+                'page_mb': round(len(html) / 2**20, 1),
+                'tree': measure(tree_extract, html),
+                'stream': measure(stream_extract, html),
+            })
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark streaming HTML extraction")
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes_mb), indent=2))
@@ -0,0 +1,192 @@
+"""
+Benchmark of screenshot deduplication on pages that share a template.
+
+Renders 1920x1080 captures of a news-style site with PIL: the same header,
+navigation, sidebar and footer on every page around different content.
+Distinct pages are articles with different text and product pages on one
+layout that differ only in their name and price; none of them may reuse
+another's screenshot. Near-duplicates are re-captures of stored pages: the
+same render, a changed "updated" clock and a blinking caret in the search
+box; each must reuse its original. Captures are encoded as WebP, like
+Chrome's, and go through screenshots.encode(), candidates() and
+find_duplicate() in corpus order. The report gives wrong merges and missed
+merges for the current rules and for the former 64-bit dHash within 4 bits,
+and the time the hash and the pixel comparison take per capture.
+
+Usage:
+    python benchmarks/screenshot_dedup_benchmark.py [--articles 12] [--products 8]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+import config
+import screenshots
+from synthetic_site import WORDS
+
+WIDTH, HEIGHT = 1920, 1080
+
+def font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        return ImageFont.load_default()  # bitmap font of Pillow < 10.1
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def wrap(draw, text, typeface, width):
+    lines, line = [], ''
+    for word in text.split():
+        candidate = f'{line} {word}'.strip()
+        if draw.textlength(candidate, font=typeface) > width and line:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    return lines + [line]
+
+def render(headline, blocks, clock='09:30', caret=False):
+    """
+    One capture of the site template.
+
+    Args:
+        headline (str): Page heading
+        blocks (list): Paragraph texts of the main column
+        clock (str): Time in the "updated" line under the heading
+        caret (bool): Draw the text caret in the search box
+
+    Returns:
+        bytes: The capture as WebP
+    """
+    image = Image.new('RGB', (WIDTH, HEIGHT), 'white')
+    draw = ImageDraw.Draw(image)
+    small, body, large = font(16), font(19), font(40)
+    draw.rectangle((0, 0, WIDTH, 90), fill='#1d3557')
+    draw.text((60, 25), 'The Example Chronicle', font=font(34), fill='white')
+    for n, word in enumerate(WORDS[:8]):
+        draw.text((760 + n * 110, 35), word.title(), font=small, fill='#f1faee')
+    draw.rectangle((1560, 30, 1860, 62), fill='white')
+    draw.text((1572, 37), 'Search', font=small, fill='#999999')
+    if caret:
+        draw.line((1632, 35, 1632, 58), fill='black', width=2)
+
+    draw.rectangle((1400, 130, 1860, 1000), fill='#f1f1f1')
+    draw.text((1425, 150), 'Most read', font=font(24), fill='#1d3557')
+    for n in range(12):
+        draw.text((1425, 200 + n * 40), ' '.join(WORDS[n:n + 4]).title(), font=small, fill='#457b9d')
+
+    draw.text((120, 130), headline, font=large, fill='#111111')
+    draw.text((120, 190), f'By Staff Writer  |  Updated {clock}', font=small, fill='#666666')
+    y = 240
+    for block in blocks:
+        for line in wrap(draw, block, body, 1200):
+            if y > 980:
+                break
+            draw.text((120, y), line, font=body, fill='#222222')
+            y += 28
+        y += 18
+
+    draw.rectangle((0, 1020, WIDTH, HEIGHT), fill='#333333')
+    draw.text((60, 1040), 'Copyright 2024 Example Chronicle', font=small, fill='#cccccc')
+    output = io.BytesIO()
+    image.save(output, 'WEBP', quality=config.SCREENSHOT_QUALITY, method=4)
+    return output.getvalue()
+
+def corpus(articles, products, seed=7):
+    """(name, original, capture) triples; original names the capture it duplicates, or None"""
+    rng = random.Random(seed)
+    pages = []
+    texts = {}
+    for n in range(articles):
+        headline = sentence(rng, rng.randint(4, 8))[:-1]
+        blocks = [sentence(rng, rng.randint(30, 90)) for _ in range(rng.randint(2, 7))]
+        texts[f'article_{n}'] = (headline, blocks)
+        pages.append((f'article_{n}', None, render(headline, blocks)))
+    # One layout, one description: only the product name and price differ
+    description = [sentence(rng, 60), sentence(rng, 40)]
+    for n in range(products):
+        name = f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {n + 2}00'
+        pages.append((f'product_{n}', None, render(name, [f'Price: {rng.randint(10, 99)}.99'] + description)))
+
+    for n in range(min(articles, 4)):
+        headline, blocks = texts[f'article_{n}']
+        pages.append((f'article_{n}_again', f'article_{n}', render(headline, blocks)))
+        pages.append((f'article_{n}_clock', f'article_{n}', render(headline, blocks, clock='10:45')))
+        pages.append((f'article_{n}_caret', f'article_{n}', render(headline, blocks, caret=True)))
+    return pages
+
+def old_dhash(data):
+    """The former fingerprint: 64-bit dHash of a 9x8 thumbnail"""
+    with Image.open(io.BytesIO(data)) as image:
+        return screenshots.dhash(image, 8)
+
+def old_rules(pages):
+    """Which stored capture each page would have reused under the former rules"""
+    stored, reused = [], {}
+    for name, _original, data in pages:
+        value = old_dhash(data)
+        match = next((kept for kept, hash_value in stored
+                      if bin(hash_value ^ value).count('1') <= 4), None)
+        if match is None:
+            stored.append((name, value))
+        reused[name] = match
+    return reused
+
+def current_rules(pages, directory):
+    """Which stored capture each page reuses, and the seconds spent hashing and comparing"""
+    screenshots._index.clear()
+    reused, hashing, comparing = {}, 0.0, 0.0
+    for name, _original, data in pages:
+        start = time.perf_counter()
+        _encoded, value = screenshots.encode(data, 'webp', 'webp', config.SCREENSHOT_QUALITY, True)
+        hashing += time.perf_counter() - start
+        start = time.perf_counter()
+        paths = screenshots.candidates('example.com', value)[:screenshots.MAX_CONFIRMATIONS]
+        match = paths and screenshots.find_duplicate(data, paths, config.SCREENSHOT_DEDUP_MAX_CHANGED)
+        comparing += time.perf_counter() - start
+        if match:
+            reused[name] = os.path.splitext(os.path.basename(match))[0]
+        else:
+            path = os.path.join(directory, name + '.webp')
+            with open(path, 'wb') as f:
+                f.write(data)
+            screenshots.remember('example.com', value, path)
+            reused[name] = None
+    screenshots._index.clear()
+    return reused, hashing, comparing
+
+def score(pages, reused):
+    wrong = {name: reused[name] for name, original, _ in pages
+             if reused[name] is not None and reused[name] != original}
+    missed = [name for name, original, _ in pages if original is not None and reused[name] != original]
+    return {'wrong_merges': wrong, 'missed_merges': missed}
+
+def run(articles, products):
+    pages = corpus(articles, products)
+    with tempfile.TemporaryDirectory() as directory:
+        reused, hashing, comparing = current_rules(pages, directory)
+    return {
+        'captures': len(pages),
+        'distinct': sum(original is None for _, original, _ in pages),
+        'near_duplicates': sum(original is not None for _, original, _ in pages),
+        'current': dict(score(pages, reused),
+                        hash_ms_per_capture=round(hashing / len(pages) * 1000, 2),
+                        compare_ms_per_capture=round(comparing / len(pages) * 1000, 2)),
+        'former_64_bit_dhash': score(pages, old_rules(pages)),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark screenshot deduplication")
+    parser.add_argument('--articles', type=int, default=12)
+    parser.add_argument('--products', type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(run(args.articles, args.products), indent=2))
@@ -0,0 +1,99 @@
+"""
+Startup-time benchmark for the CLI and the GUI.
+
+Measures, in fresh interpreters, the wall time of `python main.py --help`
+and the time until the GUI window has been drawn, and checks that importing
+main.py and gui.py does not load any of the heavy optional packages. Exits
+with status 1 when a budget is exceeded or a heavy package is imported
+eagerly, so it can gate a CI job.
+
+The GUI measurement is skipped when no display is available.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--help-budget 0.3] [--gui-budget 1.5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must only be imported once a crawl or a plugin needs them
+LAZY_PACKAGES = ('requests', 'urllib3', 'trafilatura', 'lxml', 'bs4', 'tqdm',
+                 'selenium', 'PIL', 'sklearn', 'pytesseract')
+
+GUI_SNIPPET = """
+import tkinter as tk
+from gui import ScraperGUI
+root = tk.Tk()
+ScraperGUI(root)
+root.update()
+print('ready', flush=True)
+root.destroy()
+"""
+
+IMPORT_SNIPPET = """
+import json, sys
+import main
+try:
+    import gui
+except ImportError:  # no tkinter
+    pass
+print(json.dumps(sorted(name for name in {packages} if name in sys.modules)))
+"""
+
+def time_command(args, runs):
+    """Median and worst wall time of a command over several runs"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(args, cwd=ROOT, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1:] or ['failed']
+    return {'median': round(statistics.median(timings), 4), 'max': round(max(timings), 4)}, None
+
+def eager_imports():
+    snippet = IMPORT_SNIPPET.format(packages=repr(LAZY_PACKAGES))
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+def run(runs, help_budget, gui_budget):
+    report = {'python': sys.version.split()[0], 'runs': runs, 'failures': []}
+
+    report['main_help'], error = time_command([sys.executable, 'main.py', '--help'], runs)
+    if error:
+        report['failures'].append(f"main.py --help failed: {error[0]}")
+    elif report['main_help']['median'] > help_budget:
+        report['failures'].append(
+            f"main.py --help took {report['main_help']['median']}s, budget {help_budget}s")
+
+    report['gui_window'], error = time_command([sys.executable, '-c', GUI_SNIPPET], runs)
+    if error:
+        report['gui_window'] = f"skipped: {error[0]}"
+    elif report['gui_window']['median'] > gui_budget:
+        report['failures'].append(
+            f"GUI window took {report['gui_window']['median']}s, budget {gui_budget}s")
+
+    report['eager_imports'] = eager_imports()
+    if report['eager_imports']:
+        report['failures'].append(f"imported at startup: {', '.join(report['eager_imports'])}")
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure CLI and GUI startup time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--help-budget', type=float, default=0.3,
+                        help='seconds allowed for `python main.py --help`')
+    parser.add_argument('--gui-budget', type=float, default=1.5,
+                        help='seconds allowed until the GUI window is drawn')
+    args = parser.parse_args()
+
+    report = run(args.runs, args.help_budget, args.gui_budget)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report['failures'] else 0)
@@ -0,0 +1,212 @@
+"""
+Synthetic website served from a local HTTP server for crawl benchmarks.
+
+The site is a reproducible page graph derived from a seed: every page links
+to its children in a tree (so every page is reachable from "/") plus random
+cross links, carries a unique marker sentence used to check extraction, and
+is padded with filler paragraphs up to the requested weight. Some pages are
+byte-for-byte copies of another page and some answer 503 on their first
+request, to exercise duplicate handling and retries. With several hosts the
+pages are spread over that many origins (one port each) and links between
+them are absolute, so host-sharded crawling can be measured.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ('crawler frontier latency throughput parser markdown extract archive index '
+         'document network request response header table heading paragraph image '
+         'metadata sitemap robots schedule worker thread queue buffer stream cache').split()
+
+class SiteSpec:
+    """Parameters of a synthetic site"""
+
+    __slots__ = ('pages', 'fanout', 'page_bytes', 'latency', 'error_rate',
+                 'duplicate_rate', 'seed', 'hosts')
+
+    def __init__(self, pages=200, fanout=5, page_bytes=20000, latency=0.0,
+                 error_rate=0.0, duplicate_rate=0.0, seed=42, hosts=1):
+        self.pages = pages
+        self.fanout = fanout
+        self.page_bytes = page_bytes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self.hosts = hosts
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class SyntheticSite:
+    """The page graph and HTML of a SiteSpec, generated up front"""
+
+    def __init__(self, spec, origins=None):
+        self.spec = spec
+        self.origins = origins
+        rng = random.Random(spec.seed)
+        self.links = []
+        self.canonical = []
+        self.flaky = set()
+        for page in range(spec.pages):
+            children = [c for c in range(page * spec.fanout + 1, (page + 1) * spec.fanout + 1)
+                        if c < spec.pages]
+            extra = [rng.randrange(spec.pages) for _ in range(spec.fanout - len(children))]
+            self.links.append(children + extra)
+            if page and rng.random() < spec.duplicate_rate:
+                self.canonical.append(rng.randrange(page))
+            else:
+                self.canonical.append(page)
+            if page and rng.random() < spec.error_rate:
+                self.flaky.add(page)
+        self.bodies = [self.render(self.canonical[page]) for page in range(spec.pages)]
+
+    @staticmethod
+    def path(page):
+        return '/' if page == 0 else f'/page/{page}'
+
+    def host_of(self, page):
+        return page % self.spec.hosts
+
+    def url(self, page):
+        """Absolute URL of a page; needs the origins the site is served on"""
+        return self.origins[self.host_of(page)] + self.path(page)
+
+    def href(self, page, source):
+        """Link from `source` to `page`, absolute if the page is on another host"""
+        if self.host_of(page) == self.host_of(source) or not self.origins:
+            return self.path(page)
+        return self.url(page)
+
+    @staticmethod
+    def marker(page):
+        """Sentence that must survive extraction of a page"""
+        return f'Synthetic page marker {page:06d} for extraction checks.'
+
+    def render(self, page):
+        rng = random.Random(self.spec.seed * 1000003 + page)
+        parts = [
+            '<!DOCTYPE html><html><head><meta charset="utf-8">',
+            f'<title>Synthetic page {page}</title>',
+            f'<meta name="description" content="Benchmark page {page}"></head><body>',
+            '<nav>', *(f'<a href="{self.href(link, page)}">Page {link}</a> ' for link in self.links[page]),
+            '</nav><article>',
+            f'<h1>Synthetic page {page}</h1>',
+            f'<p>{self.marker(page)}</p>'
+        ]
+        size = sum(len(part) for part in parts)
+        section = 0
+        while size < self.spec.page_bytes:
+            if section % 4 == 0:
+                heading = f'<h2>Section {section} of page {page}</h2>'
+                parts.append(heading)
+                size += len(heading)
+            paragraph = (f'<p>Paragraph {section} of page {page}: '
+                         + ' '.join(rng.choice(WORDS) for _ in range(60)) + '.</p>')
+            parts.append(paragraph)
+            size += len(paragraph)
+            section += 1
+        parts.append('</article></body></html>')
+        return ''.join(parts).encode('utf-8')
+
+    def page_for_path(self, path):
+        if path == '/':
+            return 0
+        if path.startswith('/page/') and path[6:].isdigit():
+            page = int(path[6:])
+            if page < self.spec.pages:
+                return page
+        return None
+
+    def reachable(self, max_depth):
+        """Pages a crawl from "/" limited to max_depth should save"""
+        depths = {0: 0}
+        pending = deque([0])
+        while pending:
+            page = pending.popleft()
+            if depths[page] >= max_depth:
+                continue
+            # A duplicate serves its canonical page's HTML, links included
+            for link in self.links[self.canonical[page]]:
+                if link not in depths:
+                    depths[link] = depths[page] + 1
+                    pending.append(link)
+        return sorted(depths)
+
+    def tree_depth(self):
+        """Depth needed for the tree links alone to reach every page"""
+        depth, last = 0, 0
+        while last < self.spec.pages - 1:
+            last = last * self.spec.fanout + self.spec.fanout
+            depth += 1
+        return depth
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        site = self.server.site
+        path = self.path.split('?', 1)[0]
+        if path == '/__stats':
+            with self.server.lock:
+                body = json.dumps({'requests': sum(self.server.requests.values()),
+                                   'by_status': dict(self.server.requests)}).encode('utf-8')
+            self.respond(200, body, 'application/json')
+            return
+
+        if site.spec.latency:
+            time.sleep(site.spec.latency)
+        page = site.page_for_path(path)
+        with self.server.lock:
+            first_request = page not in self.server.served
+            self.server.served.add(page)
+        if page is None:
+            self.respond(404, b'Not found', 'text/plain')
+        elif page in site.flaky and first_request:
+            self.respond(503, b'Try again', 'text/plain', {'Retry-After': '0'})
+        else:
+            self.respond(200, site.bodies[page], 'text/html; charset=utf-8')
+
+    def respond(self, status, body, content_type, headers=None):
+        if not self.path.startswith('/__stats'):
+            with self.server.lock:
+                self.server.requests[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(site, host='127.0.0.1', port=0, shared=None):
+    """Create (but do not start) a threaded server for a site, sharing another server's counters"""
+    server = ThreadingHTTPServer((host, port), SiteHandler)
+    server.daemon_threads = True
+    server.site = site
+    server.lock = shared.lock if shared else threading.Lock()
+    server.requests = shared.requests if shared else Counter()
+    server.served = shared.served if shared else set()
+    return server
+
+def serve(spec, ready, port=0):
+    """
+    Process target: serve the site on one port per host, report the ports
+    through ready and serve forever.
+    """
+    servers = [make_server(None, port=port)]
+    servers += [make_server(None, shared=servers[0]) for _ in range(spec.hosts - 1)]
+    ports = [server.server_address[1] for server in servers]
+    site = SyntheticSite(spec, [f"http://127.0.0.1:{port}" for port in ports])
+    for server in servers:
+        server.site = site
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    ready.send(ports)
+    ready.close()
+    threading.Event().wait()
@@ -0,0 +1,118 @@
+"""
+Local stand-in for a translation service, and a benchmark of the pipeline.
+
+The stub answers LibreTranslate-style POST /translate requests
+({"q": [texts], "source": ..., "target": ...}) by tagging each text with
+the target language, after an optional per-request latency. It counts the
+requests and characters it receives, so runs can check how much work the
+pipeline's deduplication and cache saved.
+
+The benchmark translates generated pages whose navigation and footer are
+shared, as on a real site, twice: once with an empty cache and once more
+after a fraction of the paragraphs changed, like a recrawl.
+
+Usage:
+    python benchmarks/translation_stub.py serve [port]
+    python benchmarks/translation_stub.py [pages] [--latency SECONDS]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from synthetic_site import WORDS
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        texts = request['q'] if isinstance(request['q'], list) else [request['q']]
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.characters += sum(len(text) for text in texts)
+        time.sleep(self.server.latency)
+        translated = [f"[{request['target']}] {text}" for text in texts]
+        body = json.dumps({'translatedText': translated if isinstance(request['q'], list)
+                           else translated[0]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(host='127.0.0.1', port=0, latency=0.0):
+    """Create (but do not start) the stub service"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.latency = latency
+    server.requests = 0
+    server.characters = 0
+    return server
+
+def generate_pages(count, changed=0.0, seed=42):
+    """Markdown pages sharing navigation and footer, with unique paragraphs"""
+    rng = random.Random(seed)
+    edits = random.Random(seed + 1)
+    sentence = lambda: ' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.'
+    navigation = [f"- {sentence()}" for _ in range(15)]
+    footer = [sentence() for _ in range(5)]
+    pages = []
+    for n in range(count):
+        body = [' '.join(sentence() for _ in range(4)) for _ in range(8)]
+        body = [paragraph + (' Updated.' if edits.random() < changed else '') for paragraph in body]
+        pages.append('\n'.join([f"# Page {n}: {sentence()}", *navigation, '', *body, '',
+                                '```', 'code stays as it is', '```', *footer]))
+    return pages
+
+def translate_pages(pages, server, cache_file, directory):
+    from translation import HttpBackend, TranslationPipeline
+    requests_before, characters_before = server.requests, server.characters
+    pipeline = TranslationPipeline(HttpBackend(), cache_file, target='de')
+    start = time.perf_counter()
+    for n, page in enumerate(pages):
+        pipeline.submit(f"http://example.com/{n}", page, os.path.join(directory, f"page{n}.md"))
+    stats = pipeline.close()
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    stats['service_requests'] = server.requests - requests_before
+    stats['service_characters'] = server.characters - characters_before
+    return stats
+
+def run(pages, latency):
+    server = make_server(latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config.TRANSLATION_URL = f"http://127.0.0.1:{server.server_address[1]}/translate"
+    with tempfile.TemporaryDirectory() as directory:
+        cache_file = os.path.join(directory, 'translation_cache.db')
+        first = generate_pages(pages)
+        naive_characters = sum(len(page) for page in first)
+        results = {
+            'pages': pages,
+            'characters_in_pages': naive_characters,
+            'cold': translate_pages(first, server, cache_file, directory),
+            'recrawl_10pct_changed': translate_pages(generate_pages(pages, changed=0.1),
+                                                     server, cache_file, directory),
+        }
+    server.shutdown()
+    return results
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['serve']:
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        print(f"Translation stub on http://127.0.0.1:{port}/translate")
+        make_server(port=port).serve_forever()
+    parser = argparse.ArgumentParser(description="Benchmark the translation pipeline")
+    parser.add_argument('pages', type=int, nargs='?', default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per stub request")
+    args = parser.parse_args()
+    print(json.dumps(run(args.pages, args.latency), indent=2))
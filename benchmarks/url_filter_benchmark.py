@@ -0,0 +1,54 @@
+"""
+Micro-benchmark for the URL scope filter.
+
+Generates a mix of in-scope, off-site, asset and trap URLs and reports how
+many URLs per second UrlFilter.check can classify.
+
+Usage:
+    python benchmarks/url_filter_benchmark.py [count]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from url_filter import UrlFilter, scope_rules
+
+def generate_urls(count, seed=42):
+    """Generate a reproducible list of URLs resembling crawl output"""
+    rng = random.Random(seed)
+    hosts = ['example.com', 'www.example.com', 'blog.example.com', 'cdn.other.net',
+             'tracker.ads.io', 'news.example.org']
+    paths = ['/articles/{}', '/docs/guide/{}', '/logout', '/calendar/2024/{}',
+             '/static/img/{}.png', '/files/{}.pdf', '/category/{}/page/2']
+    queries = ['', '', '', '?page={}', '?replytocom={}', '?month={}&year=2024']
+    urls = []
+    for _ in range(count):
+        n = rng.randrange(100000)
+        url = (f"https://{rng.choice(hosts)}"
+               f"{rng.choice(paths).format(n)}{rng.choice(queries).format(n)}")
+        urls.append(url)
+    return urls
+
+def run(count):
+    url_filter = UrlFilter(scope_rules(config.URL_FILTER_RULES, 'https://example.com/'))
+    urls = generate_urls(count)
+
+    start = time.perf_counter()
+    accepted = len(url_filter.filter_urls(urls))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'urls': count,
+        'accepted': accepted,
+        'seconds': round(elapsed, 4),
+        'urls_per_second': round(count / elapsed),
+    }
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(json.dumps(run(count), indent=2))
@@ -1,11 +1,14 @@
 import sqlite3
+import threading
 import time
 from functools import wraps
 from hashlib import md5
 
 class CacheManager:
     def __init__(self, cache_file='scraper_cache.db'):
-        self.conn = sqlite3.connect(cache_file)
+        self.conn = sqlite3.connect(cache_file, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.lock = threading.Lock()
         self.create_tables()
 
     def create_tables(self):
@@ -31,37 +34,39 @@ class CacheManager:
 
     def get(self, key):
         """Get cached value"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT value FROM cache
-            WHERE key = ? AND expiration > ?
-        ''', (key, time.time()))
-        
-        result = cursor.fetchone()
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT value FROM cache
+                WHERE key = ? AND expiration > ?
+            ''', (key, time.time()))
+            
+            result = cursor.fetchone()
         return result[0] if result else None
 
     def set(self, key, value, ttl=3600):
         """Set cached value with TTL"""
-        cursor = self.conn.cursor()
         expiration = time.time() + ttl
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO cache (key, value, expiration)
-            VALUES (?, ?, ?)
-        ''', (key, value, expiration))
-        
-        self.conn.commit()
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO cache (key, value, expiration)
+                VALUES (?, ?, ?)
+            ''', (key, value, expiration))
+            
+            self.conn.commit()
 
     def clear_expired(self):
         """Clear expired cache entries"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            DELETE FROM cache
-            WHERE expiration <= ?
-        ''', (time.time(),))
-        
-        self.conn.commit()
-        return cursor.rowcount
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                DELETE FROM cache
+                WHERE expiration <= ?
+            ''', (time.time(),))
+            
+            self.conn.commit()
+            return cursor.rowcount
 
     def cache_decorator(self, ttl=3600):
         """Decorator for caching function results"""
@@ -4,12 +4,194 @@
 OUTPUT_DIR = 'scraped_docs'
 MARKDOWN_EXTENSION = '.md'
 DEFAULT_FILENAME = 'index.md'
+SAVE_JSON = False  # also save every page as structured JSON next to its Markdown file
+TAKE_SCREENSHOTS = True  # capture a screenshot of every saved page with Selenium
+SCREENSHOT_FORMAT = 'webp'  # 'webp', 'jpeg' or 'png'
+SCREENSHOT_QUALITY = 80  # WebP/JPEG quality, 0-100
+SCREENSHOT_FULL_PAGE = False  # capture the whole page instead of the 1920x1080 viewport
+SCREENSHOT_MAX_HEIGHT = 10000  # pixels, full-page captures are cut off below this
+SCREENSHOT_WAIT = 2  # seconds to let a page render before the capture
+SCREENSHOT_DEDUP = True  # reuse the stored screenshot of the host that a capture matches almost exactly
+SCREENSHOT_DEDUP_DISTANCE = 32  # differing bits of the 256-bit perceptual hash for a stored screenshot to be compared
+SCREENSHOT_DEDUP_MAX_CHANGED = 0.0005  # share of pixels that may differ for a capture to reuse a stored one
+SCREENSHOT_PROCESSES = 2  # worker processes for hashing and transcoding
+SCREENSHOT_BROWSERS = 0  # Chrome instances kept running at most; 0 means MAX_WORKERS
 
 # Request settings
 REQUEST_DELAY = 1  # seconds between requests
 REQUEST_TIMEOUT = 10  # seconds
 MAX_RETRIES = 3
 BACKOFF_FACTOR = 1
+MAX_BACKOFF = 60  # seconds, upper bound for a single retry delay
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+MAX_CONTENT_SIZE = 10 * 1024 * 1024  # bytes, larger bodies are aborted
+FETCH_CHUNK_SIZE = 64 * 1024  # bytes read per chunk while streaming a body
+ALLOWED_CONTENT_TYPES = ['text/html', 'application/xhtml+xml']
 
 # Parallel processing settings
-MAX_WORKERS = 4  # Number of parallel threads
\ No newline at end of file
+MAX_WORKERS = 4  # Number of parallel threads
+
+# HTTP client settings (http_client.py)
+HTTP_POOL_HOSTS = 100  # hosts whose connection pools are kept open
+HTTP_POOL_MAXSIZE = None  # connections kept per host; None sizes the pools to the crawl's threads
+DNS_CACHE_TTL = 300  # seconds a resolved host address is reused, 0 disables the cache
+HTTP_PRECONNECT = False  # connect to a host as soon as its first URL is queued
+HTTP_PRECONNECT_WORKERS = 2
+
+# robots.txt and sitemap settings
+RESPECT_ROBOTS = True
+ROBOTS_USER_AGENT = 'AdvancedWebScraper'
+ROBOTS_CACHE_TTL = 86400  # seconds to keep a host's robots.txt
+ROBOTS_ERROR_TTL = 300  # seconds to keep a robots.txt that failed with a server error
+ROBOTS_MAX_SIZE = 500 * 1024  # characters of robots.txt that are parsed
+MAX_CRAWL_DELAY = 30  # seconds, upper bound for a site's Crawl-delay
+USE_SITEMAPS = False  # seed the crawl with the site's sitemap URLs
+
+# Incremental recrawl settings
+INCREMENTAL_CRAWL = True  # skip pages that did not change since the last crawl
+CRAWL_STATE_FILE = 'crawl_state.db'  # per-URL state, kept in the output directory
+RECRAWL_MIN_INTERVAL = 15 * 60  # seconds, shortest adaptive recrawl interval
+RECRAWL_MAX_INTERVAL = 30 * 24 * 3600  # seconds, longest adaptive recrawl interval
+
+# URL scope rules, see url_filter.UrlFilter. With no allowed_domains the crawl
+# stays on the start URL's domain and its subdomains.
+URL_FILTER_RULES = {
+    'allowed_domains': [],
+    'blocked_domains': [],
+    'include_paths': [],
+    'exclude_paths': [],
+    'include_patterns': [],
+    'exclude_patterns': [
+        r'[/?&=](?:logout|log-out|signout|sign-out)\b',
+        r'[?&](?:month|year|day|date|week)=\d',
+        r'/calendar/',
+    ],
+    'blocked_extensions': [
+        'pdf', 'zip', 'gz', 'tgz', 'tar', 'rar', '7z', 'exe', 'msi', 'dmg', 'iso', 'apk',
+        'jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg', 'webp', 'ico', 'tif', 'tiff',
+        'mp3', 'mp4', 'm4a', 'avi', 'mov', 'mkv', 'wmv', 'flv', 'webm', 'wav', 'ogg',
+        'css', 'js', 'json', 'xml', 'rss', 'woff', 'woff2', 'ttf', 'eot',
+        'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'csv',
+    ],
+    'blocked_query_params': ['replytocom', 'sessionid', 'phpsessid', 'sid'],
+    'max_query_params': 5,
+    'max_url_length': 2048,
+    'depth_limits': {},
+}
+
+# Progress metrics settings
+METRICS_INTERVAL = 0.25  # seconds between progress snapshots
+METRICS_LATENCY_WINDOW = 2000  # recent requests used for latency percentiles
+METRICS_HOST_LATENCY_WINDOW = 200  # recent requests per host used for percentiles
+METRICS_TOP_HOSTS = 10  # busiest hosts included in each snapshot
+
+# Stage timing instrumentation, see instrumentation.py
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_PORT = None  # serve /metrics and /metrics.json on this local port
+INSTRUMENTATION_OUTPUT = 'stage_timings'  # report file prefix in the output directory
+
+# Profiling settings (main.py --profile, GUI "Profile" button)
+PROFILE_DURATION = 60  # seconds a profiling window lasts
+PROFILE_SAMPLE_INTERVAL = 0.01  # seconds between stack samples of all threads
+PROFILE_MEMORY_INTERVAL = 10  # seconds between the starts of allocation tracing bursts
+PROFILE_MEMORY_WINDOW = 1  # seconds allocations are traced in each burst
+PROFILE_TOP_ALLOCATIONS = 10  # allocation sites listed per stage
+PROFILE_OUTPUT = 'crawl_profile'  # report file prefix in the output directory
+
+# Content gate settings (content_validator.py): cheap checks of the raw body
+# that skip extraction and link expansion for pages not worth keeping
+CONTENT_GATE_ENABLED = True
+CONTENT_GATE_RULES = {
+    'min_body_bytes': 256,  # smaller bodies are rejected
+    'min_text_bytes': 80,  # estimated visible text, whitespace excluded
+    'min_text_ratio': 0.002,  # visible text / body size
+    'soft_404_max_text_bytes': 3000,  # "not found" titles with more text than this are kept
+    'login_max_text_bytes': 2000,  # login walls with more text than this are kept
+    'allowed_languages': [],  # e.g. ['en']; pages without <html lang> always pass
+    'allowed_charsets': [],  # e.g. ['utf-8']; pages without a declared charset always pass
+    'allowed_domains': [],  # final URL host or a subdomain of one; empty allows all
+}
+
+# Streaming parse settings (html_stream.py): pages at least this many characters
+# are extracted by an event parser instead of a BeautifulSoup tree, keeping memory
+# bounded on huge pages; the results are the same
+STREAM_PARSE_THRESHOLD = 1024 * 1024
+
+# Extraction cache settings (extraction_cache.py): pages whose body was already
+# extracted with the same options and library versions reuse that result
+EXTRACTION_CACHE = True
+EXTRACTION_CACHE_FILE = 'extraction_cache.db'  # in the output directory
+EXTRACTION_CACHE_TTL = 30 * 86400  # seconds an extraction result is reused
+
+# Image asset settings (asset_manager.py)
+DOWNLOAD_ASSETS = False  # store page images in a content-addressed directory
+ASSET_DIR = 'assets'  # in the output directory; files are named by their SHA-1
+ASSET_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif',
+                       'image/svg+xml')
+ASSET_MAX_BYTES = 10 * 1024 * 1024
+ASSET_MAX_PER_PAGE = 50
+ASSET_DOWNLOAD_WORKERS = 8  # image download threads shared by all crawl workers
+ASSET_THUMBNAILS = False  # also write JPEG thumbnails with Pillow
+ASSET_THUMBNAIL_SIZE = (256, 256)
+ASSET_THUMBNAIL_QUALITY = 80
+ASSET_THUMBNAIL_PROCESSES = 2
+
+# OCR settings (ocr.py); needs pytesseract, Pillow and the tesseract binary
+OCR_ENABLED = False  # append the text found in page images to each page
+OCR_LANGUAGE = 'eng'  # tesseract language code(s), e.g. 'eng+deu'
+OCR_PROCESSES = 2  # tesseract worker processes
+OCR_BATCH_SIZE = 8  # images handed to a worker process at once
+OCR_BATCH_WAIT = 0.5  # seconds to wait for a batch to fill up
+OCR_TIMEOUT = 30  # seconds allowed per image
+OCR_DOWNLOAD_WORKERS = 4  # image download threads
+OCR_MAX_IMAGES_PER_PAGE = 20
+OCR_MIN_IMAGE_BYTES = 2048  # smaller images (icons, spacers) are skipped
+OCR_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+OCR_CACHE_FILE = 'ocr_cache.db'  # recognised text per image hash, in the output directory
+OCR_CACHE_TTL = 30 * 86400  # seconds recognised text is reused
+
+# Translation settings (translation.py)
+TRANSLATION_ENABLED = False  # write a translated copy of every saved page
+TRANSLATION_BACKEND = 'googletrans'  # 'googletrans' or 'http' (a LibreTranslate-compatible service)
+TRANSLATION_URL = 'http://127.0.0.1:5000/translate'  # endpoint of the 'http' backend
+TRANSLATION_API_KEY = None
+TRANSLATION_SOURCE = 'auto'
+TRANSLATION_TARGET = 'en'
+TRANSLATION_WORKERS = 2  # concurrent batch requests
+TRANSLATION_BATCH_SIZE = 50  # segments per request
+TRANSLATION_BATCH_CHARS = 4000  # characters per request
+TRANSLATION_BATCH_WAIT = 0.5  # seconds a partial batch waits for more segments
+TRANSLATION_MAX_SEGMENT_CHARS = 1000  # longer paragraphs are split at sentence ends
+TRANSLATION_CACHE_FILE = 'translation_cache.db'
+TRANSLATION_CACHE_TTL = 90 * 86400  # seconds a translated segment is reused
+
+# Multi-process crawling settings (sharding.py, main.py --processes)
+CRAWL_PROCESSES = 1  # crawl processes; hosts are split between them by consistent hashing
+SHARD_VIRTUAL_NODES = 64  # points per process on the hash ring
+SHARD_HANDOFF_BATCH = 100  # links for another process sent in one message
+SHARD_HANDOFF_INTERVAL = 0.05  # seconds before a partial batch of links is sent
+
+# Distributed crawling settings (distributed.py)
+COORDINATOR_DB = 'crawl_coordinator.db'  # frontier, seen-set and leases of a distributed crawl
+COORDINATOR_HOST = '127.0.0.1'  # interface the coordinator API listens on
+COORDINATOR_PORT = 8765
+COORDINATOR_BATCH_SIZE = 100  # URLs per lease
+COORDINATOR_HOST_BATCH = 50  # URLs of one host per lease
+COORDINATOR_LEASE_TIMEOUT = 300  # seconds before an unrenewed lease is issued again
+COORDINATOR_MAX_ATTEMPTS = 3  # expired leases before a URL is marked failed
+COORDINATOR_POLL_INTERVAL = 1.0  # seconds an idle worker waits before asking again
+
+# Error log settings
+ERROR_LOG_FILE = 'scraping_errors.log'  # JSON lines, in the output directory
+ERROR_LOG_MAX_BYTES = 5 * 1024 * 1024  # rotate the log file at this size
+ERROR_LOG_BACKUPS = 3  # rotated files kept
+ERROR_LOG_RATE_LIMIT = 20  # records written per error class and window
+ERROR_LOG_RATE_WINDOW = 60  # seconds
+ERROR_LOG_QUEUE_SIZE = 10000  # records waiting for the writer before new ones are dropped
+ERROR_LOG_RECENT = 100  # latest messages kept in memory for the GUI
+
+# GUI settings
+GUI_MAX_RESULTS = 10000  # pages kept in the results list
+GUI_MAX_LOG_LINES = 5000  # lines kept in the log pane
+GUI_REFRESH_MS = 33  # milliseconds between GUI updates
+GUI_MAX_DETAIL_CHARS = 1000000  # characters of a saved page shown in the detail pane
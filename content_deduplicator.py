@@ -50,18 +50,19 @@ class ContentDeduplicator:
         return sorted(similar, key=lambda x: x['similarity'], reverse=True)
 
     def remove_duplicates(self):
-        """Remove duplicate content from database"""
-        cursor = self.db_manager.conn.cursor()
-        
-        # Find and remove duplicates
-        cursor.execute('''
-            DELETE FROM results
-            WHERE id NOT IN (
-                SELECT MIN(id)
-                FROM results
-                GROUP BY content_hash
-            )
-        ''')
-        
-        self.db_manager.conn.commit()
+        """Remove page versions whose content an earlier version already has"""
+        with self.db_manager.lock:
+            cursor = self.db_manager.conn.cursor()
+
+            # Find and remove duplicates; the triggers update the statistics
+            cursor.execute('''
+                DELETE FROM page_versions
+                WHERE id NOT IN (
+                    SELECT MIN(id)
+                    FROM page_versions
+                    GROUP BY content_hash
+                )
+            ''')
+
+            self.db_manager.conn.commit()
         return cursor.rowcount
\ No newline at end of file
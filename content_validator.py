@@ -1,60 +1,190 @@
 import re
-from bs4 import BeautifulSoup
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+import config
+from fetcher import declared_charset
+
+# Everything that is not visible text: scripts, styles, comments and tags
+NON_TEXT = re.compile(rb'<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->|<[^>]*>',
+                      re.IGNORECASE | re.DOTALL)
+WHITESPACE = b' \t\r\n\f\v'
+TITLE = re.compile(rb'<title[^>]*>(.*?)</title', re.IGNORECASE | re.DOTALL)
+H1 = re.compile(rb'<h1[^>]*>(.*?)</h1', re.IGNORECASE | re.DOTALL)
+HTML_LANG = re.compile(rb'<html[^>]*\slang=["\']?([A-Za-z]{2,3})', re.IGNORECASE)
+PASSWORD_INPUT = re.compile(rb'<input[^>]+type=["\']?password', re.IGNORECASE)
+HEAD_BYTES = 65536  # titles, headings and the <html> tag are looked for in this prefix
+
+# Defaults of the rules under "content_filters"; see precheck()
+DEFAULT_RULES = {
+    'min_length': 100,
+    'min_paragraphs': 1,
+    'allowed_domains': [],
+    'min_body_bytes': 256,
+    'min_text_bytes': 80,
+    'min_text_ratio': 0.002,
+    'soft_404_patterns': [
+        r'^\W*(?:error\W*)?404\b',
+        r'\b404\b.{0,30}\bnot\s+found\b',
+        r'\b(?:page|file|document|content|article)\b.{0,40}\b(?:not\s+found'
+        r'|(?:cannot|can\'t|could\s+not)\s+be\s+found|(?:does\s+not|doesn\'t|no\s+longer)\s+exists?)\b',
+        r'\b(?:cannot|can\'t|could\s+not|couldn\'t)\s+find\s+(?:the|that|this)\s+page\b',
+    ],
+    'soft_404_max_text_bytes': 3000,
+    'login_patterns': [
+        r'^\W*(?:sign|log)\s*-?\s*in\b',
+        r'\b(?:login|sign-in)\s+required\b',
+        r'\bplease\s+(?:sign|log)\s*-?\s*in\b',
+        r'\bsubscribe\s+to\s+(?:continue|read)\b',
+    ],
+    'login_max_text_bytes': 2000,
+    'allowed_languages': [],
+    'allowed_charsets': [],
+}
 
 class ContentValidator:
     def __init__(self, config):
         self.config = config
-        self.min_length = config.get('content_filters', {}).get('min_length', 100)
-        self.min_paragraphs = config.get('content_filters', {}).get('min_paragraphs', 1)
-        self.allowed_domains = config.get('content_filters', {}).get('allowed_domains', [])
+        rules = dict(DEFAULT_RULES, **config.get('content_filters', {}))
+        self.rules = rules
+        self.min_length = rules['min_length']
+        self.min_paragraphs = rules['min_paragraphs']
+        self.allowed_domains = [domain.lower() for domain in rules['allowed_domains']]
+        self.soft_404 = [re.compile(pattern, re.IGNORECASE) for pattern in rules['soft_404_patterns']]
+        self.login = [re.compile(pattern, re.IGNORECASE) for pattern in rules['login_patterns']]
+        self.allowed_languages = {language.lower() for language in rules['allowed_languages']}
+        self.allowed_charsets = {charset.lower().replace('_', '-')
+                                 for charset in rules['allowed_charsets']}
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.rejected = Counter()
 
     def validate_content(self, content, url):
         """Validate extracted content"""
         if not content:
             return False
-            
+
         # Check content length
         if len(content) < self.min_length:
             return False
-            
+
         # Check number of paragraphs
         paragraphs = [p for p in content.split('\n\n') if p.strip()]
         if len(paragraphs) < self.min_paragraphs:
             return False
-            
+
         # Check domain restrictions
-        if self.allowed_domains:
-            domain = self.extract_domain(url)
-            if domain not in self.allowed_domains:
-                return False
-                
+        if not self.domain_allowed(url):
+            return False
+
         return True
 
+    def precheck(self, body, url, content_type_header=''):
+        """
+        Quality gate on the raw body, run before any parsing or extraction.
+
+        Only cheap byte-level scans are used: a regex pass that estimates
+        the visible text, and searches of the title, first heading and
+        <html> tag near the start of the page. Soft-404 and login
+        signatures are matched against the title and first heading only,
+        and only pages with little text are rejected for them, so articles
+        about error pages or signing in are kept.
+
+        Args:
+            body (bytes): Raw response body
+            url (str): Final URL of the response
+            content_type_header (str): Content-Type header, for the charset
+
+        Returns:
+            str: Why the page was rejected, or None if it passed
+        """
+        reason = self._precheck(body, url, content_type_header)
+        with self.lock:
+            self.checked += 1
+            if reason is not None:
+                self.rejected[reason] += 1
+        return reason
+
+    def _precheck(self, body, url, content_type_header):
+        rules = self.rules
+        if not self.domain_allowed(url):
+            return 'domain'
+        if len(body) < rules['min_body_bytes']:
+            return 'body_size'
+
+        if self.allowed_charsets:
+            charset = declared_charset(body, content_type_header)
+            if charset and charset.lower().replace('_', '-') not in self.allowed_charsets:
+                return 'charset'
+
+        head = body[:HEAD_BYTES]
+        if self.allowed_languages:
+            match = HTML_LANG.search(head)
+            if match and match.group(1).decode('ascii').lower() not in self.allowed_languages:
+                return 'language'
+
+        text_bytes = self.estimate_text(body)
+        headings = [self._plain(match.group(1)) for match in (TITLE.search(head), H1.search(head))
+                    if match]
+        if text_bytes < rules['soft_404_max_text_bytes'] and any(
+                pattern.search(heading) for heading in headings for pattern in self.soft_404):
+            return 'soft_404'
+        if text_bytes < rules['login_max_text_bytes'] and (
+                PASSWORD_INPUT.search(body)
+                or any(pattern.search(heading) for heading in headings for pattern in self.login)):
+            return 'login_wall'
+        if text_bytes < rules['min_text_bytes']:
+            return 'text'
+        if text_bytes < rules['min_text_ratio'] * len(body):
+            return 'text_ratio'
+        return None
+
+    @staticmethod
+    def estimate_text(body):
+        """Bytes of visible, non-whitespace text in an HTML body"""
+        return len(NON_TEXT.sub(b' ', body).translate(None, WHITESPACE))
+
+    @staticmethod
+    def _plain(fragment):
+        """Text of a title or heading fragment"""
+        return re.sub(r'<[^>]*>', ' ', fragment.decode('utf-8', 'replace')).strip()
+
+    def domain_allowed(self, url):
+        """Whether a URL's host is one of allowed_domains or a subdomain of one"""
+        if not self.allowed_domains:
+            return True
+        host = (urlparse(url).hostname or '').lower()
+        return any(host == domain or host.endswith('.' + domain) for domain in self.allowed_domains)
+
     def extract_domain(self, url):
         """Extract domain from URL"""
-        from urllib.parse import urlparse
         parsed = urlparse(url)
         return parsed.netloc
 
     def clean_html(self, html):
         """Clean and sanitize HTML content"""
+        if len(html) >= config.STREAM_PARSE_THRESHOLD:
+            import html_stream
+            return html_stream.clean_html(html)
+
+        from bs4 import BeautifulSoup, Comment
         soup = BeautifulSoup(html, 'html.parser')
-        
+
         # Remove unwanted tags
         for tag in soup(['script', 'style', 'iframe', 'noscript']):
             tag.decompose()
-            
+
         # Remove comments
         for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
             comment.extract()
-            
+
         return str(soup)
 
     def filter_content(self, content):
         """Apply content filtering rules"""
         # Remove excessive whitespace
         content = re.sub(r'\s+', ' ', content).strip()
-        
+
         # Remove empty paragraphs
         paragraphs = [p for p in content.split('\n\n') if p.strip()]
-        return '\n\n'.join(paragraphs)
\ No newline at end of file
+        return '\n\n'.join(paragraphs)
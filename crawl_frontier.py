@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import requests
+import config
+
+class CrawlTask:
+    __slots__ = ('url', 'depth', 'attempt', 'lastmod')
+
+    def __init__(self, url, depth=0, attempt=0, lastmod=None):
+        self.url = url
+        self.depth = depth
+        self.attempt = attempt
+        self.lastmod = lastmod
+
+    def __repr__(self):
+        return f"CrawlTask({self.url!r}, depth={self.depth}, attempt={self.attempt})"
+
+class CrawlFrontier:
+    def __init__(self, default_delay=None):
+        self.default_delay = config.REQUEST_DELAY if default_delay is None else default_delay
+        self.host_queues = {}
+        self.host_heap = []
+        self.host_delays = {}
+        self.host_next_fetch = {}
+        self.delayed = []
+        self.seen = set()
+        self.in_flight = 0
+        self.closed = False
+        # Called with the first URL of every new host, under the frontier's
+        # lock, so it must not block (see http_client.Preconnector.submit)
+        self.on_new_host = None
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def add(self, url, depth=0, lastmod=None):
+        """Queue a newly discovered URL unless it was seen before"""
+        with self._condition:
+            if self.closed or url in self.seen:
+                return False
+            self.seen.add(url)
+            self._enqueue(CrawlTask(url, depth, lastmod=lastmod))
+            self._condition.notify()
+            return True
+
+    def retry(self, task, delay):
+        """Park a failed task on the timer heap until its backoff expires"""
+        with self._condition:
+            task.attempt += 1
+            deadline = time.monotonic() + delay
+            heapq.heappush(self.delayed, (deadline, next(self._sequence), task))
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def set_host_delay(self, host, delay):
+        """Set the minimum number of seconds between two fetches from a host"""
+        with self._condition:
+            self.host_delays[host] = delay
+
+    def get(self):
+        """Wait for the next task whose host may be fetched, or None when done"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._promote_due_tasks(now)
+                if not self.closed and self.host_heap and self.host_heap[0][0] <= now:
+                    self.in_flight += 1
+                    return self._take_from_host(now)
+                if self.closed or (not self.host_heap and not self.delayed and self.in_flight == 0):
+                    self._condition.notify_all()
+                    return None
+                deadlines = [entry[0] for entry in (self.host_heap[:1] + self.delayed[:1])]
+                timeout = max(0, min(deadlines) - now) if deadlines else None
+                self._condition.wait(timeout)
+
+    def task_done(self):
+        """Mark a task returned by get() as finished"""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def close(self):
+        """Stop handing out work and wake every waiting worker"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def pending(self):
+        """Number of tasks that are queued or waiting for a retry"""
+        with self._condition:
+            return sum(len(q) for q in self.host_queues.values()) + len(self.delayed)
+
+    def _enqueue(self, task):
+        """Append a task to its host queue, scheduling the host if it was idle"""
+        host = urlparse(task.url).netloc
+        host_queue = self.host_queues.get(host)
+        if host_queue is None:
+            if self.on_new_host is not None and host not in self.host_next_fetch:
+                self.on_new_host(task.url)
+            host_queue = self.host_queues[host] = deque()
+            ready_at = self.host_next_fetch.get(host, 0)
+            heapq.heappush(self.host_heap, (ready_at, next(self._sequence), host))
+        host_queue.append(task)
+
+    def _take_from_host(self, now):
+        """Pop the next task of the host at the top of the politeness heap"""
+        _, _, host = heapq.heappop(self.host_heap)
+        host_queue = self.host_queues[host]
+        task = host_queue.popleft()
+        next_fetch = now + self.host_delays.get(host, self.default_delay)
+        self.host_next_fetch[host] = next_fetch
+        if host_queue:
+            heapq.heappush(self.host_heap, (next_fetch, next(self._sequence), host))
+        else:
+            del self.host_queues[host]
+        return task
+
+    def _promote_due_tasks(self, now):
+        """Move tasks whose backoff has expired back onto their host queue"""
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, task = heapq.heappop(self.delayed)
+            self._enqueue(task)
+
+def is_retryable(error):
+    """Check if a failed request is worth another attempt"""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in config.RETRY_STATUS_CODES
+    return False
+
+def retry_delay(error, attempt):
+    """Compute the backoff before the next attempt, honoring Retry-After"""
+    delay = config.BACKOFF_FACTOR * (2 ** attempt)
+    response = getattr(error, 'response', None)
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+    return min(delay, config.MAX_BACKOFF)
@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import deque
+import config
+
+class HostStats:
+    __slots__ = ('pages', 'bytes', 'latencies', 'pages_per_second', 'last_pages')
+
+    def __init__(self, window):
+        self.pages = 0
+        self.bytes = 0
+        self.latencies = deque(maxlen=window)
+        self.pages_per_second = 0.0
+        self.last_pages = 0
+
+class CrawlMetrics:
+    """
+    Aggregated crawl counters shared by all workers.
+
+    Workers only bump counters and append latencies under a lock; the
+    sampler thread turns them into a snapshot a few times per second and
+    hands it to every listener (CLI progress bar, GUI dashboard), so the
+    number of progress events no longer depends on the crawl rate.
+    """
+
+    COUNTERS = ('discovered', 'success', 'failed', 'skipped', 'unchanged', 'requests', 'bytes')
+    CONNECTION_COUNTERS = ('requests', 'connections', 'discarded', 'dns_lookups', 'dns_hits')
+
+    def __init__(self, queue_depth=None, interval=None, latency_window=None, connections=None):
+        self.queue_depth = queue_depth
+        # Callable returning the HTTP client's counters, reported relative to their start values
+        self.connections = connections
+        self._connections_base = (connections() if connections else None) or {}
+        self.interval = config.METRICS_INTERVAL if interval is None else interval
+        self.latency_window = latency_window or config.METRICS_LATENCY_WINDOW
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.in_flight = 0
+        self.latencies = deque(maxlen=self.latency_window)
+        self.hosts = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.rates = {'pages_per_second': 0.0, 'bytes_per_second': 0.0}
+        self._last_sample = (self.started, 0, 0)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def count(self, name, amount=1):
+        """Increase a counter"""
+        with self.lock:
+            self.counters[name] += amount
+
+    def request_started(self):
+        with self.lock:
+            self.in_flight += 1
+            self.counters['requests'] += 1
+
+    def request_finished(self, host, latency, size=0):
+        """Record a finished request with its latency in seconds and body size"""
+        with self.lock:
+            self.in_flight -= 1
+            self.counters['bytes'] += size
+            self.latencies.append(latency)
+            stats = self.hosts.get(host)
+            if stats is None:
+                stats = self.hosts[host] = HostStats(config.METRICS_HOST_LATENCY_WINDOW)
+            stats.pages += 1
+            stats.bytes += size
+            stats.latencies.append(latency)
+
+    def add_listener(self, listener):
+        """Register a callable receiving every snapshot"""
+        self.listeners.append(listener)
+
+    def snapshot(self):
+        """Build a snapshot of the counters, rates and latency percentiles"""
+        now = time.monotonic()
+        with self.lock:
+            counters = dict(self.counters)
+            in_flight = self.in_flight
+            latencies = list(self.latencies)
+            hosts = [(host, stats.pages, stats.bytes, list(stats.latencies), stats)
+                     for host, stats in self.hosts.items()]
+
+        done = counters['success'] + counters['failed'] + counters['skipped'] + counters['unchanged']
+        last_time, last_done, last_bytes = self._last_sample
+        elapsed = now - last_time
+        if elapsed > 0:
+            self.rates['pages_per_second'] = smooth(
+                self.rates['pages_per_second'], (done - last_done) / elapsed)
+            self.rates['bytes_per_second'] = smooth(
+                self.rates['bytes_per_second'], (counters['bytes'] - last_bytes) / elapsed)
+            for _, pages, _, _, stats in hosts:
+                stats.pages_per_second = smooth(
+                    stats.pages_per_second, (pages - stats.last_pages) / elapsed)
+                stats.last_pages = pages
+        self._last_sample = (now, done, counters['bytes'])
+
+        hosts.sort(key=lambda item: item[1], reverse=True)
+        return {
+            'total': counters['discovered'],
+            'success': counters['success'],
+            'failed': counters['failed'],
+            'skipped': counters['skipped'],
+            'unchanged': counters['unchanged'],
+            'done': done,
+            'requests': counters['requests'],
+            'bytes': counters['bytes'],
+            'elapsed': now - self.started,
+            'pages_per_second': self.rates['pages_per_second'],
+            'bytes_per_second': self.rates['bytes_per_second'],
+            'in_flight': in_flight,
+            'queue_depth': self.queue_depth() if self.queue_depth else 0,
+            'connections': self.connection_counters(),
+            'latency': percentiles(latencies),
+            'hosts': [
+                {
+                    'host': host,
+                    'pages': pages,
+                    'bytes': size,
+                    'pages_per_second': stats.pages_per_second,
+                    'latency': percentiles(host_latencies)
+                }
+                for host, pages, size, host_latencies, stats in hosts[:config.METRICS_TOP_HOSTS]
+            ]
+        }
+
+    def connection_counters(self):
+        """HTTP requests, new connections, pool discards and DNS lookups since the crawl started"""
+        current = (self.connections() if self.connections else None) or {}
+        return {name: current.get(name, 0) - self._connections_base.get(name, 0)
+                for name in self.CONNECTION_COUNTERS}
+
+    def publish(self):
+        """Send a fresh snapshot to every listener"""
+        snapshot = self.snapshot()
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                pass
+        return snapshot
+
+    def start(self):
+        """Start sampling in a background thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and publish one final snapshot"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.publish()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+def smooth(previous, current, alpha=0.3):
+    """Exponentially smooth a rate so the display does not flicker"""
+    return previous + alpha * (current - previous)
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Latency percentiles in milliseconds"""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    samples = sorted(samples)
+    last = len(samples) - 1
+    return {f"p{p}": samples[min(last, int(round(p / 100 * last)))] * 1000 for p in points}
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def merge_snapshots(snapshots):
+    """
+    Combine the snapshots of several crawl processes into one.
+
+    Counters, rates and queue sizes are summed. A host is only ever crawled
+    by one process, so host entries are concatenated; latency percentiles
+    are weighted by each process's request count.
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    merged = {
+        key: sum(snapshot[key] for snapshot in snapshots)
+        for key in ('total', 'success', 'failed', 'skipped', 'unchanged', 'done', 'requests',
+                    'bytes', 'pages_per_second', 'bytes_per_second', 'in_flight', 'queue_depth')
+    }
+    merged['elapsed'] = max((snapshot['elapsed'] for snapshot in snapshots), default=0.0)
+    merged['connections'] = {
+        name: sum(snapshot['connections'][name] for snapshot in snapshots)
+        for name in CrawlMetrics.CONNECTION_COUNTERS
+    }
+
+    merged['latency'] = {}
+    for point in (snapshots[0]['latency'] if snapshots else percentiles([])):
+        weighted = [(snapshot['latency'][point], snapshot['requests']) for snapshot in snapshots
+                    if snapshot['latency'][point] is not None and snapshot['requests']]
+        weight = sum(requests for _, requests in weighted)
+        merged['latency'][point] = (sum(value * requests for value, requests in weighted) / weight
+                                    if weight else None)
+
+    hosts = [host for snapshot in snapshots for host in snapshot['hosts']]
+    hosts.sort(key=lambda host: host['pages'], reverse=True)
+    merged['hosts'] = hosts[:config.METRICS_TOP_HOSTS]
+    return merged
+
+def connection_reuse(connections):
+    """Share of HTTP requests that were sent on an already open connection"""
+    if not connections['requests']:
+        return None
+    return max(0.0, 1 - connections['connections'] / connections['requests'])
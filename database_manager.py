@@ -1,75 +1,380 @@
+import ast
+import json
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 from hashlib import md5
+from urllib.parse import urlparse
+import instrumentation
 
 class DatabaseManager:
+    """
+    Stored pages and the statistics reported on them.
+
+    Pages are kept in normalized tables: hosts, urls (one row per URL),
+    crawls, contents (each distinct content once, by hash) and
+    page_versions (one row per saved fetch, with its status, size and
+    metadata as JSON). Triggers on page_versions keep the aggregate tables
+    host_daily_stats, host_daily_status and the per-content and per-crawl
+    counters up to date as versions are inserted or deleted, so the
+    reports read a row per host and day, or per content, instead of
+    scanning every page.
+    """
+
     def __init__(self, db_file='scraper.db'):
-        self.conn = sqlite3.connect(db_file)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.lock = threading.Lock()
+        self.host_ids = {}
         self.create_tables()
 
     def create_tables(self):
-        """Create necessary database tables"""
-        cursor = self.conn.cursor()
-        
-        # Create results table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url TEXT NOT NULL,
-                content_hash TEXT NOT NULL,
-                content TEXT NOT NULL,
-                metadata TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create unique index on content hash
-        cursor.execute('''
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_content_hash 
-            ON results(content_hash)
-        ''')
-        
-        self.conn.commit()
-
-    def save_result(self, url, content, metadata=None):
-        """Save scraping result to database"""
-        content_hash = self.generate_content_hash(content)
-        
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO results (url, content_hash, content, metadata)
-                VALUES (?, ?, ?, ?)
-            ''', (url, content_hash, content, str(metadata)))
+        """Create the tables, indexes and triggers, and migrate a legacy results table"""
+        with self.lock:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS hosts (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                );
+
+                CREATE TABLE IF NOT EXISTS urls (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,
+                    host_id INTEGER NOT NULL REFERENCES hosts(id),
+                    first_seen TEXT NOT NULL,
+                    last_seen TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_urls_host ON urls(host_id);
+
+                CREATE TABLE IF NOT EXISTS crawls (
+                    id INTEGER PRIMARY KEY,
+                    start_url TEXT,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    settings TEXT,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0
+                );
+
+                CREATE TABLE IF NOT EXISTS contents (
+                    hash TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    versions INTEGER NOT NULL DEFAULT 0,
+                    urls INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_contents_urls ON contents(urls);
+
+                CREATE TABLE IF NOT EXISTS page_versions (
+                    id INTEGER PRIMARY KEY,
+                    url_id INTEGER NOT NULL REFERENCES urls(id),
+                    crawl_id INTEGER REFERENCES crawls(id),
+                    fetched_at TEXT NOT NULL,
+                    status INTEGER,
+                    bytes INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL REFERENCES contents(hash),
+                    metadata TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_versions_url ON page_versions(url_id, fetched_at);
+                CREATE INDEX IF NOT EXISTS idx_versions_time ON page_versions(fetched_at);
+                CREATE INDEX IF NOT EXISTS idx_versions_crawl ON page_versions(crawl_id);
+                CREATE INDEX IF NOT EXISTS idx_versions_content ON page_versions(content_hash, url_id);
+
+                -- Aggregates, maintained by the triggers below
+                CREATE TABLE IF NOT EXISTS host_daily_stats (
+                    host_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    pages INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    PRIMARY KEY (host_id, day)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_host_daily_day ON host_daily_stats(day);
+
+                CREATE TABLE IF NOT EXISTS host_daily_status (
+                    host_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    pages INTEGER NOT NULL,
+                    PRIMARY KEY (host_id, day, status)
+                ) WITHOUT ROWID;
+
+                CREATE TRIGGER IF NOT EXISTS page_versions_insert AFTER INSERT ON page_versions
+                BEGIN
+                    INSERT INTO host_daily_stats (host_id, day, pages, bytes)
+                    SELECT host_id, date(NEW.fetched_at), 1, NEW.bytes FROM urls WHERE id = NEW.url_id
+                    ON CONFLICT (host_id, day) DO UPDATE
+                    SET pages = pages + 1, bytes = bytes + excluded.bytes;
+
+                    INSERT INTO host_daily_status (host_id, day, status, pages)
+                    SELECT host_id, date(NEW.fetched_at), COALESCE(NEW.status, 0), 1
+                    FROM urls WHERE id = NEW.url_id
+                    ON CONFLICT (host_id, day, status) DO UPDATE SET pages = pages + 1;
+
+                    UPDATE contents
+                    SET versions = versions + 1,
+                        urls = urls + NOT EXISTS (
+                            SELECT 1 FROM page_versions
+                            WHERE content_hash = NEW.content_hash AND url_id = NEW.url_id
+                              AND id != NEW.id)
+                    WHERE hash = NEW.content_hash;
+
+                    UPDATE crawls SET pages = pages + 1, bytes = bytes + NEW.bytes
+                    WHERE id = NEW.crawl_id;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS page_versions_delete AFTER DELETE ON page_versions
+                BEGIN
+                    UPDATE host_daily_stats SET pages = pages - 1, bytes = bytes - OLD.bytes
+                    WHERE host_id = (SELECT host_id FROM urls WHERE id = OLD.url_id)
+                      AND day = date(OLD.fetched_at);
+                    DELETE FROM host_daily_stats WHERE pages = 0
+                      AND host_id = (SELECT host_id FROM urls WHERE id = OLD.url_id)
+                      AND day = date(OLD.fetched_at);
+
+                    UPDATE host_daily_status SET pages = pages - 1
+                    WHERE host_id = (SELECT host_id FROM urls WHERE id = OLD.url_id)
+                      AND day = date(OLD.fetched_at) AND status = COALESCE(OLD.status, 0);
+                    DELETE FROM host_daily_status WHERE pages = 0
+                      AND host_id = (SELECT host_id FROM urls WHERE id = OLD.url_id)
+                      AND day = date(OLD.fetched_at) AND status = COALESCE(OLD.status, 0);
+
+                    UPDATE contents
+                    SET versions = versions - 1,
+                        urls = urls - NOT EXISTS (
+                            SELECT 1 FROM page_versions
+                            WHERE content_hash = OLD.content_hash AND url_id = OLD.url_id)
+                    WHERE hash = OLD.content_hash;
+                    DELETE FROM contents WHERE hash = OLD.content_hash AND versions = 0;
+
+                    UPDATE crawls SET pages = pages - 1, bytes = bytes - OLD.bytes
+                    WHERE id = OLD.crawl_id;
+                END;
+            ''')
+            legacy = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'results'"
+            ).fetchone()
+            if legacy:
+                self._migrate_results()
+            self.conn.commit()
+
+    def _migrate_results(self):
+        """Move the rows of the old single results table into the normalized tables"""
+        rows = self.conn.execute(
+            'SELECT url, content, metadata, timestamp FROM results ORDER BY id'
+        ).fetchall()
+        for url, content, metadata, timestamp in rows:
+            # Metadata used to be stored as str(dict)
+            try:
+                metadata = ast.literal_eval(metadata) if metadata else None
+            except (ValueError, SyntaxError):
+                pass
+            self._insert(url, content, metadata, None, None, None, timestamp)
+        self.conn.execute('DROP TABLE results')
+
+    def start_crawl(self, start_url=None, settings=None):
+        """
+        Record the start of a crawl.
+
+        Args:
+            start_url (str): Where the crawl started
+            settings (dict): Crawl settings, stored as JSON
+
+        Returns:
+            int: The crawl id to pass to save_result()
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT INTO crawls (start_url, started_at, settings) VALUES (?, ?, ?)',
+                (start_url, self.now(), self.to_json(settings)))
+            self.conn.commit()
+        return cursor.lastrowid
+
+    def finish_crawl(self, crawl_id):
+        """Record the end of a crawl"""
+        with self.lock:
+            self.conn.execute('UPDATE crawls SET finished_at = ? WHERE id = ?', (self.now(), crawl_id))
             self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            # Content already exists
-            return False
+
+    def save_result(self, url, content, metadata=None, status=None, size=None, crawl_id=None,
+                    fetched_at=None):
+        """
+        Save a fetched page as a new version of its URL.
+
+        Args:
+            url (str): The page URL
+            content (str): The extracted content
+            metadata (dict): Page metadata, stored as JSON
+            status (int): HTTP status of the response
+            size (int): Bytes downloaded; defaults to the size of the content
+            crawl_id (int): The crawl from start_crawl(), if any
+            fetched_at (str): When the page was fetched, YYYY-MM-DD HH:MM:SS UTC;
+                defaults to now
+
+        Returns:
+            bool: True if the content is new, False if the same content was
+                saved before (the version is recorded either way)
+        """
+        with instrumentation.stage('db_insert', urlparse(url).netloc):
+            with self.lock:
+                new = self._insert(url, content, metadata, status, size, crawl_id,
+                                   fetched_at or self.now())
+                self.conn.commit()
+        return new
+
+    def _insert(self, url, content, metadata, status, size, crawl_id, fetched_at):
+        host_id = self._host_id(urlparse(url).netloc.lower())
+        self.conn.execute('''
+            INSERT INTO urls (url, host_id, first_seen, last_seen) VALUES (?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET last_seen = excluded.last_seen
+        ''', (url, host_id, fetched_at, fetched_at))
+        url_id = self.conn.execute('SELECT id FROM urls WHERE url = ?', (url,)).fetchone()[0]
+        content_hash = self.generate_content_hash(content)
+        new = self.conn.execute('INSERT OR IGNORE INTO contents (hash, content) VALUES (?, ?)',
+                                (content_hash, content)).rowcount == 1
+        if size is None:
+            size = len(content.encode('utf-8'))
+        self.conn.execute('''
+            INSERT INTO page_versions (url_id, crawl_id, fetched_at, status, bytes, content_hash, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (url_id, crawl_id, fetched_at, status, size, content_hash, self.to_json(metadata)))
+        return new
+
+    def _host_id(self, host):
+        host_id = self.host_ids.get(host)
+        if host_id is None:
+            self.conn.execute('INSERT OR IGNORE INTO hosts (name) VALUES (?)', (host,))
+            host_id = self.conn.execute('SELECT id FROM hosts WHERE name = ?', (host,)).fetchone()[0]
+            self.host_ids[host] = host_id
+        return host_id
+
+    @staticmethod
+    def now():
+        """Current UTC time in SQLite's date format"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def to_json(value):
+        return None if value is None else json.dumps(value, ensure_ascii=False, default=str)
 
     def generate_content_hash(self, content):
         """Generate MD5 hash of content for deduplication"""
         return md5(content.encode('utf-8')).hexdigest()
 
+    def content_exists(self, content_hash):
+        """Check if content with this hash was saved before"""
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM contents WHERE hash = ?',
+                                     (content_hash,)).fetchone() is not None
+
     def get_results(self, limit=100, offset=0):
-        """Get stored results"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM results
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
-        return cursor.fetchall()
+        """Get stored results, newest first, as (id, url, content_hash, content, metadata, timestamp)"""
+        with self.lock:
+            return self.conn.execute('''
+                SELECT v.id, u.url, v.content_hash, c.content, v.metadata, v.fetched_at
+                FROM page_versions v
+                JOIN urls u ON u.id = v.url_id
+                JOIN contents c ON c.hash = v.content_hash
+                ORDER BY v.fetched_at DESC, v.id DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset)).fetchall()
 
     def search_results(self, query):
         """Search stored results"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM results
-            WHERE content LIKE ?
-            ORDER BY timestamp DESC
-        ''', (f'%{query}%',))
-        return cursor.fetchall()
+        with self.lock:
+            return self.conn.execute('''
+                SELECT v.id, u.url, v.content_hash, c.content, v.metadata, v.fetched_at
+                FROM contents c
+                JOIN page_versions v ON v.content_hash = c.hash
+                JOIN urls u ON u.id = v.url_id
+                WHERE c.content LIKE ?
+                ORDER BY v.fetched_at DESC, v.id DESC
+            ''', (f'%{query}%',)).fetchall()
+
+    def get_versions(self, url):
+        """Versions of one URL, newest first, as (fetched_at, status, bytes, content_hash, metadata)"""
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT v.fetched_at, v.status, v.bytes, v.content_hash, v.metadata
+                FROM page_versions v JOIN urls u ON u.id = v.url_id
+                WHERE u.url = ?
+                ORDER BY v.fetched_at DESC, v.id DESC
+            ''', (url,)).fetchall()
+        return [row[:4] + (json.loads(row[4]) if row[4] else None,) for row in rows]
+
+    def host_report(self, since=None, until=None, limit=None):
+        """
+        Pages and bytes per host, from the daily aggregates.
+
+        Args:
+            since (str): First day included, YYYY-MM-DD
+            until (str): Last day included, YYYY-MM-DD
+            limit (int): Only the hosts with the most pages
+
+        Returns:
+            list: (host, pages, bytes) tuples, most pages first
+        """
+        with self.lock:
+            return self.conn.execute('''
+                SELECT h.name, SUM(s.pages), SUM(s.bytes)
+                FROM host_daily_stats s JOIN hosts h ON h.id = s.host_id
+                WHERE s.day >= COALESCE(?, '') AND s.day <= COALESCE(?, '9999')
+                GROUP BY s.host_id
+                ORDER BY SUM(s.pages) DESC, h.name
+                LIMIT COALESCE(?, -1)
+            ''', (since, until, limit)).fetchall()
+
+    def daily_report(self, host=None, since=None, until=None):
+        """Pages and bytes per day, for one host or all: (day, pages, bytes) tuples"""
+        with self.lock:
+            return self.conn.execute('''
+                SELECT s.day, SUM(s.pages), SUM(s.bytes)
+                FROM host_daily_stats s JOIN hosts h ON h.id = s.host_id
+                WHERE (? IS NULL OR h.name = ?)
+                  AND s.day >= COALESCE(?, '') AND s.day <= COALESCE(?, '9999')
+                GROUP BY s.day
+                ORDER BY s.day
+            ''', (host, host, since, until)).fetchall()
+
+    def status_report(self, host=None, since=None, until=None):
+        """Pages per HTTP status (0 if unknown), for one host or all: (status, pages) tuples"""
+        with self.lock:
+            return self.conn.execute('''
+                SELECT s.status, SUM(s.pages)
+                FROM host_daily_status s JOIN hosts h ON h.id = s.host_id
+                WHERE (? IS NULL OR h.name = ?)
+                  AND s.day >= COALESCE(?, '') AND s.day <= COALESCE(?, '9999')
+                GROUP BY s.status
+                ORDER BY s.status
+            ''', (host, host, since, until)).fetchall()
+
+    def top_duplicates(self, limit=10):
+        """
+        Contents shared by the most URLs.
+
+        Returns:
+            list: (content_hash, urls, versions, example_url) tuples
+        """
+        with self.lock:
+            return self.conn.execute('''
+                SELECT c.hash, c.urls, c.versions,
+                       (SELECT u.url FROM page_versions v JOIN urls u ON u.id = v.url_id
+                        WHERE v.content_hash = c.hash LIMIT 1)
+                FROM contents c
+                WHERE c.urls > 1
+                ORDER BY c.urls DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
+
+    def get_statistics(self):
+        """Totals over everything stored"""
+        with self.lock:
+            pages, size = self.conn.execute(
+                'SELECT COALESCE(SUM(pages), 0), COALESCE(SUM(bytes), 0) FROM host_daily_stats'
+            ).fetchone()
+            hosts = self.conn.execute('SELECT COUNT(*) FROM hosts').fetchone()[0]
+            crawls = self.conn.execute('SELECT COUNT(*) FROM crawls').fetchone()[0]
+        return {'pages': pages, 'bytes': size, 'hosts': hosts, 'crawls': crawls}
 
     def close(self):
         """Close database connection"""
@@ -79,4 +384,4 @@ class DatabaseManager:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
\ No newline at end of file
+        self.close()
@@ -0,0 +1,476 @@
+"""
+Distributed crawling with a coordinator and leased batches of work.
+
+The coordinator owns the crawl frontier and the seen-set in a SQLite
+database. Workers lease a batch of queued URLs for a limited time, crawl it
+with the usual crawl_worker threads and report the batch together with
+every link discovered in it. A lease that is not reported (or renewed)
+before it expires is reclaimed and its URLs are issued again, so a crashed
+worker only costs its unfinished batch.
+
+While a politeness delay is configured a host is leased to one worker at a
+time, so each host is still fetched at most once per REQUEST_DELAY.
+
+Workers reach the coordinator either through its SQLite file (processes on
+the same machine) or through its HTTP API (any node):
+
+    python distributed.py serve https://example.com --max-depth 3
+    python distributed.py worker http://coordinator-host:8765
+    python distributed.py worker crawl_coordinator.db
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import config
+from crawl_frontier import CrawlFrontier, CrawlTask
+from error_log import log_error
+from url_filter import UrlFilter, normalize_url, scope_rules
+
+class CrawlCoordinator:
+    """
+    Frontier, seen-set and leases of one crawl, stored in SQLite.
+
+    Every URL ever discovered has a row in `urls`; its primary key is the
+    seen-set. Several processes may share the database file: each operation
+    runs in its own immediate transaction.
+    """
+
+    def __init__(self, db_file=None, host_exclusive=None):
+        self.db_file = db_file or config.COORDINATOR_DB
+        self.host_exclusive = config.REQUEST_DELAY > 0 if host_exclusive is None else host_exclusive
+        self.conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the coordinator tables"""
+        with self.lock:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    host TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    attempt INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    lease_id TEXT
+                );
+                CREATE INDEX IF NOT EXISTS urls_status_host ON urls (status, host);
+                CREATE INDEX IF NOT EXISTS urls_lease ON urls (lease_id);
+                CREATE TABLE IF NOT EXISTS leases (
+                    lease_id TEXT PRIMARY KEY,
+                    worker TEXT NOT NULL,
+                    expires REAL NOT NULL
+                );
+            ''')
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def settings(self):
+        """Crawl-wide settings, such as the start URL and maximum depth"""
+        with self.lock:
+            rows = self.conn.execute('SELECT key, value FROM settings').fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def seed(self, start_url, max_depth=1):
+        """Record the crawl settings and queue the start URL"""
+        start_url = normalize_url(start_url)
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', [
+                ('start_url', json.dumps(start_url)),
+                ('max_depth', json.dumps(max_depth))
+            ])
+        return self.add_urls([(start_url, 0)])
+
+    def add_urls(self, links):
+        """Queue (url, depth) pairs that were not seen before; returns how many were new"""
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO urls (url, host, depth) VALUES (?, ?, ?)',
+                [(url, urlparse(url).netloc, depth) for url, depth in links]
+            )
+            return conn.total_changes - before
+
+    def lease(self, worker, count=None, timeout=None):
+        """
+        Lease up to `count` queued URLs to a worker for `timeout` seconds.
+
+        Returns:
+            dict: lease_id, expires, tasks as [url, depth, attempt] lists and
+                finished, which is true once nothing is queued or leased
+        """
+        count = count or config.COORDINATOR_BATCH_SIZE
+        timeout = timeout or config.COORDINATOR_LEASE_TIMEOUT
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        with self.transaction() as conn:
+            self._reclaim_expired(conn, now)
+
+            busy = ''
+            if self.host_exclusive:
+                busy = "AND host NOT IN (SELECT DISTINCT host FROM urls WHERE status = 'leased')"
+            hosts = [row[0] for row in conn.execute(f'''
+                SELECT host FROM urls WHERE status = 'queued' {busy}
+                GROUP BY host ORDER BY MIN(rowid) LIMIT ?
+            ''', (count,))]
+
+            tasks = []
+            for host in hosts:
+                limit = min(count - len(tasks), config.COORDINATOR_HOST_BATCH)
+                tasks += conn.execute('''
+                    SELECT url, depth, attempt FROM urls
+                    WHERE status = 'queued' AND host = ?
+                    ORDER BY depth, rowid LIMIT ?
+                ''', (host, limit)).fetchall()
+                if len(tasks) >= count:
+                    break
+
+            if tasks:
+                conn.execute('INSERT INTO leases (lease_id, worker, expires) VALUES (?, ?, ?)',
+                             (lease_id, worker, now + timeout))
+                conn.executemany("UPDATE urls SET status = 'leased', lease_id = ? WHERE url = ?",
+                                 [(lease_id, url) for url, _, _ in tasks])
+                finished = False
+            else:
+                finished = conn.execute(
+                    "SELECT COUNT(*) FROM urls WHERE status IN ('queued', 'leased')"
+                ).fetchone()[0] == 0
+
+        return {
+            'lease_id': lease_id if tasks else None,
+            'expires': now + timeout,
+            'tasks': [list(task) for task in tasks],
+            'finished': finished
+        }
+
+    def renew(self, lease_id, timeout=None):
+        """Extend a lease; returns False if it already expired and was reclaimed"""
+        timeout = timeout or config.COORDINATOR_LEASE_TIMEOUT
+        with self.transaction() as conn:
+            cursor = conn.execute('UPDATE leases SET expires = ? WHERE lease_id = ?',
+                                  (time.time() + timeout, lease_id))
+            return cursor.rowcount > 0
+
+    def report(self, lease_id, urls, links=()):
+        """
+        Mark the URLs of a lease as done and queue the links found in them.
+
+        URLs whose lease expired in the meantime have already been queued
+        again and are left alone; the links are kept either way.
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE urls SET status = 'done', lease_id = NULL WHERE url = ? AND lease_id = ?",
+                [(url, lease_id) for url in urls]
+            )
+            conn.execute('DELETE FROM leases WHERE lease_id = ?', (lease_id,))
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO urls (url, host, depth) VALUES (?, ?, ?)',
+                [(url, urlparse(url).netloc, depth) for url, depth in links]
+            )
+            return {'added': conn.total_changes - before}
+
+    def stats(self):
+        """Number of URLs per status and active leases"""
+        with self.lock:
+            counts = dict(self.conn.execute('SELECT status, COUNT(*) FROM urls GROUP BY status'))
+            leases = self.conn.execute('SELECT COUNT(*) FROM leases').fetchone()[0]
+        counts = {status: counts.get(status, 0) for status in ('queued', 'leased', 'done', 'failed')}
+        counts['total'] = sum(counts.values())
+        counts['leases'] = leases
+        return counts
+
+    def _reclaim_expired(self, conn, now):
+        """Queue the URLs of expired leases again, giving up after too many attempts"""
+        expired = [row[0] for row in conn.execute(
+            'SELECT lease_id FROM leases WHERE expires < ?', (now,))]
+        for lease_id in expired:
+            conn.execute('''
+                UPDATE urls
+                SET status = CASE WHEN attempt + 1 >= ? THEN 'failed' ELSE 'queued' END,
+                    attempt = attempt + 1, lease_id = NULL
+                WHERE lease_id = ? AND status = 'leased'
+            ''', (config.COORDINATOR_MAX_ATTEMPTS, lease_id))
+            conn.execute('DELETE FROM leases WHERE lease_id = ?', (lease_id,))
+
+    def close(self):
+        """Close database connection"""
+        self.conn.close()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT on the coordinator's connection, under its lock"""
+
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+
+    def __enter__(self):
+        self.coordinator.lock.acquire()
+        self.coordinator.conn.execute('BEGIN IMMEDIATE')
+        return self.coordinator.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.coordinator.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.coordinator.lock.release()
+        return False
+
+class CoordinatorClient:
+    """Same interface as CrawlCoordinator, over the coordinator's HTTP API"""
+
+    def __init__(self, address):
+        import requests
+        self.address = address.rstrip('/')
+        self.session = requests.Session()
+
+    def call(self, method, **arguments):
+        response = self.session.post(f"{self.address}/{method}", json=arguments,
+                                     timeout=config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def settings(self):
+        return self.call('settings')
+
+    def seed(self, start_url, max_depth=1):
+        return self.call('seed', start_url=start_url, max_depth=max_depth)
+
+    def add_urls(self, links):
+        return self.call('add_urls', links=list(links))
+
+    def lease(self, worker, count=None, timeout=None):
+        return self.call('lease', worker=worker, count=count, timeout=timeout)
+
+    def renew(self, lease_id, timeout=None):
+        return self.call('renew', lease_id=lease_id, timeout=timeout)
+
+    def report(self, lease_id, urls, links=()):
+        return self.call('report', lease_id=lease_id, urls=list(urls), links=list(links))
+
+    def stats(self):
+        return self.call('stats')
+
+    def close(self):
+        self.session.close()
+
+# Coordinator methods callable over HTTP
+API_METHODS = ('settings', 'seed', 'add_urls', 'lease', 'renew', 'report', 'stats')
+
+def coordinator_handler(coordinator):
+    """Request handler class exposing a coordinator as POST /<method> with JSON arguments"""
+    from http.server import BaseHTTPRequestHandler
+
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.strip('/')
+            if method not in API_METHODS:
+                self.send_error(404)
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            arguments = json.loads(self.rfile.read(length) or b'{}')
+            try:
+                result = getattr(coordinator, method)(**arguments)
+            except (TypeError, ValueError, sqlite3.Error) as e:
+                self.send_error(400, str(e))
+                return
+            body = json.dumps(result).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CoordinatorHandler
+
+def start_server(coordinator, host=None, port=None):
+    """Serve a coordinator's API from a background thread"""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer(
+        (host or config.COORDINATOR_HOST, config.COORDINATOR_PORT if port is None else port),
+        coordinator_handler(coordinator)
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def connect(address):
+    """Open a coordinator by HTTP address or SQLite file path"""
+    if address.startswith(('http://', 'https://')):
+        return CoordinatorClient(address)
+    return CrawlCoordinator(address)
+
+class LeasedFrontier(CrawlFrontier):
+    """
+    Local frontier over one leased batch.
+
+    Tasks of the batch are crawled with the usual per-host politeness and
+    retries; discovered links are collected for the coordinator instead of
+    being crawled locally. on_new_host is called for the first task of
+    each host, as in CrawlFrontier.
+    """
+
+    def __init__(self, tasks, on_new_host=None):
+        super().__init__()
+        self.discovered = []
+        self.on_new_host = on_new_host
+        for url, depth, attempt in tasks:
+            self.seen.add(url)
+            self._enqueue(CrawlTask(url, depth, attempt))
+
+    def add(self, url, depth=0, lastmod=None):
+        with self._condition:
+            if url in self.seen:
+                return False
+            self.seen.add(url)
+            self.discovered.append((url, depth))
+            return True
+
+def run_worker(coordinator, worker_id=None, batch_size=None, lease_timeout=None, queue=None):
+    """
+    Lease batches from a coordinator and crawl them until the crawl is finished.
+
+    Args:
+        coordinator: A CrawlCoordinator or CoordinatorClient
+        worker_id (str): Name of this worker in the lease table
+        batch_size (int): URLs per lease (defaults to config.COORDINATOR_BATCH_SIZE)
+        lease_timeout (float): Seconds a lease lasts without renewal
+        queue (Queue): Optional queue for progress updates
+
+    Returns:
+        dict: The final metrics snapshot of this worker
+    """
+    import main
+    from crawl_metrics import CrawlMetrics
+    from recrawl_manager import RecrawlManager
+    from robots_manager import RobotsManager
+    import error_log
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    lease_timeout = lease_timeout or config.COORDINATOR_LEASE_TIMEOUT
+    settings = coordinator.settings()
+    start_url = settings['start_url']
+    config.MAX_DEPTH = settings['max_depth']
+    url_filter = UrlFilter(scope_rules(config.URL_FILTER_RULES, start_url))
+    main.prepare_session()
+    robots = RobotsManager(main.get_session()) if config.RESPECT_ROBOTS else None
+    main.metrics = metrics = CrawlMetrics(connections=main.connection_stats)
+
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    original_dir = os.getcwd()
+    try:
+        os.chdir(config.OUTPUT_DIR)
+        error_log.start(os.path.abspath(config.ERROR_LOG_FILE), queue)
+        if config.INCREMENTAL_CRAWL:
+            main.recrawl_manager = RecrawlManager(config.CRAWL_STATE_FILE)
+        main.start_page_stages()
+        main.watch_new_hosts()
+        on_new_host = main.preconnector.submit if main.preconnector is not None else None
+        metrics.start()
+        while True:
+            lease = coordinator.lease(worker_id, batch_size, lease_timeout)
+            if not lease['tasks']:
+                if lease['finished']:
+                    break
+                time.sleep(config.COORDINATOR_POLL_INTERVAL)
+                continue
+
+            frontier = LeasedFrontier(lease['tasks'], on_new_host)
+            done = threading.Event()
+            renewer = threading.Thread(
+                target=_renew_until, args=(coordinator, lease['lease_id'], lease_timeout, done),
+                daemon=True
+            )
+            renewer.start()
+            try:
+                with ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
+                    workers = [
+                        executor.submit(main.crawl_worker, frontier, start_url, queue, robots, url_filter)
+                        for _ in range(config.MAX_WORKERS)
+                    ]
+                    for worker in workers:
+                        worker.result()
+            finally:
+                done.set()
+                renewer.join()
+            coordinator.report(lease['lease_id'], [task[0] for task in lease['tasks']],
+                               frontier.discovered)
+        main.finish_page_stages()
+        return metrics.stop()
+    finally:
+        main.finish_page_stages(report=False)
+        error_log.stop()
+        if main.recrawl_manager is not None:
+            main.recrawl_manager.close()
+            main.recrawl_manager = None
+        os.chdir(original_dir)
+
+def _renew_until(coordinator, lease_id, timeout, done):
+    """Keep a lease alive while its batch is being crawled"""
+    while not done.wait(timeout / 3):
+        try:
+            coordinator.renew(lease_id, timeout)
+        except Exception as e:
+            log_error(f"Could not renew lease {lease_id}: {e}", stage='lease', error=e)
+
+def serve(start_url, max_depth=1, db_file=None, host=None, port=None):
+    """Seed a crawl, serve it to workers and return the stats once it is finished"""
+    coordinator = CrawlCoordinator(db_file)
+    coordinator.seed(start_url, max_depth)
+    server = start_server(coordinator, host, port)
+    print(f"Coordinator listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(config.COORDINATOR_POLL_INTERVAL)
+            stats = coordinator.stats()
+            if stats['queued'] == 0 and stats['leased'] == 0:
+                return stats
+    finally:
+        server.shutdown()
+        server.server_close()
+        coordinator.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed crawling with a shared coordinator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the coordinator for a crawl")
+    serve_parser.add_argument("url", help="URL to start scraping from")
+    serve_parser.add_argument("--max-depth", type=int, default=1)
+    serve_parser.add_argument("--db", default=config.COORDINATOR_DB, help="coordinator database")
+    serve_parser.add_argument("--host", default=config.COORDINATOR_HOST)
+    serve_parser.add_argument("--port", type=int, default=config.COORDINATOR_PORT)
+
+    worker_parser = commands.add_parser("worker", help="crawl batches leased from a coordinator")
+    worker_parser.add_argument("coordinator", help="coordinator URL (http://host:port) or database file")
+    worker_parser.add_argument("--threads", type=int, default=config.MAX_WORKERS)
+    worker_parser.add_argument("--batch-size", type=int, default=config.COORDINATOR_BATCH_SIZE)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == "serve":
+        stats = serve(args.url, args.max_depth, args.db, args.host, args.port)
+        print(f"Crawl finished: {stats['done']} pages done, {stats['failed']} failed")
+    else:
+        config.MAX_WORKERS = args.threads
+        snapshot = run_worker(connect(args.coordinator), batch_size=args.batch_size)
+        print(f"Worker finished: {snapshot['success']} pages scraped, {snapshot['failed']} failed")
@@ -0,0 +1,257 @@
+"""
+Structured, asynchronous error log for the crawl.
+
+Workers call log_error(), which counts the record per error class for the
+GUI summary, applies a per-class rate limit and only then puts the record
+on a bounded queue. A single listener thread formats the queued records as
+JSON lines (time, message, url, host, stage, error class, status, attempt)
+and writes them to a size-rotated file, so workers never touch the file and
+lines never interleave. The number of records a rate limit suppressed is
+written with the next record of that class once its window rolls over.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import config
+
+logger = logging.getLogger('scraper.errors')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+# Records logged while the writer is stopped are discarded, not printed
+logger.addHandler(logging.NullHandler())
+
+FIELDS = ('url', 'host', 'stage', 'error_class', 'status', 'attempt')
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'message': record.getMessage()
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        return json.dumps(entry, ensure_ascii=False)
+
+def error_key(record):
+    """Group records by exception class, or by stage for plain messages"""
+    return getattr(record, 'error_class', None) or getattr(record, 'stage', None) or 'other'
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `limit` records of each error key through per `window`
+    seconds. Runs in the logging threads, before records are queued.
+    """
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = error_key(record)
+        with self.lock:
+            started, passed, suppressed = self.windows.get(key, (0.0, 0, 0))
+            if record.created - started >= self.window:
+                if suppressed:
+                    record.suppressed = suppressed
+                self.windows[key] = (record.created, 1, 0)
+                return True
+            if passed < self.limit:
+                self.windows[key] = (started, passed + 1, suppressed)
+                return True
+            self.windows[key] = (started, passed, suppressed + 1)
+            return False
+
+    def pending(self):
+        """Suppressed counts not yet written, per error key"""
+        with self.lock:
+            return {key: suppressed for key, (_, _, suppressed) in self.windows.items() if suppressed}
+
+class ErrorSummary(logging.Filter):
+    """Counts every record per error class and keeps the latest messages"""
+
+    def __init__(self, recent=None):
+        super().__init__()
+        self.classes = {}
+        self.recent = deque(maxlen=recent or config.ERROR_LOG_RECENT)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = error_key(record)
+        with self.lock:
+            self.total += 1
+            entry = self.classes.get(key)
+            if entry is None:
+                entry = self.classes[key] = {'error_class': key, 'count': 0}
+            entry['count'] += 1
+            entry['last_message'] = record.getMessage()
+            entry['last_url'] = getattr(record, 'url', None)
+            entry['last_time'] = record.created
+            self.recent.append(record.getMessage())
+        return True
+
+    def snapshot(self):
+        with self.lock:
+            classes = sorted((dict(entry) for entry in self.classes.values()),
+                             key=lambda entry: entry['count'], reverse=True)
+            return {'total': self.total, 'classes': classes, 'recent': list(self.recent)}
+
+class ForwardHandler(logging.Handler):
+    """Forward formatted records to a GUI queue as ("log", line) messages"""
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def emit(self, record):
+        message = record.getMessage()
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            message += f" ({suppressed} similar errors suppressed)"
+        self.target.put(("log", message))
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_rate_limit = None
+_summary = ErrorSummary()
+
+def start(path=None, gui_queue=None):
+    """
+    Start the writer thread.
+
+    Args:
+        path (str): Log file (defaults to config.ERROR_LOG_FILE)
+        gui_queue (Queue): Optional GUI queue receiving rate-limited records
+    """
+    global _listener, _queue_handler, _rate_limit, _summary
+    with _lock:
+        if _listener is not None:
+            return
+        file_handler = logging.handlers.RotatingFileHandler(
+            path or config.ERROR_LOG_FILE,
+            maxBytes=config.ERROR_LOG_MAX_BYTES,
+            backupCount=config.ERROR_LOG_BACKUPS,
+            encoding='utf-8',
+            delay=True
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+        if gui_queue is not None:
+            handlers.append(ForwardHandler(gui_queue))
+
+        # Count every record first, then drop rate-limited ones before queueing
+        logger.removeFilter(_summary)
+        _summary = ErrorSummary()
+        _rate_limit = RateLimitFilter(config.ERROR_LOG_RATE_LIMIT, config.ERROR_LOG_RATE_WINDOW)
+        logger.addFilter(_summary)
+        logger.addFilter(_rate_limit)
+
+        _queue_handler = BoundedQueueHandler(queue.Queue(config.ERROR_LOG_QUEUE_SIZE))
+        logger.addHandler(_queue_handler)
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers)
+        _listener.start()
+
+def stop():
+    """Write every queued record and stop the writer thread"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        logger.removeHandler(_queue_handler)
+        logger.removeFilter(_rate_limit)
+        _listener.stop()
+        # Records still suppressed when the crawl ends are reported once
+        for key, suppressed in _rate_limit.pending().items():
+            record = logging.makeLogRecord({
+                'msg': f"{suppressed} more {key} errors suppressed",
+                'levelno': logging.ERROR, 'levelname': 'ERROR',
+                'error_class': key, 'suppressed': suppressed
+            })
+            for handler in _listener.handlers:
+                handler.handle(record)
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def log_error(message, url=None, stage=None, error=None, status=None, attempt=None):
+    """
+    Queue an error record; never blocks the calling worker.
+
+    Records logged while the writer is stopped are counted in summary() but
+    not written, so a stray call between crawls cannot open a log file that
+    the next crawl's start() would then leave in place.
+
+    Args:
+        message (str): Human readable description
+        url (str): URL being processed
+        stage (str): Pipeline stage that failed, e.g. 'fetch' or 'write'
+        error (Exception): The exception, whose class name is recorded
+        status (int): HTTP status code, if any
+        attempt (int): Fetch attempt number
+    """
+    logger.error(message, extra={
+        'url': url,
+        'host': urlparse(url).netloc if url else None,
+        'stage': stage,
+        'error_class': type(error).__name__ if error is not None else None,
+        'status': status,
+        'attempt': attempt
+    })
+
+def summary():
+    """Error counts per class, most frequent first, plus the latest messages"""
+    snapshot = _summary.snapshot()
+    snapshot['dropped'] = _queue_handler.dropped if _queue_handler is not None else 0
+    return snapshot
+
+def merge_summaries(summaries):
+    """Combine the summary() results of several crawl processes"""
+    merged = {'total': 0, 'classes': [], 'recent': [], 'dropped': 0}
+    classes = {}
+    for summary in summaries:
+        if not summary:
+            continue
+        merged['total'] += summary['total']
+        merged['dropped'] += summary['dropped']
+        merged['recent'] += summary['recent']
+        for entry in summary['classes']:
+            current = classes.get(entry['error_class'])
+            if current is None:
+                classes[entry['error_class']] = dict(entry)
+                continue
+            count = current['count'] + entry['count']
+            if entry['last_time'] > current['last_time']:
+                current.update(entry)
+            current['count'] = count
+    merged['classes'] = sorted(classes.values(), key=lambda entry: entry['count'], reverse=True)
+    merged['recent'] = merged['recent'][-config.ERROR_LOG_RECENT:]
+    return merged
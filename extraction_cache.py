@@ -0,0 +1,85 @@
+"""
+Extraction results memoized by the hash of the raw page body.
+
+Canonical duplicates, mirrors and recrawled pages often return the same
+bytes as a page already extracted. ExtractionCache keeps the extracted
+fields of a PageResult in a CacheManager database, keyed by the SHA-1 of
+the body and a fingerprint of everything that shapes the output: the
+trafilatura options, the trafilatura and BeautifulSoup versions and the
+version of extract_specific_data(). A hit skips trafilatura and every
+BeautifulSoup pass; changing any of those inputs changes the fingerprint,
+so stale results are never read and simply expire.
+"""
+import hashlib
+import json
+import threading
+from datetime import datetime
+import config
+from cache_manager import CacheManager
+
+# The PageResult fields filled in by extraction
+EXTRACTED_FIELDS = ('metadata', 'content', 'headings', 'paragraphs', 'tables', 'lists',
+                    'images', 'links')
+
+def fingerprint(options, extractor_version):
+    """
+    Identify the extraction setup.
+
+    Args:
+        options (dict): Keyword arguments passed to trafilatura.extract()
+        extractor_version (int): Version of the BeautifulSoup extraction
+
+    Returns:
+        str: A short hash that changes whenever the extraction output may
+    """
+    import bs4
+    import trafilatura
+    setup = {
+        'options': options,
+        'extractor': extractor_version,
+        'trafilatura': trafilatura.__version__,
+        'bs4': bs4.__version__,
+    }
+    return hashlib.sha1(json.dumps(setup, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+class ExtractionCache:
+    """Persistent raw-body-hash -> extracted fields cache"""
+
+    def __init__(self, options, extractor_version, cache_file=None):
+        self.cache = CacheManager(cache_file or config.EXTRACTION_CACHE_FILE)
+        self.cache.clear_expired()
+        self.fingerprint = fingerprint(options, extractor_version)
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(('hits', 'misses', 'stored'), 0)
+
+    def key(self, raw_hash):
+        return f"extract:{self.fingerprint}:{raw_hash}"
+
+    def load(self, raw_hash, result):
+        """
+        Fill a PageResult from the cache.
+
+        Returns:
+            bool: True if the body was extracted before with the same setup
+        """
+        cached = self.cache.get(self.key(raw_hash))
+        with self.lock:
+            self.stats['hits' if cached is not None else 'misses'] += 1
+        if cached is None:
+            return False
+        for name, value in json.loads(cached).items():
+            setattr(result, name, value)
+        result.metadata['timestamp'] = datetime.now().isoformat()
+        return True
+
+    def store(self, raw_hash, result):
+        """Remember the extracted fields of a PageResult"""
+        value = json.dumps({name: getattr(result, name) for name in EXTRACTED_FIELDS},
+                           ensure_ascii=False)
+        self.cache.set(self.key(raw_hash), value, config.EXTRACTION_CACHE_TTL)
+        with self.lock:
+            self.stats['stored'] += 1
+
+    def close(self):
+        self.cache.close()
+        return dict(self.stats)
@@ -0,0 +1,176 @@
+import re
+import config
+
+# Handlers for non-HTML responses, keyed by MIME type or "type/" prefix
+content_handlers = {}
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+class FetchError(Exception):
+    """A response that was deliberately not downloaded"""
+
+class ContentTooLargeError(FetchError):
+    pass
+
+class UnsupportedContentTypeError(FetchError):
+    pass
+
+class FetchResult:
+    __slots__ = ('url', 'status_code', 'headers', 'content_type', 'body', 'text', 'handled')
+
+    def __init__(self, url, status_code, headers, content_type, body=None, text=None, handled=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content_type = content_type
+        self.body = body
+        self.text = text
+        self.handled = handled
+
+    @property
+    def not_modified(self):
+        return self.status_code == 304
+
+def register_content_handler(content_type, handler):
+    """
+    Route responses of a content type to a handler instead of skipping them.
+
+    The handler is called as handler(url, response) with the still-open
+    streamed response and is responsible for reading (or not reading) the
+    body. A content type ending in "/" matches every subtype.
+    """
+    content_handlers[content_type.lower()] = handler
+
+def find_content_handler(content_type):
+    """Find the handler registered for a MIME type, if any"""
+    handler = content_handlers.get(content_type)
+    if handler is None and '/' in content_type:
+        handler = content_handlers.get(content_type.split('/', 1)[0] + '/')
+    return handler
+
+def fetch_page(session, url, max_size=None, headers=None):
+    """
+    Fetch a page by streaming its body with content-type and size guards.
+
+    The headers are inspected before any of the body is read: non-HTML
+    responses go to a registered handler or are skipped, and responses
+    announcing more than max_size bytes are rejected. Bodies without a
+    Content-Length are read in chunks and aborted once they exceed the cap,
+    so memory per fetch never grows past max_size.
+
+    Args:
+        session (requests.Session): Session used for the request
+        url (str): URL to fetch
+        max_size (int): Body size cap in bytes (defaults to config.MAX_CONTENT_SIZE)
+        headers (dict): Extra request headers, e.g. conditional request validators
+
+    Returns:
+        FetchResult: The fetched page with its raw body and decoded text, or
+            an empty result with status 304 for a conditional request
+
+    Raises:
+        requests.exceptions.RequestException: If the request failed
+        FetchError: If the response was not downloaded because of a guard
+    """
+    if max_size is None:
+        max_size = config.MAX_CONTENT_SIZE
+
+    response = session.get(url, headers=headers, timeout=config.REQUEST_TIMEOUT, stream=True)
+    try:
+        response.raise_for_status()
+        if response.status_code == 304:
+            return FetchResult(response.url, 304, response.headers, None)
+
+        header = response.headers.get('Content-Type', '')
+        content_type = header.split(';', 1)[0].strip().lower()
+
+        if content_type and content_type not in config.ALLOWED_CONTENT_TYPES:
+            handler = find_content_handler(content_type)
+            if handler is None:
+                raise UnsupportedContentTypeError(f"Unsupported content type {content_type}")
+            handler(url, response)
+            return FetchResult(response.url, response.status_code, response.headers,
+                               content_type, handled=True)
+
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > max_size:
+            raise ContentTooLargeError(f"Content-Length {content_length} exceeds {max_size} bytes")
+
+        body = read_body(response, max_size)
+        text = decode_body(body, header)
+        return FetchResult(response.url, response.status_code, response.headers,
+                           content_type, body, text)
+    finally:
+        response.close()
+
+def fetch_binary(session, url, content_types, max_size, sink=None):
+    """
+    Fetch a non-HTML resource, such as an image, with the same streaming guards.
+
+    Args:
+        session (requests.Session): Session used for the request
+        url (str): URL to fetch
+        content_types (tuple): Accepted MIME types; an entry ending in "/"
+            accepts every subtype
+        max_size (int): Body size cap in bytes
+        sink (callable): Optional; receives the body chunk by chunk instead
+            of it being kept in memory
+
+    Returns:
+        FetchResult: The response with its raw body (None with a sink) and
+            no decoded text
+
+    Raises:
+        requests.exceptions.RequestException: If the request failed
+        FetchError: If the response has another content type or is too large
+    """
+    response = session.get(url, timeout=config.REQUEST_TIMEOUT, stream=True)
+    try:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if not any(content_type == accepted or (accepted.endswith('/') and content_type.startswith(accepted))
+                   for accepted in content_types):
+            raise UnsupportedContentTypeError(f"Unsupported content type {content_type or 'none'}")
+
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > max_size:
+            raise ContentTooLargeError(f"Content-Length {content_length} exceeds {max_size} bytes")
+        return FetchResult(response.url, response.status_code, response.headers,
+                           content_type, read_body(response, max_size, sink))
+    finally:
+        response.close()
+
+def read_body(response, max_size, sink=None):
+    """
+    Read a streamed body in chunks, aborting once it exceeds max_size bytes.
+    With a sink the chunks are passed on as they arrive and None is returned.
+    """
+    body = bytearray()
+    size = 0
+    for chunk in response.iter_content(chunk_size=config.FETCH_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise ContentTooLargeError(f"Body exceeds {max_size} bytes")
+        if sink is None:
+            body += chunk
+        else:
+            sink(chunk)
+    return bytes(body) if sink is None else None
+
+def declared_charset(body, content_type_header=''):
+    """The charset named by the Content-Type header or a <meta> tag, or None"""
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type_header or '', re.IGNORECASE)
+    if match:
+        return match.group(1)
+    match = META_CHARSET.search(body[:4096])
+    if match:
+        return match.group(1).decode('ascii', 'ignore')
+    return None
+
+def decode_body(body, content_type_header=''):
+    """Decode an HTML body using the declared or sniffed charset"""
+    encoding = declared_charset(body, content_type_header)
+    try:
+        return body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
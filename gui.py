@@ -1,9 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog, Menu
 from main import main
+from crawl_metrics import format_bytes
+from profiler import CrawlProfiler
+import error_log
 import config
 import os
-import requests
 import threading
 from queue import Queue, Empty
 from urllib.parse import urlparse
@@ -44,7 +46,153 @@ class ToolTip:
         if tw:
             tw.destroy()
 
+class RingBuffer:
+    """Fixed-capacity list that drops its oldest items when full"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = [None] * capacity
+        self.start = 0
+        self.size = 0
+        self.total = 0
+
+    def append(self, item):
+        """Add an item, overwriting the oldest one if the buffer is full"""
+        index = (self.start + self.size) % self.capacity
+        self.items[index] = item
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+        self.total += 1
+
+    def clear(self):
+        """Remove every item"""
+        self.items = [None] * self.capacity
+        self.start = 0
+        self.size = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("ring buffer index out of range")
+        return self.items[(self.start + index) % self.capacity]
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
+
+class VirtualListView(ttk.Frame):
+    """
+    Scrollable list that only renders the rows currently visible.
+
+    The rows live in a RingBuffer model; the Text widget holds at most one
+    screenful of lines, so the cost of a refresh does not depend on how many
+    rows the model contains. The view follows new rows while scrolled to
+    the bottom.
+    """
+
+    def __init__(self, parent, model, format_row=str, on_select=None, **text_options):
+        super().__init__(parent)
+        self.model = model
+        self.format_row = format_row
+        self.on_select = on_select
+        self.first = 0
+        self.follow = True
+        self.selected = None
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        self.text = tk.Text(self, wrap=tk.NONE, cursor="arrow", **text_options)
+        self.text.grid(column=0, row=0, sticky="NSEW")
+        self.line_height = max(1, tkfont.Font(font=self.text.cget("font")).metrics("linespace"))
+        self.text.tag_configure("selected", background="#cce0ff")
+        self.text.config(state='disabled')
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.grid(column=1, row=0, sticky="NS")
+
+        self.text.bind("<Configure>", lambda event: self.refresh())
+        self.text.bind("<MouseWheel>", self.on_mousewheel)
+        self.text.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.text.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.text.bind("<Button-1>", self.on_click)
+
+    def visible_rows(self):
+        """Number of rows that fit in the widget"""
+        return max(1, self.text.winfo_height() // self.line_height)
+
+    def refresh(self):
+        """Redraw the visible window of rows"""
+        count = len(self.model)
+        rows = self.visible_rows()
+        if self.follow:
+            self.first = max(0, count - rows)
+        self.first = max(0, min(self.first, count - rows))
+        last = min(count, self.first + rows)
+
+        lines = [self.format_row(self.model[i]).replace("\n", " ") for i in range(self.first, last)]
+        self.text.config(state='normal')
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        if self.selected is not None and self.first <= self.selected < last:
+            line = self.selected - self.first + 1
+            self.text.tag_add("selected", f"{line}.0", f"{line}.end")
+        self.text.config(state='disabled')
+
+        if count:
+            self.scrollbar.set(self.first / count, last / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, first):
+        """Show rows starting at an index"""
+        rows = self.visible_rows()
+        self.first = max(0, min(first, len(self.model) - rows))
+        self.follow = self.first + rows >= len(self.model)
+        self.refresh()
+
+    def scroll_rows(self, delta):
+        self.scroll_to(self.first + delta)
+
+    def on_scrollbar(self, action, value, unit=None):
+        """Translate scrollbar commands into row offsets"""
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.model)))
+        elif action == "scroll":
+            step = self.visible_rows() if unit == "pages" else 1
+            self.scroll_rows(int(value) * step)
+
+    def on_mousewheel(self, event):
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+
+    def on_click(self, event):
+        """Select the clicked row and notify the listener"""
+        line = int(self.text.index(f"@{event.x},{event.y}").split(".")[0])
+        index = self.first + line - 1
+        if index < len(self.model):
+            self.selected = index
+            self.refresh()
+            if self.on_select:
+                self.on_select(self.model[index])
+        return "break"
+
+    def clear(self):
+        """Empty the model and the view"""
+        self.model.clear()
+        self.first = 0
+        self.follow = True
+        self.selected = None
+        self.refresh()
+
 class ScraperGUI:
+    # Upper bound on queue messages handled per refresh, keeps the UI responsive
+    MAX_MESSAGES_PER_FRAME = 2000
+
     def __init__(self, root):
         self.root = root
         self.root.title("Advanced Web Scraper")
@@ -139,6 +287,9 @@ class ScraperGUI:
         self.stop_btn = ttk.Button(button_frame, text="Stop", command=self.stop_scraping, state="disabled")
         self.stop_btn.grid(column=1, row=0, padx=5)
         ToolTip(self.stop_btn, "Stop the current scraping process")
+        self.profile_btn = ttk.Button(button_frame, text="Profile", command=self.start_profiling, state="disabled")
+        self.profile_btn.grid(column=2, row=0, padx=5)
+        ToolTip(self.profile_btn, f"Profile the running crawl for {config.PROFILE_DURATION} seconds")
 
         # Progress Section
         progress_frame = ttk.LabelFrame(self.mainframe, text="Progress", padding="10")
@@ -171,40 +322,99 @@ class ScraperGUI:
         self.failed_label.grid(column=2, row=0, padx=10)
         ToolTip(self.failed_label, "Number of pages that failed to scrape")
 
+        # Live throughput dashboard
+        dashboard_frame = ttk.Frame(progress_frame)
+        dashboard_frame.grid(column=0, row=3, sticky="EW", pady=5)
+        dashboard_frame.columnconfigure(0, weight=1)
+
+        rates_frame = ttk.Frame(dashboard_frame)
+        rates_frame.grid(column=0, row=0, sticky="W")
+        self.rate_label = ttk.Label(rates_frame, text="0.0 pages/s")
+        self.rate_label.grid(column=0, row=0, padx=10)
+        ToolTip(self.rate_label, "Pages finished per second")
+        self.bandwidth_label = ttk.Label(rates_frame, text="0.0 B/s")
+        self.bandwidth_label.grid(column=1, row=0, padx=10)
+        ToolTip(self.bandwidth_label, "Bytes downloaded per second")
+        self.in_flight_label = ttk.Label(rates_frame, text="In flight: 0")
+        self.in_flight_label.grid(column=2, row=0, padx=10)
+        ToolTip(self.in_flight_label, "Requests currently being fetched")
+        self.queue_label = ttk.Label(rates_frame, text="Queued: 0")
+        self.queue_label.grid(column=3, row=0, padx=10)
+        ToolTip(self.queue_label, "URLs waiting in the frontier, including retries")
+        self.latency_label = ttk.Label(rates_frame, text="Latency p50/p90/p99: -")
+        self.latency_label.grid(column=4, row=0, padx=10)
+        ToolTip(self.latency_label, "Fetch latency percentiles over recent requests")
+
+        self.hosts_tree = ttk.Treeview(
+            dashboard_frame,
+            columns=("pages", "rate", "bytes", "p50", "p90"),
+            height=4
+        )
+        self.hosts_tree.heading("#0", text="Host")
+        self.hosts_tree.heading("pages", text="Pages")
+        self.hosts_tree.heading("rate", text="Pages/s")
+        self.hosts_tree.heading("bytes", text="Downloaded")
+        self.hosts_tree.heading("p50", text="p50 ms")
+        self.hosts_tree.heading("p90", text="p90 ms")
+        for column in ("pages", "rate", "bytes", "p50", "p90"):
+            self.hosts_tree.column(column, width=90, anchor="e")
+        self.hosts_tree.grid(column=0, row=1, sticky="EW", pady=5)
+        ToolTip(self.hosts_tree, "Busiest hosts of the current crawl")
+
         # Results Section
         results_frame = ttk.LabelFrame(self.mainframe, text="Extracted Data", padding="10")
         results_frame.grid(column=0, row=2, sticky="NSEW", pady=5)
         results_frame.columnconfigure(0, weight=1)
         results_frame.rowconfigure(0, weight=1)
         
-        self.results_text = scrolledtext.ScrolledText(
-            results_frame,
-            width=100,
+        # Page list on the left, content of the selected page on the right
+        results_pane = ttk.PanedWindow(results_frame, orient=tk.HORIZONTAL)
+        results_pane.grid(column=0, row=0, sticky="NSEW")
+
+        self.results_model = RingBuffer(config.GUI_MAX_RESULTS)
+        self.results_view = VirtualListView(
+            results_pane,
+            self.results_model,
+            format_row=lambda page: f"{page['title']}  ({page['summary']})",
+            on_select=self.show_page,
+            width=50,
+            height=20,
+            font=tkfont.Font(family="Consolas", size=10)
+        )
+        results_pane.add(self.results_view, weight=1)
+        ToolTip(self.results_view.text, "Scraped pages; click one to view its content")
+
+        self.detail_text = scrolledtext.ScrolledText(
+            results_pane,
+            width=60,
             height=20,
             wrap=tk.WORD,
             font=tkfont.Font(family="Consolas", size=10)
         )
-        self.results_text.grid(column=0, row=0, sticky="NSEW")
-        self.results_text.config(state='disabled')
-        ToolTip(self.results_text, "Displays extracted content in real-time")
+        self.detail_text.config(state='disabled')
+        results_pane.add(self.detail_text, weight=2)
 
         # Logs Section
         logs_frame = ttk.LabelFrame(self.mainframe, text="Logs", padding="10")
         logs_frame.grid(column=0, row=3, sticky="NSEW", pady=5)
         logs_frame.columnconfigure(0, weight=1)
-        logs_frame.rowconfigure(0, weight=1)
+        logs_frame.rowconfigure(1, weight=1)
+
+        self.errors_label = ttk.Label(logs_frame, text="Errors: 0")
+        self.errors_label.grid(column=0, row=0, sticky="W")
+        ToolTip(self.errors_label, "Errors per class, including ones rate limited out of the log")
         
-        self.logs_text = scrolledtext.ScrolledText(
+        self.logs_model = RingBuffer(config.GUI_MAX_LOG_LINES)
+        self.logs_view = VirtualListView(
             logs_frame,
+            self.logs_model,
             width=100,
             height=10,
-            wrap=tk.WORD,
             font=tkfont.Font(family="Consolas", size=9)
         )
-        self.logs_text.grid(column=0, row=0, sticky="NSEW")
-        self.logs_text.config(state='disabled')
-        ToolTip(self.logs_text, "Displays logs and error messages")
-        
+        self.logs_view.grid(column=0, row=1, sticky="NSEW")
+        ToolTip(self.logs_view.text, "Displays logs and error messages")
+
         # Configure grid weights for better resizing
         self.mainframe.rowconfigure(0, weight=0)
         self.mainframe.rowconfigure(1, weight=0)
@@ -214,6 +424,7 @@ class ScraperGUI:
         # Message queue for thread communication
         self.queue = Queue()
         self.scraping_active = False
+        self.profiler = None
 
     def create_menu(self):
         """Create menu bar"""
@@ -250,7 +461,7 @@ class ScraperGUI:
 
     def export_results(self):
         """Export results to file"""
-        if not self.results_text.get("1.0", "end-1c"):
+        if not len(self.results_model):
             messagebox.showwarning("Warning", "No results to export")
             return
             
@@ -260,15 +471,21 @@ class ScraperGUI:
         )
         if file_path:
             try:
+                # Stream each saved page into the export instead of holding them all
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.results_text.get("1.0", "end-1c"))
+                    for page in self.results_model:
+                        f.write(f"# {page['title']}\n{page['url']}\n\n")
+                        with open(page['file'], 'r', encoding='utf-8') as page_file:
+                            for line in page_file:
+                                f.write(line)
+                        f.write("\n")
                 messagebox.showinfo("Success", "Results exported successfully")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export results: {str(e)}")
 
     def export_logs(self):
         """Export logs to file"""
-        if not self.logs_text.get("1.0", "end-1c"):
+        if not len(self.logs_model):
             messagebox.showwarning("Warning", "No logs to export")
             return
             
@@ -279,11 +496,24 @@ class ScraperGUI:
         if file_path:
             try:
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.logs_text.get("1.0", "end-1c"))
+                    f.write("\n".join(self.logs_model))
                 messagebox.showinfo("Success", "Logs exported successfully")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export logs: {str(e)}")
 
+    def show_page(self, page):
+        """Load a saved page from disk into the detail pane"""
+        try:
+            with open(page['file'], 'r', encoding='utf-8') as f:
+                content = f.read(config.GUI_MAX_DETAIL_CHARS)
+        except OSError as e:
+            content = f"Could not load {page['file']}: {str(e)}"
+
+        self.detail_text.config(state='normal')
+        self.detail_text.delete("1.0", tk.END)
+        self.detail_text.insert("1.0", content)
+        self.detail_text.config(state='disabled')
+
     def select_output_dir(self):
         """Select output directory"""
         directory = filedialog.askdirectory()
@@ -324,6 +554,7 @@ class ScraperGUI:
         config.MAX_WORKERS = self.threads_var.get()
 
         # Verify URL is accessible
+        import requests
         try:
             response = requests.head(url, timeout=5)
             if response.status_code >= 400:
@@ -334,26 +565,27 @@ class ScraperGUI:
             return
 
         # Clear previous results and logs
-        self.results_text.config(state='normal')
-        self.results_text.delete(1.0, tk.END)
-        self.results_text.config(state='disabled')
-        
-        self.logs_text.config(state='normal')
-        self.logs_text.delete(1.0, tk.END)
-        self.logs_text.config(state='disabled')
+        self.results_view.clear()
+        self.logs_view.clear()
+        self.detail_text.config(state='normal')
+        self.detail_text.delete(1.0, tk.END)
+        self.detail_text.config(state='disabled')
 
         # Initialize scraping state
         self.scraping_active = True
         self.start_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
+        self.profile_btn.config(state="normal")
         self.status.config(text="Scraping in progress...")
         self.progress.config(mode="indeterminate")
         self.progress.start()
         
         # Clear previous statistics
+        self.hosts_tree.delete(*self.hosts_tree.get_children())
         self.total_label.config(text="Total pages: 0")
         self.success_label.config(text="Successful: 0")
         self.failed_label.config(text="Failed: 0")
+        self.errors_label.config(text="Errors: 0")
         
         # Start scraping in separate thread
         self.scrape_thread = threading.Thread(
@@ -364,13 +596,26 @@ class ScraperGUI:
         self.scrape_thread.start()
         
         # Start checking for updates
-        self.root.after(100, self.process_queue)
+        self.root.after(config.GUI_REFRESH_MS, self.process_queue)
         
     def stop_scraping(self):
         """Stop the scraping process"""
         self.scraping_active = False
         self.status.config(text="Stopping...")
         
+    def start_profiling(self):
+        """Profile the running crawl for a bounded window"""
+        prefix = os.path.join(config.OUTPUT_DIR, config.PROFILE_OUTPUT)
+        self.profiler = CrawlProfiler(
+            prefix,
+            duration=config.PROFILE_DURATION,
+            on_finish=lambda reports: self.queue.put(("profile", reports))
+        )
+        self.profiler.start()
+        self.profile_btn.config(state="disabled")
+        self.logs_model.append(f"Profiling for {config.PROFILE_DURATION} seconds...")
+        self.logs_view.refresh()
+
     def run_scraping(self, url):
         """Run the scraping process in a separate thread"""
         try:
@@ -380,41 +625,94 @@ class ScraperGUI:
             self.queue.put(("error", str(e)))
             
     def process_queue(self):
-        """Process messages from the scraping thread"""
+        """
+        Process messages from the scraping thread.
+
+        Messages are drained into the models first and each view is redrawn
+        at most once per call, so a burst of pages costs one repaint.
+        """
+        progress = None
+        results_changed = False
+        logs_changed = False
+        finished = None
+
         try:
-            while True:
+            for _ in range(self.MAX_MESSAGES_PER_FRAME):
                 msg_type, content = self.queue.get_nowait()
-                
-                if msg_type == "complete":
-                    self.finish_scraping(success=True)
-                    
-                elif msg_type == "error":
-                    self.finish_scraping(success=False, error=content)
-                    
+
+                if msg_type in ("complete", "error"):
+                    finished = (msg_type, content)
+                    break
+
                 elif msg_type == "progress":
-                    self.total_label.config(text=f"Total pages: {content['total']}")
-                    self.success_label.config(text=f"Successful: {content['success']}")
-                    self.failed_label.config(text=f"Failed: {content['failed']}")
-                    self.progress.config(value=content['success'], maximum=content['total'])
-                    
+                    progress = content
+
                 elif msg_type == "data":
-                    self.results_text.config(state='normal')
-                    self.results_text.insert(tk.END, content + "\n")
-                    self.results_text.config(state='disabled')
-                    self.results_text.see(tk.END)
-                    
+                    self.results_model.append(content)
+                    results_changed = True
+
                 elif msg_type == "log":
-                    self.logs_text.config(state='normal')
-                    self.logs_text.insert(tk.END, content + "\n")
-                    self.logs_text.config(state='disabled')
-                    self.logs_text.see(tk.END)
-                    
+                    self.logs_model.append(content)
+                    logs_changed = True
+
+                elif msg_type == "profile":
+                    self.logs_model.append(f"Profile written to {content[0]} and {content[1]}")
+                    logs_changed = True
+                    if self.scraping_active:
+                        self.profile_btn.config(state="normal")
+
         except Empty:
             pass
-            
+
+        if progress is not None:
+            self.update_dashboard(progress)
+        if results_changed:
+            self.results_view.refresh()
+        if logs_changed:
+            self.logs_view.refresh()
+
+        if finished is not None:
+            msg_type, content = finished
+            if msg_type == "complete":
+                self.finish_scraping(success=True)
+            else:
+                self.finish_scraping(success=False, error=content)
+
         # Schedule next check if still active
         if self.scraping_active:
-            self.root.after(100, self.process_queue)
+            self.root.after(config.GUI_REFRESH_MS, self.process_queue)
+
+    def update_dashboard(self, snapshot):
+        """Show the latest metrics snapshot"""
+        self.total_label.config(text=f"Total pages: {snapshot['total']}")
+        self.success_label.config(text=f"Successful: {snapshot['success']}")
+        self.failed_label.config(text=f"Failed: {snapshot['failed']}")
+        self.progress.config(value=snapshot['done'], maximum=max(1, snapshot['total']))
+
+        self.rate_label.config(text=f"{snapshot['pages_per_second']:.1f} pages/s")
+        self.bandwidth_label.config(text=f"{format_bytes(snapshot['bytes_per_second'])}/s")
+        self.in_flight_label.config(text=f"In flight: {snapshot['in_flight']}")
+        self.queue_label.config(text=f"Queued: {snapshot['queue_depth']}")
+        latency = snapshot['latency']
+        if latency['p50'] is not None:
+            self.latency_label.config(
+                text=f"Latency p50/p90/p99: {latency['p50']:.0f}/{latency['p90']:.0f}/{latency['p99']:.0f} ms"
+            )
+
+        errors = error_log.summary()
+        self.errors_label.config(text=f"Errors: {errors['total']}" + "".join(
+            f", {entry['error_class']}: {entry['count']}" for entry in errors['classes'][:4]
+        ))
+
+        self.hosts_tree.delete(*self.hosts_tree.get_children())
+        for host in snapshot['hosts']:
+            self.hosts_tree.insert("", tk.END, text=host['host'], values=(
+                host['pages'],
+                f"{host['pages_per_second']:.1f}",
+                format_bytes(host['bytes']),
+                f"{host['latency']['p50']:.0f}" if host['latency']['p50'] is not None else "-",
+                f"{host['latency']['p90']:.0f}" if host['latency']['p90'] is not None else "-"
+            ))
 
     def finish_scraping(self, success=True, error=None):
         """Finish the scraping process"""
@@ -422,6 +720,13 @@ class ScraperGUI:
         self.progress.stop()
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
+        self.profile_btn.config(state="disabled")
+        if self.profiler is not None and self.profiler.running:
+            # The crawl is over, so end the window now and report here
+            self.profiler.on_finish = None
+            reports = self.profiler.stop()
+            self.logs_model.append(f"Profile written to {reports[0]} and {reports[1]}")
+            self.logs_view.refresh()
         
         if success:
             self.status.config(text="Scraping complete!")
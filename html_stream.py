@@ -0,0 +1,447 @@
+"""
+Streaming HTML extraction for pages too large to parse into a tree.
+
+BeautifulSoup keeps every tag and string of a page as Python objects; for
+a multi-megabyte page (a giant table, an infinite-scroll dump) that tree
+costs 10-20 times the page size in each worker. The parsers here run the
+page through the tokenizer BeautifulSoup's 'html.parser' builder uses, the
+standard library HTMLParser, and apply the builder's tree rules to a stack
+of the open elements only:
+
+- an end tag closes every element opened after the most recent open
+  element of its name, and is ignored if none is open;
+- void elements such as <img> close as soon as they open;
+- strings of ASCII whitespace collapse to one newline or space, except
+  inside <pre> and <textarea>;
+- text inside <script>, <style>, <template>, <rt> and <rp>, comments,
+  doctypes and processing instructions are not part of an element's text.
+
+An element is dropped as soon as it closes and its results are taken, so
+beyond the results themselves memory is bounded by how deeply the page
+nests, not by its size. PageParser fills a PageResult exactly as
+extract_specific_data() does from the tree, and clean_html() returns the
+same markup as ContentValidator.clean_html();
+benchmarks/html_stream_benchmark.py checks both on a corpus.
+"""
+import re
+from collections import Counter
+from datetime import datetime
+from html.entities import html5
+from html.parser import HTMLParser
+
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+))
+PRESERVE_WHITESPACE = frozenset(('pre', 'textarea'))
+# Strings anywhere inside these elements are not text of the elements around them
+STRING_CONTAINERS = frozenset(('rt', 'rp', 'style', 'script', 'template'))
+HEADINGS = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+META_NAMES = ('description', 'keywords', 'author')
+
+# Named character references as BeautifulSoup resolves them; unknown names stay "&name"
+ENTITIES = {}
+for _name, _character in sorted(html5.items()):
+    ENTITIES.setdefault(_name[:-1] if _name.endswith(';') else _name, _character)
+del _name, _character
+
+class Element:
+    """An open element and what is being collected from it"""
+
+    __slots__ = ('name', 'attrs', 'text', 'places', 'members', 'slot', 'children', 'first', 'state')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.text = None  # pieces of the element's text, if it is collected
+        self.places = None  # (list, index) pairs the stripped text goes to when it closes
+        self.members = None  # rows of a table, cells of a row or items of a list
+        self.slot = None  # index of a table or list in the results
+        self.children = None  # number of children, if they are counted
+        self.first = None  # first child, a string or an Element
+        self.state = None  # subclass specific
+
+class TreeParser(HTMLParser):
+    """
+    HTMLParser that applies BeautifulSoup's html.parser tree rules.
+
+    Subclasses implement start(element) and end(element), called as
+    elements open and close, and string(text, kind) for every finished
+    string, where kind is 'text', 'cdata', 'comment', 'doctype',
+    'declaration' or 'pi'. self.stack holds the open elements, innermost
+    last; it includes the element passed to start() but no longer the one
+    passed to end().
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack = []
+        self.open_names = Counter()
+        # Void elements whose end tag may still follow, by name; BeautifulSoup
+        # keeps a list, which makes every end tag slower on pages full of <img>
+        self.closed_void = Counter()
+        self.pending = []  # pieces of the string being read
+        self.preserve = 0  # open <pre> and <textarea> elements
+        self.containers = 0  # open STRING_CONTAINERS elements
+
+    def parse(self, html):
+        self.feed(html)
+        self.close()
+        return self
+
+    def close(self):
+        super().close()
+        self.end_data()
+        while self.stack:
+            self.pop()
+
+    def start(self, element):
+        pass
+
+    def end(self, element):
+        pass
+
+    def string(self, text, kind):
+        pass
+
+    def push(self, element):
+        self.stack.append(element)
+        self.open_names[element.name] += 1
+        if element.name in PRESERVE_WHITESPACE:
+            self.preserve += 1
+        if element.name in STRING_CONTAINERS:
+            self.containers += 1
+        self.start(element)
+
+    def pop(self):
+        element = self.stack.pop()
+        self.open_names[element.name] -= 1
+        if element.name in PRESERVE_WHITESPACE:
+            self.preserve -= 1
+        if element.name in STRING_CONTAINERS:
+            self.containers -= 1
+        self.end(element)
+        return element
+
+    def pop_to(self, name):
+        """Close the most recent open element called name and everything opened after it"""
+        if self.open_names[name]:
+            while self.pop().name != name:
+                pass
+
+    def end_data(self, kind='text'):
+        if not self.pending:
+            return
+        text = ''.join(self.pending)
+        self.pending = []
+        if not self.preserve and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        self.string(text, kind)
+
+    def handle_starttag(self, name, attrs, void=True):
+        attributes = {}
+        for key, value in attrs:
+            attributes[key] = '' if value is None else value
+        self.end_data()
+        self.push(Element(name, attributes))
+        if void and name in VOID_ELEMENTS:
+            self.pop()
+            self.closed_void[name] += 1
+
+    def handle_startendtag(self, name, attrs):
+        # <tag/> stays open if an earlier void <tag> is still expecting its end tag
+        self.handle_starttag(name, attrs, void=False)
+        self.handle_endtag(name)
+
+    def handle_endtag(self, name):
+        if self.closed_void[name]:
+            self.closed_void[name] -= 1
+        else:
+            self.end_data()
+            self.pop_to(name)
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    def handle_charref(self, name):
+        number = int(name[1:], 16) if name[:1] in ('x', 'X') else int(name)
+        data = None
+        if number < 256:
+            try:
+                data = bytes([number]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(number)
+            except (ValueError, OverflowError):
+                pass
+        self.pending.append(data or '\N{REPLACEMENT CHARACTER}')
+
+    def handle_entityref(self, name):
+        self.pending.append(ENTITIES.get(name, '&' + name))
+
+    def handle_comment(self, data):
+        self._special(data, 'comment')
+
+    def handle_decl(self, data):
+        self._special(data[len('DOCTYPE '):], 'doctype')
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._special(data[len('CDATA['):], 'cdata')
+        else:
+            self._special(data, 'declaration')
+
+    def handle_pi(self, data):
+        self._special(data, 'pi')
+
+    def _special(self, data, kind):
+        self.end_data()
+        self.pending.append(data)
+        self.end_data(kind)
+
+class PageParser(TreeParser):
+    """Fills a PageResult the way extract_specific_data() does from the tree"""
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+        self.captures = []  # open elements whose text is collected
+        self.open_tables = []
+        self.open_rows = []
+        self.open_lists = []
+        self.headings = []
+        self.paragraphs = []
+        self.tables = []
+        self.lists = []
+        self.meta = {}
+        self.title = None
+
+    def parse(self, html):
+        super().parse(html)
+        result = self.result
+        result.metadata = {
+            'title': self.title_string(),
+            'description': self.meta.get('description'),
+            'keywords': self.meta.get('keywords'),
+            'author': self.meta.get('author'),
+            'timestamp': datetime.now().isoformat()
+        }
+        result.headings = self.headings
+        result.paragraphs = [text for text in self.paragraphs if text]
+        result.tables = [rows for rows in self.tables if rows]
+        result.lists = [items for items in self.lists if items]
+        return result
+
+    def title_string(self):
+        """Text of the first <title>, if it holds exactly one string (BeautifulSoup's .string)"""
+        element = self.title
+        while element is not None and element.children == 1:
+            if isinstance(element.first, str):
+                return element.first or None
+            element = element.first
+        return None
+
+    def collect(self, element, *targets):
+        """Collect an element's text, to be stored at the end of each target list"""
+        element.text = []
+        element.places = []
+        for target in targets:
+            element.places.append((target, len(target)))
+            target.append(None)
+        self.captures.append(element)
+
+    def start(self, element):
+        name = element.name
+        attrs = element.attrs
+        if len(self.stack) > 1:
+            self._count_child(self.stack[-2], element)
+        if name in HEADINGS:
+            self.collect(element, self.headings)
+        elif name == 'p':
+            self.collect(element, self.paragraphs)
+        elif name == 'td' or name == 'th':
+            self.collect(element, *(row.members for row in self.open_rows))
+        elif name == 'li':
+            self.collect(element, *(list_element.members for list_element in self.open_lists))
+        elif name == 'tr':
+            element.members = []
+            for table in self.open_tables:
+                table.members.append(element.members)
+            self.open_rows.append(element)
+        elif name == 'table':
+            element.members = []
+            element.slot = len(self.tables)
+            self.tables.append(None)
+            self.open_tables.append(element)
+        elif name == 'ul' or name == 'ol':
+            element.members = []
+            element.slot = len(self.lists)
+            self.lists.append(None)
+            self.open_lists.append(element)
+        elif name == 'img':
+            if 'src' in attrs:
+                self.result.images.append(attrs['src'])
+        elif name == 'a':
+            if 'href' in attrs:
+                self.result.links.append(attrs['href'])
+        elif name == 'meta':
+            key = attrs.get('name')
+            if key in META_NAMES and key not in self.meta:
+                self.meta[key] = attrs.get('content')
+        elif name == 'title' and self.title is None:
+            self.title = element
+            element.children = 0
+
+    def end(self, element):
+        name = element.name
+        # Closed elements keep nothing alive: their text goes straight into the
+        # results, and the rows of a table and items of a list are plain lists
+        if element.text is not None:
+            self.captures.pop()
+            value = ''.join(element.text).strip()
+            for target, index in element.places:
+                target[index] = value
+        elif name == 'tr':
+            self.open_rows.pop()
+        elif name == 'table':
+            self.open_tables.pop()
+            self.tables[element.slot] = [cells for cells in element.members if cells]
+        elif name == 'ul' or name == 'ol':
+            self.open_lists.pop()
+            self.lists[element.slot] = element.members
+
+    def string(self, text, kind):
+        if self.stack:
+            self._count_child(self.stack[-1], text)
+        if kind == 'cdata' or (kind == 'text' and not self.containers):
+            for element in self.captures:
+                element.text.append(text)
+
+    @staticmethod
+    def _count_child(parent, child):
+        """Count the children of the title and its descendants, for title_string()"""
+        if parent.children is not None:
+            parent.children += 1
+            if parent.first is None:
+                parent.first = child
+            if isinstance(child, Element):
+                child.children = 0
+
+# Elements ContentValidator.clean_html() removes with everything inside them
+REMOVED_ELEMENTS = frozenset(('script', 'style', 'iframe', 'noscript'))
+# Attributes BeautifulSoup splits into lists of tokens, and writes back joined by one space
+MULTI_VALUED = {
+    '*': ('class', 'accesskey', 'dropzone'),
+    'a': ('rel', 'rev'), 'link': ('rel', 'rev'), 'td': ('headers',), 'th': ('headers',),
+    'form': ('accept-charset',), 'object': ('archive',), 'area': ('rel',), 'icon': ('sizes',),
+    'iframe': ('sandbox',), 'output': ('for',),
+}
+TOKEN = re.compile(r'\S+')
+META_CHARSET = re.compile(r"((^|;)\s*charset=)([^;]*)", re.M)
+STRING_MARKUP = {
+    'cdata': ('<![CDATA[', ']]>'),
+    'doctype': ('<!DOCTYPE ', '>\n'),
+    'declaration': ('<?', '?>'),
+    'pi': ('<?', '>'),
+}
+OUTPUT_ENCODING = 'utf-8'
+
+def escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def quote_attribute(value):
+    value = escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', '&quot;') + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+class CleanParser(TreeParser):
+    """
+    Writes a page without scripts, styles, frames and comments, the way
+    str() writes the tree ContentValidator.clean_html() cleaned.
+    """
+
+    def __init__(self, write):
+        super().__init__()
+        self.write = write
+        self.removed = 0  # open elements being removed
+        self.unwritten = []  # open void elements not written yet, see start()
+
+    def start(self, element):
+        if self.removed or element.name in REMOVED_ELEMENTS:
+            self.removed += 1
+            element.state = 'removed'
+        elif element.name in VOID_ELEMENTS:
+            # Written as <br/> if it closes empty, or as <br>...</br> once
+            # something is written inside it
+            self.unwritten.append(element)
+        else:
+            self._write_pending()
+            self.write(self.start_tag(element) + '>')
+
+    def end(self, element):
+        if element.state == 'removed':
+            self.removed -= 1
+        elif self.unwritten and self.unwritten[-1] is element:
+            self.unwritten.pop()
+            self._write_pending()
+            self.write(self.start_tag(element) + '/>')
+        else:
+            self.write('</' + element.name + '>')
+
+    def string(self, text, kind):
+        if self.removed or kind == 'comment':
+            return
+        self._write_pending()
+        if kind == 'text':
+            self.write(escape(text))
+        else:
+            prefix, suffix = STRING_MARKUP[kind]
+            self.write(prefix + text + suffix)
+
+    def _write_pending(self):
+        for element in self.unwritten:
+            self.write(self.start_tag(element) + '>')
+        self.unwritten = []
+
+    @staticmethod
+    def start_tag(element):
+        """The start tag without its closing '>'"""
+        name = element.name
+        attrs = dict(element.attrs)
+        multi_valued = MULTI_VALUED['*'] + MULTI_VALUED.get(name, ())
+        for key in attrs:
+            if key in multi_valued:
+                attrs[key] = ' '.join(TOKEN.findall(attrs[key]))
+        if name == 'meta':
+            # The declared encoding is rewritten to the output encoding
+            if 'charset' in attrs:
+                attrs['charset'] = OUTPUT_ENCODING
+            elif ('content' in attrs and 'http-equiv' in attrs
+                  and attrs['http-equiv'].lower() == 'content-type'):
+                attrs['content'] = META_CHARSET.sub(lambda match: match.group(1) + OUTPUT_ENCODING,
+                                                    attrs['content'])
+        tag = '<' + name
+        for key, value in sorted(attrs.items()):
+            tag += ' ' + key + '=' + quote_attribute(value)
+        return tag
+
+def clean_html(html):
+    """
+    Remove scripts, styles, frames and comments from a page.
+
+    Args:
+        html (str): The page
+
+    Returns:
+        str: The same markup as ContentValidator.clean_html() returns
+    """
+    pieces = []
+    CleanParser(pieces.append).parse(html)
+    return ''.join(pieces)
@@ -0,0 +1,228 @@
+"""
+The crawl's HTTP client: one requests session shared by every fetch.
+
+Page fetches, robots.txt, sitemaps, image downloads and the translation
+backend all go through the session made by create_session(). Its
+connection pools hold as many connections per host as the crawl can use at
+once (pool_size()), so keep-alive connections are reused for the whole
+crawl instead of being discarded once more threads than the requests
+default of 10 talk to one host. Host names are resolved through an
+in-process DNS cache with a TTL, and a Preconnector can open the connection
+to a host as soon as its first URL is queued. The counters in `stats` give
+the connection reuse rate reported with the crawl metrics.
+"""
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import config
+
+stats = dict.fromkeys(('requests', 'connections', 'discarded', 'dns_lookups', 'dns_hits'), 0)
+_stats_lock = threading.Lock()
+
+def count(name, amount=1):
+    with _stats_lock:
+        stats[name] += amount
+
+def connection_stats():
+    """Copy of the counters of every session made by create_session()"""
+    with _stats_lock:
+        return dict(stats)
+
+def pool_size():
+    """Connections per host the crawl can use at the same time"""
+    if config.HTTP_POOL_MAXSIZE:
+        return config.HTTP_POOL_MAXSIZE
+    size = config.MAX_WORKERS
+    if config.DOWNLOAD_ASSETS:
+        size += config.ASSET_DOWNLOAD_WORKERS
+    if config.OCR_ENABLED:
+        size += config.OCR_DOWNLOAD_WORKERS
+    if config.TRANSLATION_ENABLED:
+        size += config.TRANSLATION_WORKERS
+    return size
+
+class DnsCache:
+    """Resolved addresses by host name, kept for ttl seconds"""
+
+    def __init__(self, ttl=None):
+        self.ttl = config.DNS_CACHE_TTL if ttl is None else ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """
+        The addresses to connect to for a host, in getaddrinfo's order.
+
+        IP addresses are returned as they are. Every address is kept so a
+        connection can fall back to the next one, as urllib3 does for an
+        uncached lookup.
+        """
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(host)
+        if entry is not None and entry[0] > now:
+            count('dns_hits')
+            return entry[1]
+        addresses = list(dict.fromkeys(
+            info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)))
+        count('dns_lookups')
+        with self.lock:
+            self.entries[host] = (now + self.ttl, addresses)
+        return addresses
+
+    def forget(self, host):
+        """Drop a host whose cached address could not be connected to"""
+        with self.lock:
+            self.entries.pop(host, None)
+
+dns_cache = DnsCache()
+
+class CachedDnsConnection:
+    """Connects to the addresses in the DNS cache; TLS still verifies the host name"""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = dns_cache.resolve(host, self.port) if config.DNS_CACHE_TTL else []
+        except OSError:
+            # Let urllib3 look the host up again and raise its own error
+            addresses = []
+        if not addresses:
+            sock = super()._new_conn()
+            count('connections')
+            return sock
+        try:
+            # Each address in turn, like urllib3's create_connection()
+            for number, address in enumerate(addresses, 1):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except Exception:
+                    if number == len(addresses):
+                        dns_cache.forget(host)
+                        raise
+        finally:
+            self._dns_host = host
+        count('connections')
+        return sock
+
+class CrawlHTTPConnection(CachedDnsConnection, HTTPConnection):
+    pass
+
+class CrawlHTTPSConnection(CachedDnsConnection, HTTPSConnection):
+    pass
+
+class CountingPool:
+    """Counts requests and connections discarded because the pool was full"""
+
+    def urlopen(self, *args, **kwargs):
+        count('requests')
+        return super().urlopen(*args, **kwargs)
+
+    def _put_conn(self, conn):
+        if conn is not None and self.pool is not None and self.pool.full():
+            count('discarded')
+        super()._put_conn(conn)
+
+class CrawlHTTPConnectionPool(CountingPool, HTTPConnectionPool):
+    ConnectionCls = CrawlHTTPConnection
+
+class CrawlHTTPSConnectionPool(CountingPool, HTTPSConnectionPool):
+    ConnectionCls = CrawlHTTPSConnection
+
+class CrawlAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools resolve through the DNS cache and count connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CrawlHTTPConnectionPool,
+            'https': CrawlHTTPSConnectionPool,
+        }
+
+def mount_adapters(session, size=None):
+    """Mount fresh adapters with pools of the given size (default pool_size())"""
+    size = size or pool_size()
+    for prefix in ('http://', 'https://'):
+        old = session.adapters.get(prefix)
+        # Retries are not handled by the adapter: failed fetches are re-queued
+        # on the crawl frontier so workers never sleep through a backoff
+        session.mount(prefix, CrawlAdapter(pool_connections=config.HTTP_POOL_HOSTS,
+                                           pool_maxsize=size, max_retries=0))
+        if old is not None:
+            old.close()
+
+def create_session():
+    """A requests session with pools sized to the crawl's concurrency"""
+    session = requests.Session()
+    mount_adapters(session)
+    return session
+
+def fit_session(session):
+    """Enlarge a session's pools if the concurrency settings grew since it was made"""
+    adapter = session.get_adapter('https://')
+    if getattr(adapter, '_pool_maxsize', 0) < pool_size():
+        mount_adapters(session)
+
+def preconnect(session, url):
+    """Open a connection to a URL's host and leave it idle in the pool"""
+    request = requests.Request('GET', url).prepare()
+    # The same TLS and proxy settings as session.send(), so the same pool is used
+    settings = session.merge_environment_settings(url, {}, None, None, None)
+    pool = session.get_adapter(url).get_connection_with_tls_context(
+        request, settings['verify'], settings['proxies'], settings['cert'])
+    conn = pool._get_conn()
+    try:
+        if not conn.is_connected:
+            conn.connect()
+    except Exception:
+        conn.close()
+        raise
+    finally:
+        pool._put_conn(conn)
+
+class Preconnector:
+    """
+    Opens connections to new hosts in the background.
+
+    submit() is cheap and never blocks, so it can be called from under the
+    crawl frontier's lock; each host is connected to at most once.
+    """
+
+    def __init__(self, session, workers=None):
+        self.session = session
+        self.hosts = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers or config.HTTP_PRECONNECT_WORKERS,
+                                           thread_name_prefix='preconnect')
+
+    def submit(self, url):
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}/"
+        with self.lock:
+            if origin in self.hosts:
+                return
+            self.hosts.add(origin)
+        self.executor.submit(self._connect, origin)
+
+    def _connect(self, origin):
+        try:
+            preconnect(self.session, origin)
+        except Exception:
+            pass  # the real request reports the failure
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,280 @@
+"""
+Per-stage timing instrumentation for the scraping pipeline.
+
+Each stage of a page (connect, fetch, parse, extraction, screenshot, write,
+database insert) is timed into a latency histogram per stage and host:
+
+    with instrumentation.stage('fetch', host):
+        ...
+
+While instrumentation is disabled, stage() returns a shared no-op context
+manager, so the hot path pays for a single function call.
+"""
+import json
+import threading
+import time
+
+# Significant bits kept per power of two: 2**-5, about 3% relative error
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+BUCKET_COUNT = 512
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of durations in microseconds.
+
+    Values below 2**SUB_BUCKET_BITS get exact buckets; above that every
+    power of two is split into SUB_BUCKET_HALF linear buckets, so recording
+    is a bit_length and an index increment regardless of the value.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max', 'lock')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def bucket_index(micros):
+        shift = micros.bit_length() - SUB_BUCKET_BITS
+        if shift <= 0:
+            return micros
+        return min(BUCKET_COUNT - 1, shift * SUB_BUCKET_HALF + (micros >> shift))
+
+    @staticmethod
+    def bucket_bounds(index):
+        """Lowest and highest microsecond value falling in a bucket"""
+        if index < 2 * SUB_BUCKET_HALF:
+            return index, index
+        shift = index // SUB_BUCKET_HALF - 1
+        low = (index % SUB_BUCKET_HALF + SUB_BUCKET_HALF) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, seconds):
+        """Record one duration in seconds"""
+        micros = int(seconds * 1000000)
+        index = self.bucket_index(micros)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+
+    def merge(self, other):
+        """Add another histogram's samples to this one"""
+        with self.lock:
+            for index, count in enumerate(other.counts):
+                if count:
+                    self.counts[index] += count
+            self.count += other.count
+            self.total += other.total
+            if other.min is not None and (self.min is None or other.min < self.min):
+                self.min = other.min
+            if other.max is not None and (self.max is None or other.max > self.max):
+                self.max = other.max
+
+    def percentile(self, percent):
+        """Approximate a percentile in seconds"""
+        if not self.count:
+            return None
+        target = max(1, int(round(percent / 100 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.bucket_bounds(index)[1] / 1000000
+        return self.max
+
+    def buckets(self):
+        """Non-empty buckets as (upper bound in seconds, count)"""
+        return [(self.bucket_bounds(index)[1] / 1000000, count)
+                for index, count in enumerate(self.counts) if count]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9)
+        }
+
+class StageTimer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.record(time.perf_counter() - self.started)
+        return False
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+NULL_TIMER = NullTimer()
+
+enabled = False
+histograms = {}
+_lock = threading.Lock()
+_server = None
+_create_connection = None  # urllib3's original factory, saved by enable()
+
+def stage(name, host=''):
+    """Time a block as one sample of a stage for a host"""
+    if not enabled:
+        return NULL_TIMER
+    return StageTimer(get_histogram(name, host))
+
+def record(name, seconds, host=''):
+    """Record an already measured duration"""
+    if enabled:
+        get_histogram(name, host).record(seconds)
+
+def get_histogram(name, host=''):
+    key = (name, host or '')
+    histogram = histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = histograms.setdefault(key, LatencyHistogram())
+    return histogram
+
+def enable():
+    """Start collecting timings, including DNS + TCP connect times"""
+    global enabled, _create_connection
+    import urllib3.util.connection
+    enabled = True
+    if _create_connection is None:
+        _create_connection = urllib3.util.connection.create_connection
+    urllib3.util.connection.create_connection = _timed_create_connection
+
+def disable():
+    """Stop collecting timings"""
+    global enabled
+    enabled = False
+    if _create_connection is not None:
+        import urllib3.util.connection
+        urllib3.util.connection.create_connection = _create_connection
+
+def reset():
+    """Drop all collected timings"""
+    with _lock:
+        histograms.clear()
+
+def _timed_create_connection(address, *args, **kwargs):
+    """urllib3 connection factory that times name resolution plus connect"""
+    started = time.perf_counter()
+    try:
+        return _create_connection(address, *args, **kwargs)
+    finally:
+        record('connect', time.perf_counter() - started, address[0])
+
+def export_json():
+    """Histogram summaries and buckets per stage, overall and per host"""
+    with _lock:
+        items = list(histograms.items())
+
+    stages = {}
+    for (name, host), histogram in sorted(items):
+        entry = stages.setdefault(name, {'all': LatencyHistogram(), 'hosts': {}})
+        entry['all'].merge(histogram)
+        entry['hosts'][host] = dict(histogram.summary(), buckets=histogram.buckets())
+
+    return {
+        name: dict(entry['all'].summary(), hosts=entry['hosts'])
+        for name, entry in stages.items()
+    }
+
+def export_prometheus():
+    """Histograms in the Prometheus text exposition format"""
+    with _lock:
+        items = sorted(histograms.items())
+
+    lines = [
+        '# HELP scraper_stage_seconds Time spent in each scraping stage',
+        '# TYPE scraper_stage_seconds histogram'
+    ]
+    for (name, host), histogram in items:
+        labels = f'stage="{escape_label(name)}",host="{escape_label(host)}"'
+        cumulative = 0
+        for upper, count in histogram.buckets():
+            cumulative += count
+            lines.append(f'scraper_stage_seconds_bucket{{{labels},le="{upper:.6f}"}} {cumulative}')
+        lines.append(f'scraper_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'scraper_stage_seconds_sum{{{labels}}} {histogram.total:.6f}')
+        lines.append(f'scraper_stage_seconds_count{{{labels}}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def write_reports(path_prefix):
+    """Write <prefix>.json and <prefix>.prom with the current timings"""
+    with open(f"{path_prefix}.json", 'w', encoding='utf-8') as f:
+        json.dump(export_json(), f, indent=2)
+    with open(f"{path_prefix}.prom", 'w', encoding='utf-8') as f:
+        f.write(export_prometheus())
+    return f"{path_prefix}.json", f"{path_prefix}.prom"
+
+def metrics_handler():
+    """Request handler class serving the current timings"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = export_prometheus().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body = json.dumps(export_json()).encode('utf-8')
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+def start_server(port, host='127.0.0.1'):
+    """Serve /metrics (Prometheus) and /metrics.json from a background thread"""
+    global _server
+    from http.server import ThreadingHTTPServer
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), metrics_handler())
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
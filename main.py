@@ -4,47 +4,106 @@ Advanced Web Scraper
 This script scrapes content from websites and saves it in Markdown format.
 It uses the trafilatura library for robust content extraction.
 """
-import requests
+import argparse
 import os
+import threading
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from tqdm import tqdm
 import config
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import trafilatura
+import plugins
+from plugins import PluginUnavailable
+from crawl_metrics import CrawlMetrics, connection_reuse, format_bytes
+from recrawl_manager import RecrawlManager
+from fetcher import FetchError, fetch_page
+from page_result import PageResult
+import instrumentation
+import error_log
+from error_log import log_error
+from profiler import CrawlProfiler
+from url_filter import UrlFilter, normalize_url, scope_rules
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
 import re
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from datetime import datetime
-import json
-from PIL import Image
-import io
-
-# Configure retry strategy for network requests
-retry_strategy = Retry(
-    total=config.MAX_RETRIES,
-    backoff_factor=config.BACKOFF_FACTOR,
-    status_forcelist=[429, 500, 502, 503, 504]
-)
-
-# Create a requests session with retry capabilities
-session = requests.Session()
-adapter = HTTPAdapter(max_retries=retry_strategy)
-
-# Mount the adapter to handle both HTTP and HTTPS requests
-session.mount("http://", adapter)
-session.mount("https://", adapter)
-
-# Configure Selenium options
-chrome_options = Options()
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920,1080")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
+
+# requests, trafilatura, BeautifulSoup and tqdm are imported where they are
+# used and optional subsystems such as screenshots go through the plugins
+# registry, so `main.py --help` and the GUI start without loading them.
+
+# HTTP session shared by every fetch, created on first use by get_session()
+# (see http_client.py), and the preconnector attached by watch_new_hosts()
+session = None
+_session_lock = threading.Lock()
+preconnector = None
+
+# Counters and latency samples shared by the crawl workers, replaced by main()
+metrics = CrawlMetrics()
+
+# Per-URL crawl state, set by main() when incremental crawling is enabled
+recrawl_manager = None
+
+# Optional page stages, set by start_page_stages(): the image asset store
+# (config.DOWNLOAD_ASSETS), background OCR of page images (config.OCR_ENABLED)
+# and background translation of saved pages (config.TRANSLATION_ENABLED)
+asset_manager = None
+ocr_pipeline = None
+translation_pipeline = None
+
+# Extraction results by raw body hash (config.EXTRACTION_CACHE), set by start_page_stages()
+extraction_cache = None
+
+# Pre-extraction quality gate (config.CONTENT_GATE_ENABLED), set by start_page_stages()
+content_gate = None
+
+# Options for trafilatura.extract(); part of the extraction cache fingerprint
+TRAFILATURA_OPTIONS = {
+    'output_format': 'markdown',
+    'favor_precision': True,
+    'include_links': True,
+    'include_tables': True,
+    'include_images': True,
+    'include_formatting': True,
+    'include_comments': False,
+    'deduplicate': True,
+}
+# Bump when extract_specific_data() changes what it extracts, to invalidate cached results
+EXTRACTOR_VERSION = 1
+
+def get_session():
+    """Get the shared requests session, creating it on first use"""
+    global session
+    if session is None:
+        with _session_lock:
+            if session is None:
+                import http_client
+                session = http_client.create_session()
+    return session
+
+def connection_stats():
+    """The HTTP client's connection counters, or None before the session exists"""
+    if session is None:
+        return None
+    import http_client
+    return http_client.connection_stats()
+
+def prepare_session():
+    """Create the session, or enlarge its pools if the GUI raised the thread count"""
+    import http_client
+    http_client.fit_session(get_session())
+
+def watch_new_hosts(frontier=None):
+    """
+    Open connections to the hosts the frontier discovers, if HTTP_PRECONNECT is set.
+
+    Without a frontier only the preconnector is started; frontiers made
+    later can be given its submit() as their on_new_host.
+    """
+    global preconnector
+    if config.HTTP_PRECONNECT:
+        import http_client
+        if preconnector is None:
+            preconnector = http_client.Preconnector(get_session())
+        if frontier is not None:
+            frontier.on_new_host = preconnector.submit
 
 def create_filename(url):
     """Create a filename from the URL"""
@@ -58,42 +117,115 @@ def create_filename(url):
     filename = filename[:100]  # Limit length
     return filename
 
-def take_screenshot(url, output_dir):
-    """Take a screenshot of the webpage"""
+def take_screenshot(url):
+    """Take a screenshot of the webpage, if the screenshots plugin is available"""
     try:
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(url)
-        time.sleep(2)  # Wait for page to load
-        
-        # Create screenshot filename
-        filename = create_filename(url) + ".png"
-        screenshot_path = os.path.join(output_dir, filename)
-        
-        # Take screenshot
-        screenshot = driver.get_screenshot_as_png()
-        driver.quit()
-        
-        # Save screenshot
-        image = Image.open(io.BytesIO(screenshot))
-        image.save(screenshot_path)
-        return screenshot_path
-    except Exception as e:
+        screenshots = plugins.get('screenshots')
+    except PluginUnavailable:
         return None
+    return screenshots.take_screenshot(url, create_filename(url))
+
+def start_page_stages():
+    """Start the optional page stages enabled in config, in the output directory"""
+    global asset_manager, ocr_pipeline, translation_pipeline, extraction_cache, content_gate
+    if config.CONTENT_GATE_ENABLED:
+        from content_validator import ContentValidator
+        content_gate = ContentValidator({'content_filters': config.CONTENT_GATE_RULES})
+    if config.EXTRACTION_CACHE:
+        from extraction_cache import ExtractionCache
+        extraction_cache = ExtractionCache(TRAFILATURA_OPTIONS, EXTRACTOR_VERSION,
+                                           os.path.abspath(config.EXTRACTION_CACHE_FILE))
+    if config.DOWNLOAD_ASSETS:
+        from asset_manager import AssetManager
+        asset_manager = AssetManager(get_session())
+    if config.OCR_ENABLED:
+        ocr_pipeline = start_ocr(asset_manager)
+    if config.TRANSLATION_ENABLED:
+        translation_pipeline = start_translation()
+
+def finish_page_stages(report=True):
+    """Wait for the background work of the page stages and print what they did"""
+    global asset_manager, ocr_pipeline, translation_pipeline, extraction_cache, preconnector
+    global content_gate
+    if preconnector is not None:
+        preconnector.close()
+        preconnector = None
+    if content_gate is not None:
+        rejected = content_gate.rejected
+        content_gate = None
+        if report and rejected:
+            reasons = ', '.join(f"{count} {reason}" for reason, count in rejected.most_common())
+            print(f"\nContent gate: {sum(rejected.values())} pages rejected before extraction "
+                  f"({reasons})")
+    if extraction_cache is not None:
+        stats = extraction_cache.close()
+        extraction_cache = None
+        if report and stats['hits']:
+            print(f"\nExtraction cache: {stats['hits']} pages reused an earlier extraction, "
+                  f"{stats['misses']} extracted")
+    if translation_pipeline is not None:
+        stats = translation_pipeline.close()
+        translation_pipeline = None
+        if report and stats['pages']:
+            print(f"\nTranslation: {stats['segments']} segments on {stats['pages']} pages, "
+                  f"{stats['unique']} distinct, {stats['cached']} from cache, "
+                  f"{stats['translated']} translated in {stats['requests']} requests, "
+                  f"{stats['failed']} failed")
+    if ocr_pipeline is not None:
+        stats = ocr_pipeline.close()
+        ocr_pipeline = None
+        if report and stats['images']:
+            print(f"\nImages for OCR: {stats['images']} on {stats['pages']} pages, "
+                  f"{stats['downloaded']} downloaded, {stats['recognized']} recognised, "
+                  f"{stats['cached']} from cache, {stats['failed']} failed")
+    if asset_manager is not None:
+        stats = asset_manager.close()
+        asset_manager = None
+        if report and stats['referenced']:
+            print(f"\nImage assets: {stats['referenced']} referenced, {stats['downloaded']} stored "
+                  f"({format_bytes(stats['bytes'])}), {stats['reused']} reused, "
+                  f"{stats['deduplicated']} duplicates, {stats['failed']} failed")
+    if plugins.is_loaded('screenshots'):
+        stats = plugins.get('screenshots').close()
+        if report and stats['captured']:
+            print(f"\nScreenshots: {stats['captured']} captured, {stats['stored']} stored "
+                  f"({format_bytes(stats['bytes'])}), {stats['deduplicated']} near-duplicates, "
+                  f"{stats['failed']} failed")
+
+def start_ocr(assets=None):
+    """Start the OCR pipeline if tesseract can be run"""
+    try:
+        ocr = plugins.get('ocr')
+    except PluginUnavailable as e:
+        log_error(f"OCR disabled: {e}", stage='ocr', error=e)
+        return None
+    if ocr.tesseract_version() is None:
+        log_error("OCR disabled: the tesseract binary was not found", stage='ocr')
+        return None
+    return ocr.OcrPipeline(get_session(), os.path.abspath(config.OCR_CACHE_FILE), assets)
 
-def extract_metadata(html_content):
-    """Extract metadata from HTML"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    metadata = {
-        'title': soup.title.string if soup.title else None,
-        'description': soup.find('meta', attrs={'name': 'description'})['content'] 
-            if soup.find('meta', attrs={'name': 'description'}) else None,
-        'keywords': soup.find('meta', attrs={'name': 'keywords'})['content']
-            if soup.find('meta', attrs={'name': 'keywords'}) else None,
-        'author': soup.find('meta', attrs={'name': 'author'})['content']
-            if soup.find('meta', attrs={'name': 'author'}) else None,
+def start_translation():
+    """Start the translation pipeline with the configured backend"""
+    translation = plugins.get('translation')
+    try:
+        backend = translation.create_backend(config.TRANSLATION_BACKEND, get_session())
+    except (ImportError, ValueError) as e:
+        log_error(f"Translation disabled: {e}", stage='translation', error=e)
+        return None
+    return translation.TranslationPipeline(backend, os.path.abspath(config.TRANSLATION_CACHE_FILE))
+
+def extract_metadata(soup):
+    """Extract metadata from parsed HTML"""
+    def meta(name):
+        tag = soup.find('meta', attrs={'name': name})
+        return tag.get('content') if tag else None
+    return {
+        'title': str(soup.title.string) if soup.title and soup.title.string else None,
+        'description': meta('description'),
+        'keywords': meta('keywords'),
+        'author': meta('author'),
         'timestamp': datetime.now().isoformat()
     }
-    return metadata
 
 def validate_content(content):
     """Validate extracted content"""
@@ -107,29 +239,36 @@ def validate_content(content):
     paragraphs = [p for p in content.split('\n\n') if p.strip()]
     return len(content) >= min_length and len(paragraphs) >= min_paragraphs
 
-def extract_specific_data(html_content, queue=None):
-    """Extract specific data from HTML"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Extract various types of content
-    extracted_data = {
-        'headings': [],
-        'paragraphs': [],
-        'tables': [],
-        'lists': [],
-        'images': [],
-        'metadata': extract_metadata(html_content)
-    }
+def extract_specific_data(html_content, result):
+    """
+    Extract specific data from HTML into a PageResult.
+
+    The page is parsed once; headings, paragraphs, tables, lists, image
+    sources, link targets and metadata all come from the same tree. Pages
+    of config.STREAM_PARSE_THRESHOLD characters or more are not built into
+    a tree: html_stream.PageParser collects the same results while the
+    page streams through the parser.
+    """
+    if len(html_content) >= config.STREAM_PARSE_THRESHOLD:
+        from html_stream import PageParser
+        with instrumentation.stage('stream_parse'):
+            return PageParser(result).parse(html_content)
+
+    from bs4 import BeautifulSoup
+    with instrumentation.stage('parse'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+    result.metadata = extract_metadata(soup)
 
     # Extract headings
-    for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-        extracted_data['headings'].append(heading.get_text().strip())
+    result.headings = [heading.get_text().strip()
+                       for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])]
 
     # Extract paragraphs
     for paragraph in soup.find_all('p'):
         text = paragraph.get_text().strip()
         if text:
-            extracted_data['paragraphs'].append(text)
+            result.paragraphs.append(text)
 
     # Extract tables
     for table in soup.find_all('table'):
@@ -139,220 +278,344 @@ def extract_specific_data(html_content, queue=None):
             if cells:
                 rows.append(cells)
         if rows:
-            extracted_data['tables'].append(rows)
+            result.tables.append(rows)
 
     # Extract lists
     for list_tag in soup.find_all(['ul', 'ol']):
         items = [li.get_text().strip() for li in list_tag.find_all('li')]
         if items:
-            extracted_data['lists'].append(items)
+            result.lists.append(items)
 
-    # Extract image sources
-    for img in soup.find_all('img', src=True):
-        extracted_data['images'].append(img['src'])
+    # Extract image sources and link targets
+    result.images = [img['src'] for img in soup.find_all('img', src=True)]
+    result.links = [anchor['href'] for anchor in soup.find_all('a', href=True)]
+    return result
 
-    if queue:
-        # Format and send extracted data to GUI
-        formatted_data = []
-        if extracted_data['headings']:
-            formatted_data.append("## Headings\n" + "\n".join(f"- {h}" for h in extracted_data['headings']))
-        if extracted_data['paragraphs']:
-            formatted_data.append("## Paragraphs\n" + "\n".join(f"- {p}" for p in extracted_data['paragraphs']))
-        if extracted_data['tables']:
-            formatted_data.append("## Tables\n" + "\n".join(
-                f"Table {i+1}:\n" + "\n".join(" | ".join(row) for row in table)
-                for i, table in enumerate(extracted_data['tables'])
-            ))
-        if extracted_data['lists']:
-            formatted_data.append("## Lists\n" + "\n".join(
-                f"List {i+1}:\n" + "\n".join(f"- {item}" for item in lst)
-                for i, lst in enumerate(extracted_data['lists'])
-            ))
-        if extracted_data['images']:
-            formatted_data.append("## Images\n" + "\n".join(f"- {src}" for src in extracted_data['images']))
-        if extracted_data['metadata']:
-            formatted_data.append("## Metadata\n" + json.dumps(extracted_data['metadata'], indent=2))
-
-        if formatted_data:
-            queue.put(("data", "\n\n".join(formatted_data)))
-
-    return extracted_data
-
-def scrape_page(url, base_url, queue=None, depth=0):
+def scrape_page(url, base_url, queue=None, depth=0, lastmod=None):
     """
     Scrape a single webpage and extract its main content and links.
 
+    Pages rejected by the content gate are counted as skipped; they are not
+    extracted and their links are not followed. When incremental crawling
+    is enabled, pages that are not due for a recrawl, answer 304 Not
+    Modified, or have the same body or extracted content as last time are
+    not extracted or stored again; their links are taken from the stored
+    crawl state instead.
+
     Args:
         url (str): The full URL of the page to scrape.
         base_url (str): The base URL of the website.
         queue (Queue): Optional queue for progress updates
         depth (int): Current scraping depth
+        lastmod (float): Last modification time announced by a sitemap
 
     Returns:
-        None
+        list: Absolute URLs found on the page that should be crawled next
+
+    Raises:
+        requests.exceptions.RequestException: If the page could not be fetched
+        FetchError: If the response was skipped by a content-type or size guard
     """
-    global total_pages, successful_pages, failed_pages
+    state = None
+    headers = None
+    if recrawl_manager is not None:
+        state = recrawl_manager.get_state(url)
+        if not recrawl_manager.is_due(state, lastmod):
+            record_result(True, unchanged=True)
+            return follow_links(recrawl_manager.stored_links(state), depth)
+        headers = recrawl_manager.conditional_headers(state)
+
+    host = urlparse(url).netloc
+    metrics.request_started()
+    started = time.perf_counter()
+    size = 0
+    try:
+        with instrumentation.stage('fetch', host):
+            response = fetch_page(get_session(), url, headers=headers)
+        size = len(response.body) if response.body else 0
+    finally:
+        metrics.request_finished(host, time.perf_counter() - started, size)
+
+    if response.not_modified:
+        recrawl_manager.record_fetch(url, state, changed=False)
+        record_result(True, unchanged=True)
+        return follow_links(recrawl_manager.stored_links(state), depth)
+
+    if response.handled:
+        # A registered content handler consumed the non-HTML body
+        record_result(True)
+        return []
+
+    downloaded = response.text
+    if not downloaded:
+        log_error(f"Failed to download content from {url}", url=url, stage='fetch')
+        record_result(False)
+        return []
+
+    raw_hash = None
+    if recrawl_manager is not None:
+        raw_hash = recrawl_manager.hash_content(response.body)
+        if state and state['raw_hash'] == raw_hash:
+            recrawl_manager.record_fetch(url, state, changed=False, headers=response.headers)
+            record_result(True, unchanged=True)
+            return follow_links(recrawl_manager.stored_links(state), depth)
+
+    if content_gate is not None:
+        with instrumentation.stage('content_gate', host):
+            reason = content_gate.precheck(response.body, response.url,
+                                           response.headers.get('Content-Type', ''))
+        if reason is not None:
+            # Neither extracted nor stored, and its links are not followed
+            log_error(f"Rejected by content gate ({reason}): {url}", url=url, stage='gate')
+            metrics.count('skipped')
+            return []
+
+    from tqdm import tqdm
+
+    result = PageResult(url, response.url, depth)
+    if extraction_cache is not None:
+        raw_hash = raw_hash or RecrawlManager.hash_content(response.body)
+        with instrumentation.stage('extraction_cache', host):
+            cached = extraction_cache.load(raw_hash, result)
+    else:
+        cached = False
+
+    if not cached:
+        import trafilatura
+
+        # Extract specific data first, then the main content with trafilatura
+        with instrumentation.stage('extract_specific_data', host):
+            extract_specific_data(downloaded, result)
+
+        with instrumentation.stage('trafilatura_extract', host):
+            result.content = trafilatura.extract(downloaded, **TRAFILATURA_OPTIONS)
+
+        if extraction_cache is not None:
+            extraction_cache.store(raw_hash, result)
+
+    # Validate content
+    if not validate_content(result.content):
+        raise ValueError("Content validation failed")
+
+    # Resolve links against the page they were found on, after redirects
+    links = list(dict.fromkeys(
+        normalize_url(urljoin(response.url, href)) for href in result.links
+    ))
+
+    file_name = create_filename(url) + config.MARKDOWN_EXTENSION
+    if recrawl_manager is not None:
+        extracted_hash = recrawl_manager.hash_content(result.render('markdown', stored=False))
+        changed = not state or state['extracted_hash'] != extracted_hash
+        recrawl_manager.record_fetch(url, state, changed, response.headers,
+                                     raw_hash, extracted_hash, links)
+        if not changed and os.path.exists(file_name):
+            record_result(True, unchanged=True)
+            return follow_links(links, depth)
+
+    image_urls = [urljoin(response.url, src) for src in result.images]
+
+    # Store the page's images and point the content at them
+    if asset_manager is not None and image_urls:
+        with instrumentation.stage('assets', host):
+            assets = asset_manager.fetch_all(image_urls)
+        from asset_manager import link_assets
+        link_assets(result, assets)
+
+    # Take screenshot
+    if config.TAKE_SCREENSHOTS:
+        with instrumentation.stage('screenshot', host):
+            result.screenshot = take_screenshot(url)
 
     try:
-        time.sleep(config.REQUEST_DELAY)
-        response = session.get(url, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-
-        # Use trafilatura to extract main content in Markdown format
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            # Extract specific data first
-            extracted_data = extract_specific_data(downloaded, queue)
-            
-            extracted_content = trafilatura.extract(
-                downloaded,
-                output_format='markdown',
-                favor_precision=True,
-                include_links=True,
-                include_tables=True,
-                include_images=True,
-                include_formatting=True,
-                include_comments=False,
-                deduplicate=True
-            )
-
-            # Validate content
-            if not validate_content(extracted_content):
-                raise ValueError("Content validation failed")
-
-            # Combine extracted content with specific data
-            if extracted_content:
-                markdown_content = extracted_content + "\n\n"
-                if extracted_data['headings']:
-                    markdown_content += "## Extracted Headings\n" + "\n".join(f"- {h}" for h in extracted_data['headings']) + "\n\n"
-                if extracted_data['tables']:
-                    markdown_content += "## Extracted Tables\n" + "\n".join(
-                        f"Table {i+1}:\n" + "\n".join(" | ".join(row) for row in table)
-                        for i, table in enumerate(extracted_data['tables'])
-                    ) + "\n\n"
-                
-                # Take screenshot
-                screenshot_path = take_screenshot(url, config.OUTPUT_DIR)
-                if screenshot_path:
-                    markdown_content += f"## Screenshot\n![Screenshot]({os.path.basename(screenshot_path)})\n\n"
-        else:
-            log_error(f"Failed to download content from {url}")
-            failed_pages += 1
-            if queue:
-                queue.put(("progress", {
-                    "total": total_pages,
-                    "success": successful_pages,
-                    "failed": failed_pages
-                }))
+        with instrumentation.stage('write', host), open(file_name, 'w', encoding='utf-8') as f:
+            result.write(f)
+        if config.SAVE_JSON:
+            with open(create_filename(url) + '.json', 'w', encoding='utf-8') as f:
+                result.write(f, 'json')
+        tqdm.write(f"Saved {file_name}")
+        if ocr_pipeline is not None and image_urls:
+            # Recognised text is appended to the file in the background
+            ocr_pipeline.submit(url, image_urls, os.path.abspath(file_name))
+        if translation_pipeline is not None:
+            translation_pipeline.submit(url, ''.join(result.render()), os.path.abspath(file_name))
+    except Exception as e:
+        log_error(f"Error saving file {file_name}: {str(e)}", url=url, stage='write', error=e)
+        record_result(False)
+        return []
+
+    if queue:
+        # The GUI lists a short summary and loads the saved file on demand
+        queue.put(("data", {
+            "url": url,
+            "title": result.title,
+            "file": os.path.abspath(file_name),
+            "summary": result.summary()
+        }))
+    record_result(True)
+    return follow_links(links, depth)
+
+def follow_links(links, depth):
+    """Return the links to crawl from a page at the given depth"""
+    if depth >= config.MAX_DEPTH:
+        return []
+    return links
+
+def crawl_worker(frontier, base_url, queue=None, robots=None, url_filter=None):
+    """
+    Take tasks from the frontier until the crawl is finished.
+
+    A fetch that fails with a retryable error is parked on the frontier's
+    delay queue instead of being retried in place, so the worker moves on to
+    other ready URLs while the backoff runs. URLs disallowed by robots.txt
+    are skipped and a site's Crawl-delay is applied to its host. Discovered
+    links only enter the frontier if the URL filter accepts them.
+    """
+    import requests
+    from crawl_frontier import is_retryable, retry_delay
+
+    while True:
+        task = frontier.get()
+        if task is None:
             return
-        
-        if extracted_content:
-            successful_pages += 1
-            file_name = create_filename(url) + config.MARKDOWN_EXTENSION
 
-            try:
-                with open(file_name, 'w', encoding='utf-8') as f:
-                    f.write(markdown_content)
-                print(f"Saved {file_name}")
-            except Exception as e:
-                log_error(f"Error saving file {file_name}: {str(e)}")
-                failed_pages += 1
-                if queue:
-                    queue.put(("progress", {
-                        "total": total_pages,
-                        "success": successful_pages,
-                        "failed": failed_pages
-                    }))
-                return
-
-            # Extract links using trafilatura
-            try:
-                extracted_links = trafilatura.extract_links(downloaded) or []
-            except Exception as e:
-                log_error(f"Error extracting links from {url}: {str(e)}")
-                extracted_links = []
-            
-            if extracted_links and depth < config.MAX_DEPTH:
-                total_pages = len(scraped_urls)
-                with tqdm(total=total_pages, desc="Scraping Progress") as pbar:
-                    urls_to_scrape = []
-                    for link_data in extracted_links:
-                        link = link_data['href']
-                        full_url = urljoin(base_url, link)
-
-                        if full_url not in scraped_urls:
-                            scraped_urls.add(full_url)
-                            total_pages += 1
-                            pbar.total = total_pages
-                            urls_to_scrape.append(full_url)
-
-                    with ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-                        futures = {executor.submit(scrape_page, url, base_url, queue, depth+1): url for url in urls_to_scrape}
-                        for future in as_completed(futures):
-                            try:
-                                future.result()
-                            except Exception as e:
-                                log_error(f"Error processing page: {str(e)}")
-                                failed_pages += 1
-                            finally:
-                                pbar.update(1)
-                                if queue:
-                                    queue.put(("progress", {
-                                        "total": total_pages,
-                                        "success": successful_pages,
-                                        "failed": failed_pages
-                                    }))
-        else:
-            log_error(f"Could not extract content from {url}")
-            failed_pages += 1
-            if queue:
-                queue.put(("progress", {
-                    "total": total_pages,
-                    "success": successful_pages,
-                    "failed": failed_pages
-                }))
-
-    except requests.exceptions.Timeout as e:
-        log_error(f"Timeout error: {url} - {str(e)}")
-        failed_pages += 1
-        if queue:
-            queue.put(("progress", {
-                "total": total_pages,
-                "success": successful_pages,
-                "failed": failed_pages
-            }))
-        return
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 403:
-            log_error(f"Forbidden error: {url} - {str(e)}")
+        requeued = False
+        try:
+            if robots is not None:
+                if not robots.can_fetch(task.url):
+                    log_error(f"Blocked by robots.txt: {task.url}", url=task.url, stage='robots')
+                    metrics.count('skipped')
+                    continue
+                crawl_delay = robots.crawl_delay(task.url)
+                if crawl_delay:
+                    frontier.set_host_delay(
+                        urlparse(task.url).netloc,
+                        max(config.REQUEST_DELAY, min(crawl_delay, config.MAX_CRAWL_DELAY))
+                    )
+
+            with instrumentation.stage('page', urlparse(task.url).netloc):
+                links = scrape_page(task.url, base_url, queue, task.depth, task.lastmod)
+            for link in links:
+                if url_filter is not None and not url_filter.allows(link, task.depth + 1):
+                    continue
+                if frontier.add(link, task.depth + 1):
+                    metrics.count('discovered')
+        except FetchError as e:
+            log_error(f"Skipped {task.url}: {str(e)}", url=task.url, stage='fetch',
+                      error=e, attempt=task.attempt)
+            metrics.count('skipped')
+        except requests.exceptions.RequestException as e:
+            if is_retryable(e) and task.attempt < config.MAX_RETRIES:
+                frontier.retry(task, retry_delay(e, task.attempt))
+                requeued = True
+            else:
+                log_request_error(task.url, e, task.attempt)
+                record_result(False)
+        except Exception as e:
+            log_error(f"Error processing page: {str(e)}", url=task.url, stage='extract',
+                      error=e, attempt=task.attempt)
+            record_result(False)
+        finally:
+            if not requeued:
+                frontier.task_done()
+
+def seed_from_sitemaps(frontier, start_url, robots=None, since=None, url_filter=None):
+    """
+    Seed the frontier with the URLs listed in the site's sitemaps.
+
+    Sitemap URLs are taken from robots.txt, falling back to /sitemap.xml.
+    Entries on other hosts are ignored and entries whose lastmod is not newer
+    than `since` are skipped. Seeded pages are queued at MAX_DEPTH so they are
+    fetched without being expanded further.
+
+    Returns:
+        int: Number of URLs added to the frontier
+    """
+    parsed = urlparse(start_url)
+    sitemap_urls = robots.sitemaps(start_url) if robots is not None else []
+    if not sitemap_urls:
+        sitemap_urls = [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+
+    from sitemap_parser import SitemapParser
+    parser = SitemapParser(get_session())
+    added = 0
+    for sitemap_url in sitemap_urls:
+        for url, lastmod in parser.iter_urls(sitemap_url, since=since):
+            if urlparse(url).netloc != parsed.netloc:
+                continue
+            if url_filter is not None and not url_filter.allows(url, config.MAX_DEPTH):
+                continue
+            if frontier.add(url, config.MAX_DEPTH, lastmod=lastmod):
+                added += 1
+    return added
+
+def record_result(success, unchanged=False):
+    """Count the outcome of a page"""
+    if unchanged:
+        metrics.count('unchanged')
+    elif success:
+        metrics.count('success')
+    else:
+        metrics.count('failed')
+
+def progress_bar_listener(pbar):
+    """Create a metrics listener that drives a single tqdm progress bar"""
+    def update(snapshot):
+        pbar.total = snapshot['total']
+        pbar.n = snapshot['done']
+        pbar.set_postfix_str(
+            f"{snapshot['pages_per_second']:.1f} pages/s, "
+            f"{format_bytes(snapshot['bytes_per_second'])}/s, "
+            f"{snapshot['in_flight']} in flight, {snapshot['queue_depth']} queued",
+            refresh=False
+        )
+        pbar.refresh()
+    return update
+
+def log_request_error(url, error, attempt=None):
+    """Log a failed request with a message matching its error type"""
+    import requests
+    status = error.response.status_code if getattr(error, 'response', None) is not None else None
+    if isinstance(error, requests.exceptions.Timeout):
+        message = f"Timeout error: {url} - {str(error)}"
+    elif isinstance(error, requests.exceptions.HTTPError):
+        if status == 403:
+            message = f"Forbidden error: {url} - {str(error)}"
         else:
-            log_error(f"HTTP error: {url} - {str(e)}")
-        failed_pages += 1
-        if queue:
-            queue.put(("progress", {
-                "total": total_pages,
-                "success": successful_pages,
-                "failed": failed_pages
-            }))
-        return
-    except requests.exceptions.RequestException as e:
-        log_error(f"Request error: {url} - {str(e)}")
-        failed_pages += 1
-        if queue:
-            queue.put(("progress", {
-                "total": total_pages,
-                "success": successful_pages,
-                "failed": failed_pages
-            }))
-        return
-
-def log_error(message):
-    """Logs an error message to a file."""
-    with open('scraping_errors.log', 'a', encoding='utf-8') as log_file:
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"{timestamp} - {message}\n")
-
-def main(start_url, queue=None, max_depth=1):
+            message = f"HTTP error: {url} - {str(error)}"
+    else:
+        message = f"Request error: {url} - {str(error)}"
+    log_error(message, url=url, stage='fetch', error=error, status=status, attempt=attempt)
+
+def print_summary(snapshot, errors):
+    """Print the end-of-crawl report from a metrics snapshot and an error summary"""
+    total_pages = snapshot['total']
+    successful_pages = snapshot['success']
+    unchanged_pages = snapshot['unchanged']
+    print("\nScraping complete!")
+    print(f"Total pages discovered: {total_pages}")
+    print(f"Successfully scraped pages: {successful_pages}")
+    print(f"Failed pages: {snapshot['failed']}")
+    if unchanged_pages:
+        print(f"Unchanged pages: {unchanged_pages}")
+    if snapshot['skipped']:
+        print(f"Skipped pages: {snapshot['skipped']}")
+    if errors['total']:
+        print(f"Errors logged: {errors['total']} ("
+              + ", ".join(f"{entry['error_class']}: {entry['count']}" for entry in errors['classes'][:5])
+              + f") in {os.path.abspath(config.ERROR_LOG_FILE)}")
+    success_rate = ((successful_pages + unchanged_pages) / total_pages) * 100 if total_pages > 0 else 0
+    print(f"Success rate: {success_rate:.2f}%")
+    print(f"Throughput: {snapshot['done'] / max(snapshot['elapsed'], 1e-9):.2f} pages/s, "
+          f"{format_bytes(snapshot['bytes'])} downloaded")
+    connections = snapshot['connections']
+    if connections['requests']:
+        print(f"Connections: {connections['connections']} opened for {connections['requests']} "
+              f"requests ({connection_reuse(connections):.1%} reused), "
+              f"{connections['discarded']} discarded by full pools, "
+              f"{connections['dns_lookups']} DNS lookups")
+
+def main(start_url, queue=None, max_depth=1, use_sitemaps=None, since=None, incremental=None,
+         profile=None, processes=None):
     """
     Main function to start the scraping process.
 
@@ -360,39 +623,134 @@ def main(start_url, queue=None, max_depth=1):
         start_url (str): The URL to start scraping from
         queue (Queue): Optional queue for progress updates
         max_depth (int): Maximum scraping depth
+        use_sitemaps (bool): Seed the crawl from sitemaps (defaults to config.USE_SITEMAPS)
+        since (float): Skip sitemap entries not modified after this timestamp
+        incremental (bool): Skip unchanged pages using the crawl state kept in
+            the output directory (defaults to config.INCREMENTAL_CRAWL)
+        profile (float): Profile the first this many seconds of the crawl
+            and write the reports to the output directory
+        processes (int): Crawl with this many processes, splitting hosts
+            between them (defaults to config.CRAWL_PROCESSES, see sharding.py)
 
     Returns:
         None
     """
-    global scraped_urls, total_pages, successful_pages, failed_pages
-    scraped_urls = set([start_url])
-    total_pages = 1
-    successful_pages = 0
-    failed_pages = 0
+    global scraped_urls, total_pages, successful_pages, failed_pages, skipped_pages
+    global unchanged_pages, recrawl_manager, metrics
+    if processes is None:
+        processes = config.CRAWL_PROCESSES
+    if processes > 1:
+        import sharding
+        return sharding.crawl(start_url, queue, max_depth, use_sitemaps, since, incremental,
+                              processes, profile)
+
+    from tqdm import tqdm
+    from crawl_frontier import CrawlFrontier
+    from robots_manager import RobotsManager
+
+    start_url = normalize_url(start_url)
+    frontier = CrawlFrontier()
+    frontier.add(start_url)
+    scraped_urls = frontier.seen
     config.MAX_DEPTH = max_depth
+    prepare_session()
+    metrics = CrawlMetrics(queue_depth=frontier.pending, connections=connection_stats)
+    metrics.count('discovered')
+    watch_new_hosts(frontier)
+
+    robots = RobotsManager(get_session()) if config.RESPECT_ROBOTS else None
+    url_filter = UrlFilter(scope_rules(config.URL_FILTER_RULES, start_url))
+    if use_sitemaps is None:
+        use_sitemaps = config.USE_SITEMAPS
+    if use_sitemaps:
+        metrics.count('discovered', seed_from_sitemaps(frontier, start_url, robots, since, url_filter))
 
     os.makedirs(config.OUTPUT_DIR, exist_ok=True)
     original_dir = os.getcwd()
 
+    if incremental is None:
+        incremental = config.INCREMENTAL_CRAWL
+    if config.INSTRUMENTATION_ENABLED:
+        instrumentation.enable()
+        if config.INSTRUMENTATION_PORT:
+            instrumentation.start_server(config.INSTRUMENTATION_PORT)
+
+    profiler = None
     try:
         os.chdir(config.OUTPUT_DIR)
-        scrape_page(start_url, start_url, queue)
-
-        print("\nScraping complete!")
-        print(f"Total pages discovered: {total_pages}")
-        print(f"Successfully scraped pages: {successful_pages}")
-        print(f"Failed pages: {failed_pages}")
-        success_rate = (successful_pages / total_pages) * 100 if total_pages > 0 else 0
-        print(f"Success rate: {success_rate:.2f}%")
-
-        return successful_pages > 0
+        error_log.start(os.path.abspath(config.ERROR_LOG_FILE), queue)
+        recrawl_manager = RecrawlManager(config.CRAWL_STATE_FILE) if incremental else None
+        start_page_stages()
+        if profile:
+            profiler = CrawlProfiler(os.path.abspath(config.PROFILE_OUTPUT), duration=profile)
+            profiler.start()
+        with tqdm(total=1, desc="Scraping Progress") as pbar:
+            metrics.add_listener(progress_bar_listener(pbar))
+            if queue:
+                metrics.add_listener(lambda snapshot: queue.put(("progress", snapshot)))
+            metrics.start()
+            try:
+                with ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
+                    workers = [
+                        executor.submit(crawl_worker, frontier, start_url, queue, robots, url_filter)
+                        for _ in range(config.MAX_WORKERS)
+                    ]
+                    for worker in workers:
+                        worker.result()
+                finish_page_stages()
+            finally:
+                snapshot = metrics.stop()
+
+        total_pages = snapshot['total']
+        successful_pages = snapshot['success']
+        failed_pages = snapshot['failed']
+        skipped_pages = snapshot['skipped']
+        unchanged_pages = snapshot['unchanged']
+
+        error_log.stop()
+        print_summary(snapshot, error_log.summary())
+
+        if instrumentation.enabled:
+            json_path, _ = instrumentation.write_reports(config.INSTRUMENTATION_OUTPUT)
+            print(f"Stage timings written to {os.path.abspath(json_path)}")
+        if profiler is not None:
+            folded_path, allocations_path = profiler.stop()
+            print(f"Profile written to {folded_path} and {allocations_path}")
+
+        return successful_pages + unchanged_pages > 0
 
     finally:
+        if profiler is not None:
+            profiler.stop()
+        # Stages draining after an error still log; stop the log only then
+        finish_page_stages(report=False)
+        error_log.stop()
+        if recrawl_manager is not None:
+            recrawl_manager.close()
+            recrawl_manager = None
         os.chdir(original_dir)
 
+def parse_args(argv=None):
+    """Parse the command line"""
+    parser = argparse.ArgumentParser(description="Scrape a website into Markdown files")
+    parser.add_argument("url", help="URL to start scraping from")
+    parser.add_argument("--max-depth", type=int, default=1, help="maximum link depth to follow")
+    parser.add_argument("--sitemaps", action="store_true", default=None,
+                        help="seed the crawl from the site's sitemaps")
+    parser.add_argument("--full", action="store_true",
+                        help="refetch every page instead of skipping unchanged ones")
+    parser.add_argument("--profile", type=float, nargs="?", const=config.PROFILE_DURATION,
+                        metavar="SECONDS",
+                        help="profile the crawl for a bounded window "
+                             f"(default {config.PROFILE_DURATION}s) and write a flamegraph "
+                             "and allocation report to the output directory")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="crawl with N processes, each owning a share of the hosts "
+                             f"(default {config.CRAWL_PROCESSES})")
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) > 1:
-        main(sys.argv[1])
-    else:
-        print("Please provide a URL to scrape")
+    args = parse_args()
+    main(args.url, max_depth=args.max_depth, use_sitemaps=args.sitemaps,
+         incremental=False if args.full else None, profile=args.profile,
+         processes=args.processes)
@@ -0,0 +1,289 @@
+"""
+Text recognition in the images a page references, off the crawl path.
+
+scrape_page() hands the image URLs of a saved page to OcrPipeline.submit()
+and moves on. Download threads fetch each image URL once per crawl and hash
+its bytes; text already known for that hash, from this crawl or from the
+persistent cache, is reused, so logos and banners repeated across thousands
+of pages are recognised once. New images are collected into batches and
+recognised by tesseract in a pool of worker processes, each image with its
+own timeout. Once every image of a page is resolved, the recognised text is
+appended to the page's Markdown file.
+"""
+import hashlib
+import io
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+import pytesseract
+from PIL import Image
+import config
+from cache_manager import CacheManager
+from error_log import log_error
+from fetcher import FetchError, fetch_binary
+
+IMAGE_TYPES = ('image/',)
+
+def tesseract_version():
+    """Version of the tesseract binary, or None if it cannot be run"""
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except (pytesseract.TesseractNotFoundError, OSError):
+        return None
+
+def recognize_batch(images, language, timeout):
+    """
+    Worker process: recognise a batch of images.
+
+    Args:
+        images (list): (image_hash, bytes) pairs
+        language (str): tesseract language code(s), e.g. 'eng' or 'eng+deu'
+        timeout (float): Seconds allowed per image
+
+    Returns:
+        dict: image_hash -> (text, error message); text is None on failure
+    """
+    results = {}
+    for image_hash, data in images:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                text = pytesseract.image_to_string(image, lang=language, timeout=timeout)
+            results[image_hash] = (text.strip(), None)
+        except Exception as e:  # timeouts arrive as RuntimeError
+            results[image_hash] = (None, f"{type(e).__name__}: {e}")
+    return results
+
+class PageJob:
+    """The images of one page and the text recognised in them so far"""
+
+    __slots__ = ('url', 'file_name', 'image_urls', 'texts', 'remaining')
+
+    def __init__(self, url, file_name, image_urls):
+        self.url = url
+        self.file_name = file_name
+        self.image_urls = image_urls
+        self.texts = {}
+        self.remaining = len(image_urls)
+
+class OcrPipeline:
+    """
+    Downloads, deduplicates and recognises page images in the background.
+
+    Images are deduplicated twice: by URL (each URL is downloaded once, later
+    pages wait for or reuse that download) and by the SHA-1 of the bytes
+    (each distinct image is recognised once and cached for OCR_CACHE_TTL).
+    Given an AssetManager, images are read from the asset store instead of
+    being downloaded a second time.
+    """
+
+    def __init__(self, session, cache_file=None, assets=None):
+        self.session = session
+        self.assets = assets
+        self.cache = CacheManager(cache_file or config.OCR_CACHE_FILE)
+        self.downloads = ThreadPoolExecutor(max_workers=config.OCR_DOWNLOAD_WORKERS,
+                                            thread_name_prefix='ocr-download')
+        # Spawned, not forked: the crawl process is full of threads
+        self.pool = ProcessPoolExecutor(max_workers=config.OCR_PROCESSES,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.url_hashes = {}
+        self.url_waiters = {}
+        self.texts = {}
+        self.hash_waiters = {}
+        self.jobs = 0
+        self.stats = dict.fromkeys(('pages', 'images', 'downloaded', 'cached', 'recognized',
+                                    'failed'), 0)
+        self.batches = queue.Queue()
+        self.batcher = threading.Thread(target=self._batch_loop, name='ocr-batcher', daemon=True)
+        self.batcher.start()
+
+    def submit(self, page_url, image_urls, file_name):
+        """
+        Queue the images of a saved page; never blocks on I/O.
+
+        Args:
+            page_url (str): URL of the page
+            image_urls (list): Absolute image URLs found on the page
+            file_name (str): Markdown file the recognised text is appended to
+        """
+        image_urls = [url for url in dict.fromkeys(image_urls)
+                      if urlparse(url).scheme in ('http', 'https')][:config.OCR_MAX_IMAGES_PER_PAGE]
+        if not image_urls:
+            return
+        job = PageJob(page_url, file_name, image_urls)
+        ready = []
+        with self.lock:
+            self.jobs += 1
+            self.stats['pages'] += 1
+            self.stats['images'] += len(image_urls)
+            for image_url in image_urls:
+                if image_url in self.url_hashes:
+                    ready.append((image_url, self.url_hashes[image_url]))
+                elif image_url in self.url_waiters:
+                    self.url_waiters[image_url].append(job)
+                else:
+                    self.url_waiters[image_url] = [job]
+                    self.downloads.submit(self._download, image_url)
+        for image_url, image_hash in ready:
+            self._resolve(job, image_url, image_hash)
+
+    def close(self):
+        """Wait for every submitted page to be finished and stop the workers"""
+        with self.lock:
+            while self.jobs:
+                self.idle.wait()
+        self.batches.put(None)
+        self.batcher.join()
+        self.downloads.shutdown()
+        self.pool.shutdown()
+        self.cache.close()
+        return dict(self.stats)
+
+    def _download(self, image_url):
+        image_hash = data = None
+        try:
+            data = self._fetch(image_url)
+            if data is not None and len(data) >= config.OCR_MIN_IMAGE_BYTES:
+                image_hash = hashlib.sha1(data).hexdigest()
+            else:
+                data = None
+        except FetchError:
+            pass
+        except Exception as e:
+            log_error(f"Image download failed: {image_url} - {e}", url=image_url, stage='ocr', error=e)
+
+        with self.lock:
+            self.stats['downloaded'] += 1
+            self.url_hashes[image_url] = image_hash
+            waiters = self.url_waiters.pop(image_url, [])
+            # A known hash is always in texts or hash_waiters
+            new = (image_hash is not None and image_hash not in self.texts
+                   and image_hash not in self.hash_waiters)
+            if new:
+                self.hash_waiters[image_hash] = []
+        for job in waiters:
+            self._resolve(job, image_url, image_hash)
+        if new:
+            self._recognize(image_hash, data)
+
+    def _fetch(self, image_url):
+        """Image bytes, taken from the asset store when there is one"""
+        if self.assets is None:
+            return fetch_binary(self.session, image_url, IMAGE_TYPES, config.OCR_MAX_IMAGE_BYTES).body
+        asset = self.assets.fetch(image_url)
+        if asset is None or asset.size > config.OCR_MAX_IMAGE_BYTES or asset.content_type == 'image/svg+xml':
+            return None
+        with open(asset.path, 'rb') as f:
+            return f.read()
+
+    def _resolve(self, job, image_url, image_hash):
+        """Attach an image's text to a job, or wait for its recognition"""
+        if image_hash is None:
+            self._finish_image(job, image_url, None)
+            return
+        with self.lock:
+            if image_hash not in self.texts:
+                self.hash_waiters[image_hash].append((job, image_url))
+                return
+            text = self.texts[image_hash]
+        self._finish_image(job, image_url, text)
+
+    def _recognize(self, image_hash, data):
+        """Use the cached text of a new image or queue it for recognition"""
+        cached = self.cache.get(f"ocr:{image_hash}")
+        if cached is None:
+            self.batches.put((image_hash, data))
+            return
+        with self.lock:
+            self.stats['cached'] += 1
+        self._recognized({image_hash: (cached, None)})
+
+    def _batch_loop(self):
+        """Group queued images into batches for the worker processes"""
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self.batches.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # the batch waited long enough
+            if item:
+                batch.append(item)
+                deadline = deadline or time.monotonic() + config.OCR_BATCH_WAIT
+            if batch and (not item or len(batch) >= config.OCR_BATCH_SIZE):
+                self._submit_batch(batch)
+                batch, deadline = [], None
+            if item is None:
+                return
+
+    def _submit_batch(self, batch):
+        hashes = [image_hash for image_hash, _ in batch]
+        try:
+            future = self.pool.submit(recognize_batch, batch, config.OCR_LANGUAGE, config.OCR_TIMEOUT)
+        except Exception as e:  # the pool could not start or is broken
+            self._batch_done(None, hashes, e)
+            return
+        future.add_done_callback(lambda future: self._batch_done(future, hashes))
+
+    def _batch_done(self, future, hashes, error=None):
+        """Cache and distribute the results of a batch, or fail all of its images"""
+        try:
+            if error is not None:
+                raise error
+            results = future.result()
+        except Exception as e:  # e.g. a worker process died
+            results = {image_hash: (None, f"{type(e).__name__}: {e}") for image_hash in hashes}
+        for image_hash, (text, error) in results.items():
+            if text is None:
+                log_error(f"OCR failed for image {image_hash}: {error}", stage='ocr')
+            else:
+                self.cache.set(f"ocr:{image_hash}", text, config.OCR_CACHE_TTL)
+        with self.lock:
+            self.stats['recognized'] += sum(1 for text, _ in results.values() if text is not None)
+            self.stats['failed'] += sum(1 for text, _ in results.values() if text is None)
+        self._recognized(results)
+
+    def _recognized(self, results):
+        """Record recognised texts and hand them to every page waiting for them"""
+        finished = []
+        with self.lock:
+            for image_hash, (text, _) in results.items():
+                self.texts[image_hash] = text
+                finished += [(job, image_url, text)
+                             for job, image_url in self.hash_waiters.pop(image_hash, [])]
+        for job, image_url, text in finished:
+            self._finish_image(job, image_url, text)
+
+    def _finish_image(self, job, image_url, text):
+        with self.lock:
+            if text:
+                job.texts[image_url] = text
+            job.remaining -= 1
+            if job.remaining:
+                return
+        try:
+            self._write(job)
+        finally:
+            with self.lock:
+                self.jobs -= 1
+                if not self.jobs:
+                    self.idle.notify_all()
+
+    def _write(self, job):
+        """Append the text found in a page's images to its Markdown file"""
+        if not job.texts:
+            return
+        section = "## Text in Images\n" + "".join(
+            f"### {image_url}\n{job.texts[image_url]}\n\n"
+            for image_url in job.image_urls if image_url in job.texts
+        )
+        try:
+            with open(job.file_name, 'a', encoding='utf-8') as f:
+                f.write(section)
+        except OSError as e:
+            log_error(f"Error saving image text for {job.url}: {e}", url=job.url, stage='ocr', error=e)
@@ -0,0 +1,109 @@
+"""
+The extracted content of one page and its rendering.
+
+scrape_page() fills a PageResult as the page moves through fetch, extract,
+validate and store. Nothing is formatted on the way: render() yields the
+page as a stream of small string pieces in one of FORMATS and write() sends
+them straight to a file, so the content is never copied into a second,
+concatenated document. Markdown is what the crawl saves and JSON is the
+structured copy written with SAVE_JSON.
+"""
+import json
+import os
+
+FORMATS = ('markdown', 'json')
+
+class PageResult:
+    """What was extracted from a page, plus the files stored alongside it"""
+
+    __slots__ = ('url', 'final_url', 'depth', 'metadata', 'content', 'headings',
+                 'paragraphs', 'tables', 'lists', 'images', 'links', 'assets', 'screenshot')
+
+    def __init__(self, url, final_url=None, depth=0):
+        self.url = url
+        self.final_url = final_url or url
+        self.depth = depth
+        self.metadata = {}
+        self.content = None  # main content, Markdown from trafilatura
+        self.headings = []
+        self.paragraphs = []
+        self.tables = []  # each a list of rows, each a list of cell texts
+        self.lists = []
+        self.images = []  # image sources as written in the HTML
+        self.links = []  # link targets as written in the HTML
+        self.assets = []  # paths of the stored images
+        self.screenshot = None  # path of the screenshot
+
+    @property
+    def title(self):
+        return self.metadata.get('title') or self.url
+
+    def summary(self):
+        """One line describing what was extracted, for the GUI's result list"""
+        return (f"{len(self.headings)} headings, {len(self.paragraphs)} paragraphs, "
+                f"{len(self.tables)} tables, {len(self.images)} images")
+
+    def render(self, format='markdown', stored=True):
+        """
+        Render the page as a stream of string pieces.
+
+        Args:
+            format (str): One of FORMATS
+            stored (bool): Include the stored assets and screenshot; without
+                them the Markdown is what the page's extracted hash covers
+
+        Returns:
+            iterator: Pieces whose concatenation is the document
+        """
+        if format == 'markdown':
+            return self._markdown(stored)
+        if format == 'json':
+            return self._json(stored)
+        raise ValueError(f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}")
+
+    def write(self, f, format='markdown'):
+        """Stream the rendered page to an open text file"""
+        f.writelines(self.render(format))
+
+    def _markdown(self, stored):
+        yield self.content or ''
+        yield "\n\n"
+        if self.headings:
+            yield "## Extracted Headings\n"
+            for i, heading in enumerate(self.headings):
+                yield "\n- " if i else "- "
+                yield heading
+            yield "\n\n"
+        if self.tables:
+            yield "## Extracted Tables\n"
+            for i, table in enumerate(self.tables):
+                yield f"\nTable {i+1}:" if i else f"Table {i+1}:"
+                for row in table:
+                    yield "\n"
+                    yield " | ".join(row)
+            yield "\n\n"
+        if stored and self.assets:
+            yield "## Assets\n"
+            for path in self.assets:
+                yield f"- {path}\n"
+            yield "\n"
+        if stored and self.screenshot:
+            yield f"## Screenshot\n![Screenshot]({os.path.basename(self.screenshot)})\n\n"
+
+    def _json(self, stored):
+        fields = ['url', 'final_url', 'depth', 'metadata', 'content', 'headings', 'paragraphs',
+                  'tables', 'lists', 'images', 'links']
+        if stored:
+            fields += ['assets', 'screenshot']
+        for i, name in enumerate(fields):
+            yield ("{" if i == 0 else ",") + f'\n  "{name}": '
+            value = getattr(self, name)
+            if isinstance(value, list) and value:
+                # Item by item, so a long list is never serialised as one string
+                for j, item in enumerate(value):
+                    yield "[\n    " if j == 0 else ",\n    "
+                    yield json.dumps(item, ensure_ascii=False)
+                yield "\n  ]"
+            else:
+                yield json.dumps(value, ensure_ascii=False)
+        yield "\n}\n"
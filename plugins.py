@@ -0,0 +1,74 @@
+"""
+Registry of optional subsystems that are imported on first use.
+
+Each subsystem is registered by name with the module implementing it and
+the third-party packages that module needs, so importing main.py or gui.py
+loads none of them:
+
+    screenshots = plugins.get('screenshots')   # imports selenium and PIL now
+    screenshots.take_screenshot(url, path)
+
+get() imports the module once and raises PluginUnavailable, an ImportError,
+when one of its packages is missing. is_available() answers the same
+question without importing anything.
+"""
+import importlib
+import importlib.util
+import threading
+
+class PluginUnavailable(ImportError):
+    """An optional subsystem whose packages are not installed"""
+
+class Plugin:
+    __slots__ = ('name', 'module_name', 'requires', 'description', 'module')
+
+    def __init__(self, name, module_name, requires=(), description=''):
+        self.name = name
+        self.module_name = module_name
+        self.requires = tuple(requires)
+        self.description = description
+        self.module = None
+
+plugins = {}
+_lock = threading.Lock()
+
+def register(name, module_name, requires=(), description=''):
+    """
+    Register an optional subsystem.
+
+    Args:
+        name (str): Name used with get()
+        module_name (str): Module implementing the subsystem
+        requires (tuple): Top-level packages the module imports
+        description (str): Short description for diagnostics
+    """
+    plugins[name] = Plugin(name, module_name, requires, description)
+
+def get(name):
+    """Import a subsystem on first use and return its module"""
+    plugin = plugins[name]
+    if plugin.module is None:
+        with _lock:
+            if plugin.module is None:
+                try:
+                    plugin.module = importlib.import_module(plugin.module_name)
+                except ImportError as e:
+                    raise PluginUnavailable(
+                        f"{name} needs {', '.join(plugin.requires) or plugin.module_name}: {e}"
+                    ) from e
+    return plugin.module
+
+def is_available(name):
+    """Check whether a subsystem's packages are installed, without importing them"""
+    plugin = plugins[name]
+    return all(importlib.util.find_spec(package) is not None for package in plugin.requires)
+
+def is_loaded(name):
+    return plugins[name].module is not None
+
+register('screenshots', 'screenshots', ('selenium', 'PIL'),
+         'Page screenshots with headless Chrome')
+register('ocr', 'ocr', ('pytesseract', 'PIL'),
+         'Text recognition in page images with tesseract')
+register('translation', 'translation', (),
+         'Batched, cached translation of saved pages')
@@ -0,0 +1,214 @@
+"""
+Bounded profiling of a running crawl.
+
+CrawlProfiler samples the Python stack of every thread at a fixed interval
+(so worker threads started before profiling are covered too) and traces
+allocations with tracemalloc in short bursts, because tracing every
+allocation slows an lxml-heavy crawl down by an order of magnitude. When the
+window ends it writes:
+
+    <prefix>.folded            collapsed stacks, one "frame;frame;... count"
+                               line per stack, for flamegraph.pl, speedscope
+                               or inferno
+    <prefix>_allocations.txt   memory allocated in each burst and the top
+                               allocation sites per scraping stage
+
+Starting and stopping it does not pause the crawl, and it stops by itself
+after its duration, so it can be switched on for a window in production.
+"""
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+import config
+from crawl_metrics import format_bytes
+
+# Frames kept per allocation traceback
+TRACEMALLOC_FRAMES = 10
+
+# Allocation tracebacks are attributed to the first stage whose modules
+# appear in them, innermost frame first. Names match instrumentation stages.
+STAGE_MODULES = (
+    ('trafilatura_extract', ('trafilatura', 'justext', 'htmldate', 'courlan', 'lxml')),
+    ('parse', ('bs4', 'soupsieve', 'html5lib')),
+    ('stream_parse', ('html_stream.py',)),
+    ('screenshot', ('selenium', 'PIL')),
+    ('db_insert', ('sqlite3', 'database_manager.py', 'recrawl_manager.py')),
+    ('fetch', ('fetcher.py', 'requests', 'urllib3', 'http', 'ssl.py', 'socket.py')),
+)
+
+class CrawlProfiler:
+    """
+    Sampling CPU profile and allocation report for a bounded window.
+
+    Args:
+        output_prefix (str): Path prefix of the reports (defaults to config.PROFILE_OUTPUT)
+        duration (float): Seconds to profile before stopping on its own; None
+            profiles until stop() is called
+        interval (float): Seconds between stack samples
+        memory_interval (float): Seconds between the starts of allocation bursts
+        memory_window (float): Seconds allocations are traced in each burst
+        on_finish (callable): Called with the written report paths
+    """
+
+    def __init__(self, output_prefix=None, duration=None, interval=None,
+                 memory_interval=None, memory_window=None, on_finish=None):
+        self.output_prefix = output_prefix or config.PROFILE_OUTPUT
+        self.duration = duration
+        self.interval = interval or config.PROFILE_SAMPLE_INTERVAL
+        self.memory_interval = memory_interval or config.PROFILE_MEMORY_INTERVAL
+        self.memory_window = memory_window or config.PROFILE_MEMORY_WINDOW
+        self.on_finish = on_finish
+        self.stacks = Counter()
+        self.samples = 0
+        self.bursts = []
+        self.stages = defaultdict(lambda: {'size': 0, 'count': 0, 'sites': Counter(), 'blocks': Counter()})
+        self.reports = None
+        self._baseline = None
+        self._burst_started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sampling in a background thread"""
+        if self._thread is not None:
+            return
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='CrawlProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop profiling early and wait for the reports to be written"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.reports
+
+    def _run(self):
+        deadline = self._started + self.duration if self.duration else None
+        next_burst = self._started
+        try:
+            while not self._stop.wait(self.interval):
+                now = time.monotonic()
+                self.sample()
+                if self._burst_started is None and now >= next_burst:
+                    self.start_burst()
+                    next_burst = now + self.memory_interval
+                elif self._burst_started is not None and now - self._burst_started >= self.memory_window:
+                    self.end_burst()
+                if deadline is not None and now >= deadline:
+                    break
+        finally:
+            if self._burst_started is not None:
+                self.end_burst()
+        self.reports = self.write_reports()
+        if self.on_finish:
+            self.on_finish(self.reports)
+
+    def sample(self):
+        """Record the current stack of every other thread"""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            # Group pool threads such as ThreadPoolExecutor-0_3 together
+            stack.append(re.sub(r'[-_]\d+$', '', names.get(ident, 'thread')))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def start_burst(self):
+        """Start tracing allocations"""
+        if tracemalloc.is_tracing():
+            # Someone else is tracing: diff against the current state instead
+            self._baseline = self.take_snapshot()
+        else:
+            self._baseline = None
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._burst_started = time.monotonic()
+
+    def end_burst(self):
+        """Attribute the allocations still held at the end of a burst to stages"""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self.take_snapshot()
+        if self._baseline is None:
+            tracemalloc.stop()
+            stats = [(stat.traceback, stat.size, stat.count)
+                     for stat in snapshot.statistics('traceback')]
+        else:
+            stats = [(stat.traceback, stat.size_diff, stat.count_diff)
+                     for stat in snapshot.compare_to(self._baseline, 'traceback')]
+        self.bursts.append((self._burst_started - self._started,
+                            time.monotonic() - self._burst_started, current, peak))
+        self._burst_started = self._baseline = None
+
+        for traceback, size, count in stats:
+            if size <= 0:
+                continue
+            entry = self.stages[stage_for_traceback(traceback)]
+            site = f"{traceback[-1].filename}:{traceback[-1].lineno}"
+            entry['size'] += size
+            entry['count'] += max(0, count)
+            entry['sites'][site] += size
+            entry['blocks'][site] += max(0, count)
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def write_reports(self):
+        """Write the collapsed stacks and the allocation report"""
+        directory = os.path.dirname(self.output_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        folded_path = f"{self.output_prefix}.folded"
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        allocations_path = f"{self.output_prefix}_allocations.txt"
+        with open(allocations_path, 'w', encoding='utf-8') as f:
+            f.write(self.allocation_report())
+        return folded_path, allocations_path
+
+    def allocation_report(self, limit=None):
+        """Allocation bursts and the top allocation sites per stage"""
+        limit = limit or config.PROFILE_TOP_ALLOCATIONS
+        lines = [f"{self.samples} stack samples, {len(self.bursts)} allocation bursts", '',
+                 'Allocation bursts (start, length, still held at end / traced peak):']
+        for started, length, current, peak in self.bursts:
+            lines.append(f"  {started:7.1f}s  {length:4.1f}s  "
+                         f"{format_bytes(current)} / {format_bytes(peak)}")
+
+        lines += ['', 'Memory allocated during bursts and still held at their end, per stage:']
+        for stage, entry in sorted(self.stages.items(), key=lambda item: item[1]['size'], reverse=True):
+            lines.append('')
+            lines.append(f"[{stage}] {format_bytes(entry['size'])} in {entry['count']} blocks")
+            for site, size in entry['sites'].most_common(limit):
+                lines.append(f"  {format_bytes(size):>10}  {entry['blocks'][site]:>8} blocks  {site}")
+        return '\n'.join(lines) + '\n'
+
+def stage_for_traceback(traceback):
+    """Name the scraping stage an allocation traceback belongs to"""
+    for frame in reversed(traceback):
+        parts = frame.filename.replace('\\', '/').split('/')
+        for stage, modules in STAGE_MODULES:
+            if any(module in parts for module in modules):
+                return stage
+    return 'other'
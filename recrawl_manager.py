@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+import time
+from hashlib import sha1
+import config
+
+class RecrawlManager:
+    """
+    Per-URL crawl state used to make recrawls incremental.
+
+    For every URL it keeps the HTTP validators, a hash of the raw body, a
+    hash of the extracted content, the links found on the page and an
+    adaptive recrawl interval. A page is refetched only once its interval
+    has passed; the interval halves when a change is seen and grows by half
+    when the page is unchanged, within RECRAWL_MIN_INTERVAL and
+    RECRAWL_MAX_INTERVAL.
+    """
+
+    COLUMNS = ('url', 'last_fetch', 'last_change', 'etag', 'last_modified', 'raw_hash',
+               'extracted_hash', 'recrawl_interval', 'fetch_count', 'change_count', 'links')
+
+    def __init__(self, db_file='crawl_state.db'):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the URL state table"""
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS url_state (
+                    url TEXT PRIMARY KEY,
+                    last_fetch REAL NOT NULL,
+                    last_change REAL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    raw_hash TEXT,
+                    extracted_hash TEXT,
+                    recrawl_interval REAL NOT NULL,
+                    fetch_count INTEGER NOT NULL DEFAULT 0,
+                    change_count INTEGER NOT NULL DEFAULT 0,
+                    links TEXT
+                )
+            ''')
+            self.conn.commit()
+
+    def get_state(self, url):
+        """Get the stored state of a URL, or None if it was never fetched"""
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM url_state WHERE url = ?", (url,)
+            ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def is_due(self, state, lastmod=None):
+        """Check if a URL should be fetched again"""
+        if state is None:
+            return True
+        if lastmod is not None:
+            # The sitemap tells us directly whether the page changed
+            return lastmod > state['last_fetch']
+        return time.time() >= state['last_fetch'] + self.clamp_interval(state['recrawl_interval'])
+
+    def conditional_headers(self, state):
+        """Build If-None-Match / If-Modified-Since headers from stored validators"""
+        headers = {}
+        if state:
+            if state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
+    def stored_links(self, state):
+        """Get the links recorded at the last full extraction of a page"""
+        if not state or not state['links']:
+            return []
+        return state['links'].split('\n')
+
+    def record_fetch(self, url, state, changed, headers=None, raw_hash=None,
+                     extracted_hash=None, links=None):
+        """
+        Record the outcome of fetching a URL and adapt its recrawl interval.
+
+        Args:
+            url (str): The fetched URL
+            state (dict): The state returned by get_state before the fetch
+            changed (bool): Whether the extracted content changed
+            headers (Mapping): Response headers carrying new validators
+            raw_hash (str): Hash of the raw body
+            extracted_hash (str): Hash of the extracted content
+            links (list): Links found on the page
+        """
+        now = time.time()
+        if state is None:
+            state = {
+                'url': url, 'last_change': now, 'etag': None, 'last_modified': None,
+                'raw_hash': None, 'extracted_hash': None, 'links': None,
+                'recrawl_interval': config.RECRAWL_MIN_INTERVAL,
+                'fetch_count': 0, 'change_count': 0
+            }
+        elif changed:
+            state['recrawl_interval'] = self.clamp_interval(state['recrawl_interval'] / 2)
+            state['last_change'] = now
+            state['change_count'] += 1
+        else:
+            state['recrawl_interval'] = self.clamp_interval(state['recrawl_interval'] * 1.5)
+
+        state['last_fetch'] = now
+        state['fetch_count'] += 1
+        if headers is not None:
+            state['etag'] = headers.get('ETag')
+            state['last_modified'] = headers.get('Last-Modified')
+        if raw_hash is not None:
+            state['raw_hash'] = raw_hash
+        if extracted_hash is not None:
+            state['extracted_hash'] = extracted_hash
+        if links is not None:
+            state['links'] = '\n'.join(links)
+
+        with self.lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO url_state ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                tuple(state[column] for column in self.COLUMNS)
+            )
+            self.conn.commit()
+
+    def merge(self, db_file, predicate=None):
+        """
+        Copy the URL states of another crawl state database into this one.
+
+        Args:
+            db_file (str): Crawl state database to read
+            predicate (callable): Optional filter; only URLs it accepts are copied
+
+        Returns:
+            int: Number of URL states copied
+        """
+        columns = ', '.join(self.COLUMNS)
+        where = ''
+        with self.lock:
+            if predicate is not None:
+                self.conn.create_function('keep_url', 1, lambda url: bool(predicate(url)),
+                                          deterministic=True)
+                where = 'WHERE keep_url(url)'
+            self.conn.execute('ATTACH DATABASE ? AS other', (db_file,))
+            try:
+                cursor = self.conn.execute(
+                    f"INSERT OR REPLACE INTO url_state ({columns}) "
+                    f"SELECT {columns} FROM other.url_state {where}"
+                )
+                self.conn.commit()
+                return cursor.rowcount
+            finally:
+                self.conn.execute('DETACH DATABASE other')
+
+    @staticmethod
+    def clamp_interval(interval):
+        """Keep a recrawl interval within the configured bounds"""
+        return min(config.RECRAWL_MAX_INTERVAL, max(config.RECRAWL_MIN_INTERVAL, interval))
+
+    @staticmethod
+    def hash_content(content):
+        """Hash raw bytes, extracted text, or extracted text streamed as pieces"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if isinstance(content, bytes):
+            return sha1(content).hexdigest()
+        digest = sha1()
+        for piece in content:
+            digest.update(piece.encode('utf-8'))
+        return digest.hexdigest()
+
+    def close(self):
+        """Close database connection"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
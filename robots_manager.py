@@ -0,0 +1,170 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+import config
+
+class RobotsRules:
+    def __init__(self, rules=None, crawl_delay=None, sitemaps=None):
+        self.crawl_delay = crawl_delay
+        self.sitemaps = sitemaps or []
+        self.allows = []
+        self.matcher = self.compile_rules(rules or [])
+
+    def compile_rules(self, rules):
+        """Compile allow/disallow rules into one regex ordered by precedence
+
+        The most specific (longest) rule wins and Allow wins ties, so the
+        alternatives are sorted that way and the first one to match decides.
+        """
+        rules = sorted(rules, key=lambda rule: (-len(rule[0]), not rule[1]))
+        if not rules:
+            return None
+
+        alternatives = []
+        for index, (pattern, allow) in enumerate(rules):
+            anchored = pattern.endswith('$')
+            if anchored:
+                pattern = pattern[:-1]
+            regex = re.escape(pattern).replace(r'\*', '.*')
+            if anchored:
+                regex += r'\Z'
+            alternatives.append(f"(?P<r{index}>{regex})")
+            self.allows.append(allow)
+        return re.compile('|'.join(alternatives), re.DOTALL)
+
+    def can_fetch(self, url):
+        """Check if the rules allow fetching a URL"""
+        if self.matcher is None:
+            return True
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        match = self.matcher.match(path)
+        if match is None:
+            return True
+        return self.allows[int(match.lastgroup[1:])]
+
+    @classmethod
+    def parse(cls, text, user_agent):
+        """Parse robots.txt content for the group matching a user agent"""
+        agent_token = user_agent.lower()
+        groups = []
+        sitemaps = []
+        current = None
+        last_was_agent = False
+
+        for line in text.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = line.split(':', 1)
+            field = field.strip().lower()
+            value = value.strip()
+
+            if field == 'user-agent':
+                if current is None or not last_was_agent:
+                    current = {'agents': [], 'rules': [], 'crawl_delay': None}
+                    groups.append(current)
+                current['agents'].append(value.lower())
+                last_was_agent = True
+                continue
+
+            last_was_agent = False
+            if field == 'sitemap':
+                if value:
+                    sitemaps.append(value)
+            elif current is None:
+                continue
+            elif field in ('allow', 'disallow'):
+                if value:
+                    current['rules'].append((value, field == 'allow'))
+            elif field == 'crawl-delay':
+                try:
+                    current['crawl_delay'] = float(value)
+                except ValueError:
+                    pass
+
+        # Prefer the most specific agent name, falling back to the wildcard group
+        best_group = None
+        best_length = -1
+        for group in groups:
+            for agent in group['agents']:
+                if agent == '*':
+                    length = 0
+                elif agent in agent_token:
+                    length = len(agent)
+                else:
+                    continue
+                if length > best_length:
+                    best_group, best_length = group, length
+
+        if best_group is None:
+            return cls(sitemaps=sitemaps)
+        return cls(best_group['rules'], best_group['crawl_delay'], sitemaps)
+
+    @classmethod
+    def allow_all(cls):
+        return cls()
+
+    @classmethod
+    def disallow_all(cls):
+        return cls([('/', False)])
+
+class RobotsManager:
+    def __init__(self, session, user_agent=None, ttl=None):
+        self.session = session
+        self.user_agent = user_agent or config.ROBOTS_USER_AGENT
+        self.ttl = config.ROBOTS_CACHE_TTL if ttl is None else ttl
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def get_rules(self, url):
+        """Get the cached rules for a URL's host, fetching robots.txt if needed"""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+
+        with self.lock:
+            entry = self.cache.get(origin)
+        if entry and entry[0] > time.time():
+            return entry[1]
+
+        rules, ttl = self.fetch_rules(origin)
+        with self.lock:
+            self.cache[origin] = (time.time() + ttl, rules)
+        return rules
+
+    def fetch_rules(self, origin):
+        """Download and parse robots.txt, returning the rules and their TTL"""
+        try:
+            response = self.session.get(f"{origin}/robots.txt", timeout=config.REQUEST_TIMEOUT)
+        except requests.exceptions.RequestException:
+            return RobotsRules.disallow_all(), config.ROBOTS_ERROR_TTL
+
+        if response.status_code >= 500:
+            # Server errors mean the site is unavailable, not unrestricted
+            return RobotsRules.disallow_all(), config.ROBOTS_ERROR_TTL
+        if response.status_code >= 400:
+            return RobotsRules.allow_all(), self.ttl
+
+        text = response.text[:config.ROBOTS_MAX_SIZE]
+        return RobotsRules.parse(text, self.user_agent), self.ttl
+
+    def can_fetch(self, url):
+        """Check if robots.txt allows fetching a URL"""
+        return self.get_rules(url).can_fetch(url)
+
+    def crawl_delay(self, url):
+        """Get the Crawl-delay requested for a URL's host, if any"""
+        return self.get_rules(url).crawl_delay
+
+    def sitemaps(self, url):
+        """Get the sitemap URLs listed in a host's robots.txt"""
+        return self.get_rules(url).sitemaps
+
+    def clear(self):
+        """Drop every cached robots.txt"""
+        with self.lock:
+            self.cache.clear()
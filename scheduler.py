@@ -1,82 +1,315 @@
-import time
+import heapq
+import itertools
+import random
+import sqlite3
 import threading
-from datetime import datetime, timedelta
-from .config_manager import ConfigManager
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from error_log import log_error
+
+class ScheduleStore:
+    def __init__(self, db_file='schedules.db'):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the schedule state table"""
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS schedules (
+                    url TEXT PRIMARY KEY,
+                    interval REAL NOT NULL,
+                    next_run REAL NOT NULL,
+                    enabled INTEGER NOT NULL DEFAULT 1,
+                    jitter REAL NOT NULL DEFAULT 0,
+                    missed_policy TEXT NOT NULL DEFAULT 'run_once',
+                    last_run REAL,
+                    last_status TEXT
+                )
+            ''')
+            self.conn.commit()
+
+    def load(self):
+        """Load every stored schedule"""
+        with self.lock:
+            cursor = self.conn.execute('''
+                SELECT url, interval, next_run, enabled, jitter, missed_policy, last_run, last_status
+                FROM schedules
+            ''')
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+        schedules = [dict(zip(columns, row)) for row in rows]
+        for schedule in schedules:
+            schedule['enabled'] = bool(schedule['enabled'])
+        return schedules
+
+    def save(self, schedule):
+        """Insert or replace one schedule"""
+        with self.lock:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO schedules
+                (url, interval, next_run, enabled, jitter, missed_policy, last_run, last_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (schedule['url'], schedule['interval'], schedule['next_run'],
+                  int(schedule['enabled']), schedule['jitter'], schedule['missed_policy'],
+                  schedule.get('last_run'), schedule.get('last_status')))
+            self.conn.commit()
+
+    def update(self, url, **fields):
+        """Update some columns of one schedule"""
+        if not fields:
+            return
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.conn.execute(
+                f"UPDATE schedules SET {assignments} WHERE url = ?",
+                (*fields.values(), url)
+            )
+            self.conn.commit()
+
+    def delete(self, url):
+        """Delete one schedule"""
+        with self.lock:
+            self.conn.execute('DELETE FROM schedules WHERE url = ?', (url,))
+            self.conn.commit()
+
+    def close(self):
+        """Close database connection"""
+        self.conn.close()
 
 class Scheduler:
-    def __init__(self, config_manager):
+    """
+    Runs scraping jobs at fixed intervals.
+
+    Deadlines are kept in a heap and the scheduler thread sleeps until the
+    earliest one (or until a schedule changes), so idle cost does not grow
+    with the number of schedules. Due jobs run on a bounded worker pool; a
+    job that is still running when it comes due again is skipped rather than
+    started twice. Each run's state is written to its own row in the
+    schedule store instead of rewriting the JSON config.
+
+    Missed-run policies, applied when a deadline is older than the misfire
+    grace period (e.g. after a restart):
+        run_once: run once now, then continue from the current time
+        skip: do not run, wait for the next future slot
+    """
+
+    def __init__(self, config_manager, db_file='schedules.db', max_workers=4,
+                 misfire_grace=60, default_missed_policy='run_once'):
         self.config_manager = config_manager
-        self.schedules = config_manager.get_setting('schedules', [])
+        self.store = ScheduleStore(db_file)
+        self.max_workers = max_workers
+        self.misfire_grace = misfire_grace
+        self.default_missed_policy = default_missed_policy
+        self.schedules = {s['url']: s for s in self.store.load()}
+        self.heap = []
+        self.generations = {}
+        self.running_jobs = set()
         self.running = False
         self.thread = None
+        self.executor = None
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        self._migrate_config_schedules()
+        for schedule in self.schedules.values():
+            self._push(schedule)
 
-    def add_schedule(self, url, interval, start_time=None):
-        """Add a new scraping schedule"""
+    def add_schedule(self, url, interval, start_time=None, jitter=0, missed_policy=None):
+        """Add a new scraping schedule; interval is in seconds and must be positive"""
+        if float(interval) <= 0:
+            raise ValueError(f"Schedule interval must be positive, got {interval!r}")
+        if isinstance(start_time, datetime):
+            start_time = start_time.timestamp()
         schedule = {
             'url': url,
-            'interval': interval,
-            'next_run': start_time or datetime.now(),
-            'enabled': True
+            'interval': float(interval),
+            'next_run': start_time or time.time(),
+            'enabled': True,
+            'jitter': float(jitter),
+            'missed_policy': missed_policy or self.default_missed_policy,
+            'last_run': None,
+            'last_status': None
         }
-        self.schedules.append(schedule)
-        self.config_manager.update_setting('schedules', self.schedules)
+        with self._condition:
+            self.schedules[url] = schedule
+            self.store.save(schedule)
+            self._push(schedule)
+            self._condition.notify()
 
     def remove_schedule(self, url):
         """Remove a schedule by URL"""
-        self.schedules = [s for s in self.schedules if s['url'] != url]
-        self.config_manager.update_setting('schedules', self.schedules)
+        with self._condition:
+            if self.schedules.pop(url, None) is not None:
+                self.generations[url] = self.generations.get(url, 0) + 1
+                self.store.delete(url)
+                self._condition.notify()
 
     def start(self, callback):
         """Start the scheduler"""
         if self.running:
             return
-            
+
         self.running = True
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         self.thread = threading.Thread(target=self._run_scheduler, args=(callback,))
         self.thread.daemon = True
         self.thread.start()
 
-    def stop(self):
+    def stop(self, wait=True):
         """Stop the scheduler"""
-        self.running = False
+        with self._condition:
+            self.running = False
+            self._condition.notify()
         if self.thread:
             self.thread.join()
+        if self.executor:
+            self.executor.shutdown(wait=wait)
 
     def _run_scheduler(self, callback):
-        """Main scheduler loop"""
-        while self.running:
-            now = datetime.now()
-            for schedule in self.schedules:
-                if schedule['enabled'] and now >= schedule['next_run']:
-                    try:
-                        callback(schedule['url'])
-                    except Exception as e:
-                        print(f"Error executing schedule: {e}")
-                    finally:
-                        schedule['next_run'] = now + timedelta(seconds=schedule['interval'])
-                        self.config_manager.update_setting('schedules', self.schedules)
-            
-            time.sleep(1)
+        """Main scheduler loop: sleep until the next deadline, then dispatch"""
+        with self._condition:
+            while self.running:
+                if not self.heap:
+                    self._condition.wait()
+                    continue
+
+                run_at, _, url, generation = self.heap[0]
+                now = time.time()
+                if run_at > now:
+                    self._condition.wait(run_at - now)
+                    continue
+
+                heapq.heappop(self.heap)
+                schedule = self.schedules.get(url)
+                if schedule is None or generation != self.generations.get(url):
+                    continue  # removed or rescheduled since it was queued
+                try:
+                    self._dispatch(schedule, callback, now, run_at)
+                except Exception as e:
+                    # One bad schedule or a store error must not stop the others
+                    log_error(f"Could not dispatch schedule: {e}", url=url, stage='schedule', error=e)
+
+    def _dispatch(self, schedule, callback, now, run_at):
+        """
+        Start a due schedule on the worker pool and queue its next run.
+
+        run_at is the jittered deadline of the heap entry; lateness is
+        measured against it, while the grid stays on the un-jittered
+        next_run.
+        """
+        url = schedule['url']
+        due = schedule['next_run']
+        missed = now - run_at > self.misfire_grace
+
+        # Next slot on the fixed-rate grid that lies in the future
+        interval = schedule['interval']
+        next_run = due + interval
+        if next_run <= now:
+            next_run += interval * ((now - next_run) // interval + 1)
+        if missed and schedule['missed_policy'] == 'run_once':
+            next_run = now + interval
+
+        schedule['next_run'] = next_run
+        self._push(schedule)
+
+        if missed and schedule['missed_policy'] == 'skip':
+            self.store.update(url, next_run=next_run, last_status='missed')
+        elif url in self.running_jobs:
+            self.store.update(url, next_run=next_run, last_status='skipped: still running')
+        else:
+            self.running_jobs.add(url)
+            self.store.update(url, next_run=next_run)
+            self.executor.submit(self._run_job, url, callback)
+
+    def _run_job(self, url, callback):
+        """Run one job on a worker thread and record its outcome"""
+        started = time.time()
+        try:
+            callback(url)
+            status = 'ok'
+        except Exception as e:
+            log_error(f"Scheduled scrape failed: {e}", url=url, stage='schedule', error=e)
+            status = f"error: {e}"
+        finally:
+            with self._condition:
+                self.running_jobs.discard(url)
+                if url in self.schedules:
+                    self.schedules[url]['last_run'] = started
+                    self.schedules[url]['last_status'] = status
+        if url in self.schedules:
+            self.store.update(url, last_run=started, last_status=status)
+
+    def _push(self, schedule):
+        """Queue a schedule's next run, invalidating any older heap entry"""
+        url = schedule['url']
+        generation = self.generations.get(url, 0) + 1
+        self.generations[url] = generation
+        if not schedule['enabled']:
+            return
+        run_at = schedule['next_run']
+        if schedule['jitter']:
+            run_at += random.uniform(0, schedule['jitter'])
+        heapq.heappush(self.heap, (run_at, next(self._sequence), url, generation))
+
+    def _migrate_config_schedules(self):
+        """Move schedules stored in the JSON config into the schedule store"""
+        legacy = self.config_manager.get_setting('schedules', [])
+        if not legacy:
+            return
+        for entry in legacy:
+            if entry['url'] in self.schedules:
+                continue
+            if float(entry['interval']) <= 0:
+                log_error(f"Skipped schedule with interval {entry['interval']!r}",
+                          url=entry['url'], stage='schedule')
+                continue
+            next_run = entry.get('next_run')
+            if isinstance(next_run, str):
+                next_run = datetime.fromisoformat(next_run).timestamp()
+            elif isinstance(next_run, datetime):
+                next_run = next_run.timestamp()
+            schedule = {
+                'url': entry['url'],
+                'interval': float(entry['interval']),
+                'next_run': next_run or time.time(),
+                'enabled': entry.get('enabled', True),
+                'jitter': 0.0,
+                'missed_policy': self.default_missed_policy,
+                'last_run': None,
+                'last_status': None
+            }
+            self.schedules[schedule['url']] = schedule
+            self.store.save(schedule)
+        self.config_manager.update_setting('schedules', [])
 
     def get_upcoming_schedules(self):
         """Get list of upcoming schedules"""
-        now = datetime.now()
+        now = time.time()
         upcoming = []
-        for schedule in self.schedules:
-            if schedule['enabled']:
-                time_until = (schedule['next_run'] - now).total_seconds()
-                if time_until > 0:
-                    upcoming.append({
-                        'url': schedule['url'],
-                        'time_until': time_until
-                    })
+        with self._condition:
+            for schedule in self.schedules.values():
+                if schedule['enabled']:
+                    time_until = schedule['next_run'] - now
+                    if time_until > 0:
+                        upcoming.append({
+                            'url': schedule['url'],
+                            'time_until': time_until
+                        })
         return sorted(upcoming, key=lambda x: x['time_until'])
 
     def enable_schedule(self, url, enabled=True):
         """Enable or disable a schedule"""
-        for schedule in self.schedules:
-            if schedule['url'] == url:
-                schedule['enabled'] = enabled
-                self.config_manager.update_setting('schedules', self.schedules)
-                return True
-        return False
\ No newline at end of file
+        with self._condition:
+            schedule = self.schedules.get(url)
+            if schedule is None:
+                return False
+            schedule['enabled'] = enabled
+            if enabled and schedule['next_run'] < time.time():
+                schedule['next_run'] = time.time()
+            self._push(schedule)
+            self.store.update(url, enabled=int(enabled), next_run=schedule['next_run'])
+            self._condition.notify()
+            return True
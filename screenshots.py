@@ -0,0 +1,279 @@
+"""
+Page screenshots with headless Chrome.
+
+Browsers are kept in a bounded pool instead of starting Chrome for every
+page: a capture checks one out and returns it, so at most SCREENSHOT_BROWSERS
+Chrome processes run however many threads or leases come and go, and
+close() quits them all. Chrome encodes the capture itself in
+SCREENSHOT_FORMAT (WebP, JPEG or PNG) through the DevTools protocol, so the
+bytes are written as they arrive; only drivers without DevTools fall back to
+a PNG that is transcoded once in a worker process. With SCREENSHOT_DEDUP a
+256-bit perceptual hash (dHash) of each capture picks the host's stored
+screenshots that look alike, and a capture that matches one of them almost
+pixel for pixel (a re-rendered page, a changed clock) reuses the stored file
+instead of writing a new one. Pages sharing a template but not their text
+are kept apart.
+"""
+import base64
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from PIL import Image, ImageChops
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+import config
+
+EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+PIL_FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+PIXEL_TOLERANCE = 32  # grey levels two captures of the same pixel may differ by after lossy encoding
+MAX_CONFIRMATIONS = 3  # nearest hash candidates compared pixel by pixel
+
+_chrome_options = None
+_drivers = []  # every running browser
+_idle = []  # running browsers not checked out
+_slots = None
+_lock = threading.Lock()
+_pool = None
+_index = {}
+stats = dict.fromkeys(('captured', 'stored', 'deduplicated', 'failed', 'bytes'), 0)
+
+def chrome_options():
+    """Selenium options for headless Chrome, built once"""
+    global _chrome_options
+    if _chrome_options is None:
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        _chrome_options = options
+    return _chrome_options
+
+def get_slots():
+    """Semaphore bounding the browsers checked out at once"""
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(config.SCREENSHOT_BROWSERS or config.MAX_WORKERS)
+        return _slots
+
+@contextmanager
+def browser():
+    """
+    Check a browser out of the pool, starting one if none is idle.
+
+    Waits while SCREENSHOT_BROWSERS are checked out. A browser that raised
+    a WebDriverException is quit instead of being returned.
+    """
+    slots = get_slots()
+    slots.acquire()
+    driver = None
+    try:
+        with _lock:
+            if _idle:
+                driver = _idle.pop()
+        if driver is None:
+            driver = webdriver.Chrome(options=chrome_options())
+            with _lock:
+                _drivers.append(driver)
+        yield driver
+    except WebDriverException:
+        discard_driver(driver)
+        raise
+    finally:
+        with _lock:
+            # Not returned if it was discarded, or quit by close() meanwhile
+            if driver is not None and driver in _drivers:
+                _idle.append(driver)
+        slots.release()
+
+def discard_driver(driver):
+    """Quit a browser after an error; the next capture starts a new one"""
+    if driver is None:
+        return
+    with _lock:
+        if driver in _drivers:
+            _drivers.remove(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # Spawned, not forked: the crawl process is full of threads
+            _pool = ProcessPoolExecutor(max_workers=config.SCREENSHOT_PROCESSES,
+                                        mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+def count(name, amount=1):
+    with _lock:
+        stats[name] += amount
+
+def close():
+    """Quit every browser and stop the worker processes; returns the stats"""
+    global _pool, _slots
+    with _lock:
+        drivers, _drivers[:], _idle[:] = list(_drivers), [], []
+        pool, _pool = _pool, None
+        _slots = None
+        _index.clear()
+        result = dict(stats)
+        stats.update(dict.fromkeys(stats, 0))
+    for driver in drivers:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    if pool is not None:
+        pool.shutdown()
+    return result
+
+def capture(driver, image_format, quality, full_page):
+    """
+    Capture the current page.
+
+    Returns:
+        tuple: (image bytes, format of the bytes)
+    """
+    if hasattr(driver, 'execute_cdp_cmd'):
+        params = {'format': image_format, 'captureBeyondViewport': full_page}
+        if image_format != 'png':
+            params['quality'] = quality
+        if full_page:
+            size = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})['cssContentSize']
+            params['clip'] = {'x': 0, 'y': 0, 'width': size['width'], 'scale': 1,
+                              'height': min(size['height'], config.SCREENSHOT_MAX_HEIGHT)}
+        result = driver.execute_cdp_cmd('Page.captureScreenshot', params)
+        return base64.b64decode(result['data']), image_format
+    return driver.get_screenshot_as_png(), 'png'
+
+def dhash(image, size=16):
+    """Difference hash of size * size bits: brightness gradients of a (size + 1) x size thumbnail"""
+    pixels = list(image.convert('L').resize((size + 1, size), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(size):
+        for column in range(size):
+            left = pixels[row * (size + 1) + column]
+            value = (value << 1) | (left > pixels[row * (size + 1) + column + 1])
+    return value
+
+def encode(data, source_format, target_format, quality, fingerprint):
+    """
+    Worker process: transcode a capture if needed and compute its perceptual hash.
+
+    Returns:
+        tuple: (bytes in target_format, or None when the capture already is
+            in it, so the image is not sent back; dHash or None)
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        if fingerprint and source_format == 'jpeg':
+            # Decoding at reduced scale is enough for a 17x16 hash
+            image.draft('L', (image.width // 8, image.height // 8))
+        value = dhash(image) if fingerprint else None
+        if source_format != target_format:
+            image = Image.open(io.BytesIO(data))
+            if target_format == 'jpeg' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            output = io.BytesIO()
+            image.save(output, PIL_FORMATS[target_format], quality=quality, method=4)
+            return output.getvalue(), value
+    return None, value
+
+def candidates(host, value):
+    """Stored screenshots of the host whose hash is within SCREENSHOT_DEDUP_DISTANCE bits, nearest first"""
+    with _lock:
+        entries = list(_index.get(host, ()))
+    near = sorted((bin(stored ^ value).count('1'), n, path) for n, (stored, path) in enumerate(entries))
+    return [path for distance, _, path in near if distance <= config.SCREENSHOT_DEDUP_DISTANCE]
+
+def remember(host, value, path):
+    """Add a stored screenshot to the host's index"""
+    with _lock:
+        _index.setdefault(host, []).append((value, path))
+
+def changed_fraction(data, path):
+    """Share of pixels more than PIXEL_TOLERANCE apart in a capture and a stored file (1.0 if sizes differ)"""
+    with Image.open(io.BytesIO(data)) as image, Image.open(path) as stored:
+        if image.size != stored.size:
+            return 1.0
+        difference = ImageChops.difference(image.convert('L'), stored.convert('L'))
+    histogram = difference.histogram()
+    return sum(histogram[PIXEL_TOLERANCE + 1:]) / (image.width * image.height)
+
+def find_duplicate(data, paths, max_changed):
+    """
+    Worker process: the first stored file the capture matches almost pixel for pixel.
+
+    The perceptual hash only picks the candidates: pages built on one
+    template hash alike even when their text differs, so a capture counts
+    as a duplicate only if at most max_changed of its pixels differ.
+    """
+    for path in paths:
+        try:
+            if changed_fraction(data, path) <= max_changed:
+                return path
+        except OSError:
+            continue
+    return None
+
+def take_screenshot(url, screenshot_path):
+    """
+    Take a screenshot of the webpage.
+
+    Args:
+        url (str): Page to capture
+        screenshot_path (str): Path of the file without extension; the
+            extension of SCREENSHOT_FORMAT is added
+
+    Returns:
+        str: Path of the stored screenshot, which is an earlier file when the
+            page looks like one already captured, or None on failure
+    """
+    image_format = config.SCREENSHOT_FORMAT.lower()
+    try:
+        with browser() as driver:
+            driver.get(url)
+            time.sleep(config.SCREENSHOT_WAIT)  # Wait for late rendering
+            data, captured_format = capture(driver, image_format, config.SCREENSHOT_QUALITY,
+                                            config.SCREENSHOT_FULL_PAGE)
+    except Exception:
+        count('failed')
+        return None
+    count('captured')
+
+    try:
+        value = None
+        if config.SCREENSHOT_DEDUP or captured_format != image_format:
+            encoded, value = get_pool().submit(encode, data, captured_format, image_format,
+                                               config.SCREENSHOT_QUALITY, config.SCREENSHOT_DEDUP).result()
+            if encoded is not None:
+                data = encoded
+        host = urlparse(url).netloc
+        if value is not None:
+            paths = candidates(host, value)[:MAX_CONFIRMATIONS]
+            duplicate = paths and get_pool().submit(
+                find_duplicate, data, paths, config.SCREENSHOT_DEDUP_MAX_CHANGED).result()
+            if duplicate:
+                count('deduplicated')
+                return duplicate
+
+        path = screenshot_path + EXTENSIONS[image_format]
+        with open(path, 'wb') as f:
+            f.write(data)
+        if value is not None:
+            remember(host, value, path)
+        count('stored')
+        count('bytes', len(data))
+        return path
+    except Exception:
+        count('failed')
+        return None
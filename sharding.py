@@ -0,0 +1,420 @@
+"""
+Host-sharded crawling with several processes on one machine.
+
+main.main() hands the crawl to crawl() when more than one process is
+requested. Every host is owned by exactly one shard process, picked by a
+consistent hash of the host name, so politeness delays, robots.txt rules and
+the seen-set of a host stay inside its shard. Links to hosts owned by another
+shard are batched and handed over through that shard's inbox queue.
+
+A shared counter holds the number of URLs that are queued, in flight or in
+transit anywhere; the crawl is over once it drops to zero. Shards write their
+pages straight into the output directory (a URL belongs to one shard, so file
+names never collide) and keep their own crawl state database and error log,
+which are merged into the usual files when the crawl ends.
+"""
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue as queue_module
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import config
+import error_log
+from error_log import log_error
+from crawl_frontier import CrawlFrontier, CrawlTask
+from crawl_metrics import CrawlMetrics, merge_snapshots
+from recrawl_manager import RecrawlManager
+from url_filter import UrlFilter, normalize_url, scope_rules
+
+def host_hash(value):
+    """Stable 64-bit hash of a string, the same in every process"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+class HashRing:
+    """
+    Consistent hash ring mapping hosts to shards.
+
+    Each shard owns SHARD_VIRTUAL_NODES points on the ring and a host
+    belongs to the first point after its own hash, so hosts spread evenly
+    and changing the number of shards only moves a fraction of them.
+    """
+
+    def __init__(self, shards, replicas=None):
+        self.shards = shards
+        replicas = replicas or config.SHARD_VIRTUAL_NODES
+        points = sorted((host_hash(f"shard-{shard}-{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self.keys = [key for key, _ in points]
+        self.owners = [shard for _, shard in points]
+        self.cache = {}
+
+    def shard_for_host(self, host):
+        shard = self.cache.get(host)
+        if shard is None:
+            index = bisect.bisect(self.keys, host_hash(host)) % len(self.keys)
+            shard = self.cache[host] = self.owners[index]
+        return shard
+
+    def shard_for_url(self, url):
+        return self.shard_for_host(urlparse(url).netloc)
+
+def adjust(counter, amount):
+    """Add to a shared multiprocessing counter"""
+    with counter.get_lock():
+        counter.value += amount
+
+class HandoffRouter:
+    """
+    Collects (url, depth, lastmod) entries per destination shard and puts
+    them on that shard's inbox in batches of SHARD_HANDOFF_BATCH. Every entry
+    is counted as outstanding from the moment it is added.
+    """
+
+    def __init__(self, ring, inboxes, outstanding):
+        self.ring = ring
+        self.inboxes = inboxes
+        self.outstanding = outstanding
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def add(self, url, depth=0, lastmod=None):
+        shard = self.ring.shard_for_url(url)
+        adjust(self.outstanding, 1)
+        with self.lock:
+            batch = self.batches.setdefault(shard, [])
+            batch.append((url, depth, lastmod))
+            if len(batch) < config.SHARD_HANDOFF_BATCH:
+                return True
+            del self.batches[shard]
+        self.inboxes[shard].put(batch)
+        return True
+
+    def flush(self):
+        """Send every partial batch"""
+        with self.lock:
+            batches, self.batches = self.batches, {}
+        for shard, batch in batches.items():
+            self.inboxes[shard].put(batch)
+
+class ShardFrontier(CrawlFrontier):
+    """
+    Frontier of one shard.
+
+    URLs of hosts owned by other shards go to the router instead of the
+    local queues. Running out of local work does not end the crawl: workers
+    wait for links from other shards until close() is called.
+    """
+
+    def __init__(self, index, ring, router, outstanding, default_delay=None):
+        super().__init__(default_delay)
+        self.index = index
+        self.ring = ring
+        self.router = router
+        self.outstanding = outstanding
+
+    def add(self, url, depth=0, lastmod=None):
+        """Queue a local URL or hand a foreign one over; True only for new local URLs"""
+        if self.ring.shard_for_url(url) != self.index:
+            with self._condition:
+                if self.closed or url in self.seen:
+                    return False
+                # Remember handed-over URLs so each is sent at most once
+                self.seen.add(url)
+            self.router.add(url, depth, lastmod)
+            # Counted as discovered by the shard that owns it
+            return False
+        adjust(self.outstanding, 1)
+        if super().add(url, depth, lastmod):
+            return True
+        adjust(self.outstanding, -1)
+        return False
+
+    def accept(self, batch):
+        """Queue a batch handed over by another shard; returns how many URLs were new"""
+        added = 0
+        with self._condition:
+            for url, depth, lastmod in batch:
+                if url in self.seen:
+                    continue
+                self.seen.add(url)
+                self._enqueue(CrawlTask(url, depth, lastmod=lastmod))
+                added += 1
+            self._condition.notify_all()
+        if added < len(batch):
+            adjust(self.outstanding, added - len(batch))
+        return added
+
+    def get(self):
+        """Wait for the next task whose host may be fetched, or None once closed"""
+        with self._condition:
+            while True:
+                if self.closed:
+                    return None
+                now = time.monotonic()
+                self._promote_due_tasks(now)
+                if self.host_heap and self.host_heap[0][0] <= now:
+                    self.in_flight += 1
+                    return self._take_from_host(now)
+                deadlines = [entry[0] for entry in (self.host_heap[:1] + self.delayed[:1])]
+                self._condition.wait(max(0, min(deadlines) - now) if deadlines else None)
+
+    def task_done(self):
+        super().task_done()
+        adjust(self.outstanding, -1)
+
+def shard_path(path, index):
+    """Per-shard variant of a file name: crawl_state.db -> crawl_state.shard-0.db"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard-{index}{extension}"
+
+def remove_database(path):
+    """Delete a SQLite database together with its WAL files"""
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+def open_shard_state(index, ring):
+    """Per-shard crawl state, seeded with the shard's URLs from the main state file"""
+    path = shard_path(config.CRAWL_STATE_FILE, index)
+    remove_database(path)
+    manager = RecrawlManager(path)
+    if os.path.exists(config.CRAWL_STATE_FILE):
+        manager.merge(config.CRAWL_STATE_FILE, lambda url: ring.shard_for_url(url) == index)
+    return manager
+
+def receive(frontier, inbox, done, metrics):
+    """Handoff thread of a shard: queue incoming links and send outgoing batches"""
+    while not done.is_set():
+        try:
+            batch = inbox.get(timeout=config.SHARD_HANDOFF_INTERVAL)
+        except queue_module.Empty:
+            batch = None
+        if batch:
+            metrics.count('discovered', frontier.accept(batch))
+        frontier.router.flush()
+    frontier.close()
+
+def run_shard(index, shards, inboxes, status, outstanding, done, start_url,
+              incremental=False, profile=None, forward=False, settings=None):
+    """
+    Process target: crawl the hosts one shard owns until the crawl is done.
+
+    Args:
+        index (int): Shard number
+        shards (int): Number of shards
+        inboxes (list): Inbox queue of every shard
+        status (Queue): Metrics snapshots, GUI messages and the final report
+            for the parent process
+        outstanding (Value): URLs queued, in flight or in transit in any shard
+        done (Event): Set by the parent once nothing is outstanding
+        start_url (str): URL the crawl started from, for link scoping
+        incremental (bool): Skip unchanged pages using the crawl state
+        profile (float): Profile the shard for this many seconds
+        forward (bool): Send page and error messages to the parent's GUI queue
+        settings (dict): The parent's config values
+    """
+    vars(config).update(settings or {})
+    import main
+    import instrumentation
+    from profiler import CrawlProfiler
+    from robots_manager import RobotsManager
+
+    ring = HashRing(shards)
+    frontier = ShardFrontier(index, ring, HandoffRouter(ring, inboxes, outstanding), outstanding)
+    main.prepare_session()
+    main.metrics = metrics = CrawlMetrics(queue_depth=frontier.pending,
+                                          connections=main.connection_stats)
+    main.watch_new_hosts(frontier)
+    metrics.add_listener(lambda snapshot: status.put(('metrics', index, snapshot)))
+    robots = RobotsManager(main.get_session()) if config.RESPECT_ROBOTS else None
+    url_filter = UrlFilter(scope_rules(config.URL_FILTER_RULES, start_url))
+    gui_queue = status if forward else None
+
+    os.chdir(config.OUTPUT_DIR)
+    error_log.start(os.path.abspath(shard_path(config.ERROR_LOG_FILE, index)), gui_queue)
+    profiler = None
+    try:
+        if incremental:
+            main.recrawl_manager = open_shard_state(index, ring)
+        main.start_page_stages()
+        if config.INSTRUMENTATION_ENABLED:
+            instrumentation.enable()
+        if profile:
+            profiler = CrawlProfiler(os.path.abspath(shard_path(config.PROFILE_OUTPUT, index)),
+                                     duration=profile)
+            profiler.start()
+
+        metrics.start()
+        receiver = threading.Thread(target=receive, args=(frontier, inboxes[index], done, metrics),
+                                    daemon=True)
+        receiver.start()
+        try:
+            with ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
+                workers = [
+                    executor.submit(main.crawl_worker, frontier, start_url, gui_queue, robots, url_filter)
+                    for _ in range(config.MAX_WORKERS)
+                ]
+                for worker in workers:
+                    worker.result()
+            main.finish_page_stages()
+        finally:
+            frontier.close()
+            snapshot = metrics.stop()
+        receiver.join()
+
+        if instrumentation.enabled:
+            instrumentation.write_reports(shard_path(config.INSTRUMENTATION_OUTPUT, index))
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        # Stages draining after an error still log; stop the log only then
+        main.finish_page_stages(report=False)
+        error_log.stop()
+        if main.recrawl_manager is not None:
+            main.recrawl_manager.close()
+            main.recrawl_manager = None
+    status.put(('finished', index, snapshot, error_log.summary()))
+
+def merge_shard_files(shards, incremental):
+    """Fold the per-shard crawl state databases and error logs into the usual files"""
+    if incremental:
+        with RecrawlManager(config.CRAWL_STATE_FILE) as manager:
+            for index in range(shards):
+                path = shard_path(config.CRAWL_STATE_FILE, index)
+                if os.path.exists(path):
+                    manager.merge(path)
+                    remove_database(path)
+
+    logs = []
+    for index in range(shards):
+        path = shard_path(config.ERROR_LOG_FILE, index)
+        # Rotated files first, oldest first
+        logs += [f"{path}.{n}" for n in range(config.ERROR_LOG_BACKUPS, 0, -1)] + [path]
+    logs = [path for path in logs if os.path.exists(path)]
+    if logs:
+        with open(config.ERROR_LOG_FILE, 'ab') as target:
+            for path in logs:
+                with open(path, 'rb') as source:
+                    shutil.copyfileobj(source, target)
+                os.remove(path)
+
+def publish(snapshot, listeners):
+    for listener in listeners:
+        try:
+            listener(snapshot)
+        except Exception:
+            pass
+
+def crawl(start_url, queue=None, max_depth=1, use_sitemaps=None, since=None, incremental=None,
+          processes=None, profile=None):
+    """
+    Crawl with several shard processes.
+
+    Takes the same arguments as main.main(), plus the number of processes
+    (defaults to config.CRAWL_PROCESSES), and returns the same result. Stage
+    timings and profiles are written per shard.
+    """
+    import main
+    from tqdm import tqdm
+    from robots_manager import RobotsManager
+
+    processes = processes or config.CRAWL_PROCESSES
+    start_url = normalize_url(start_url)
+    config.MAX_DEPTH = max_depth
+    if use_sitemaps is None:
+        use_sitemaps = config.USE_SITEMAPS
+    if incremental is None:
+        incremental = config.INCREMENTAL_CRAWL
+
+    # Shards are spawned, not forked: the parent may run the GUI and logging threads
+    context = multiprocessing.get_context('spawn')
+    ring = HashRing(processes)
+    inboxes = [context.Queue() for _ in range(processes)]
+    status = context.Queue()
+    outstanding = context.Value('q', 0)
+    done = context.Event()
+
+    router = HandoffRouter(ring, inboxes, outstanding)
+    router.add(start_url, 0)
+    if use_sitemaps:
+        robots = RobotsManager(main.get_session()) if config.RESPECT_ROBOTS else None
+        url_filter = UrlFilter(scope_rules(config.URL_FILTER_RULES, start_url))
+        main.seed_from_sitemaps(router, start_url, robots, since, url_filter)
+    router.flush()
+
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    settings = {name: value for name, value in vars(config).items() if name.isupper()}
+    settings['OUTPUT_DIR'] = os.path.abspath(config.OUTPUT_DIR)
+    shards = [
+        context.Process(target=run_shard, name=f"crawl-shard-{index}", args=(
+            index, processes, inboxes, status, outstanding, done, start_url,
+            incremental, profile, queue is not None, settings))
+        for index in range(processes)
+    ]
+
+    original_dir = os.getcwd()
+    snapshots = [None] * processes
+    errors = [None] * processes
+    finished = set()
+    try:
+        os.chdir(config.OUTPUT_DIR)
+        error_log.start(os.path.abspath(config.ERROR_LOG_FILE), queue)
+        with tqdm(total=1, desc="Scraping Progress") as pbar:
+            listeners = [main.progress_bar_listener(pbar)]
+            if queue:
+                listeners.append(lambda snapshot: queue.put(("progress", snapshot)))
+            for shard in shards:
+                shard.start()
+            try:
+                last_publish = time.monotonic()
+                while len(finished) < processes:
+                    try:
+                        message = status.get(timeout=config.METRICS_INTERVAL)
+                    except queue_module.Empty:
+                        message = None
+                    if message is None:
+                        pass
+                    elif message[0] == 'metrics':
+                        snapshots[message[1]] = message[2]
+                    elif message[0] == 'finished':
+                        _, index, snapshots[index], errors[index] = message
+                        finished.add(index)
+                    elif queue is not None:
+                        queue.put(message)
+
+                    if not done.is_set() and outstanding.value == 0:
+                        done.set()
+                    for index, shard in enumerate(shards):
+                        if index not in finished and shard.exitcode not in (None, 0):
+                            # Its URLs can no longer be finished, so end the crawl
+                            log_error(f"Crawl process {index} exited with code {shard.exitcode}",
+                                      stage='shard')
+                            finished.add(index)
+                            done.set()
+                    if time.monotonic() - last_publish >= config.METRICS_INTERVAL:
+                        last_publish = time.monotonic()
+                        publish(merge_snapshots(snapshots), listeners)
+            finally:
+                done.set()
+                for shard in shards:
+                    shard.join(timeout=10)
+                    if shard.is_alive():
+                        shard.terminate()
+            snapshot = merge_snapshots(snapshots)
+            publish(snapshot, listeners)
+
+        error_log.stop()
+        merge_shard_files(processes, incremental)
+        main.print_summary(snapshot, error_log.merge_summaries([error_log.summary()] + errors))
+        return snapshot['success'] + snapshot['unchanged'] > 0
+
+    finally:
+        error_log.stop()
+        os.chdir(original_dir)
@@ -0,0 +1,103 @@
+import gzip
+import io
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+import config
+
+class SitemapParser:
+    def __init__(self, session, max_depth=3):
+        self.session = session
+        self.max_depth = max_depth
+
+    def iter_urls(self, sitemap_url, since=None):
+        """
+        Yield (url, lastmod) pairs from a sitemap or sitemap index.
+
+        Sitemaps are streamed and parsed incrementally, so gzipped files of any
+        size are handled in constant memory. Nested sitemap indexes are
+        followed up to max_depth levels.
+
+        Args:
+            sitemap_url (str): URL of the sitemap or sitemap index
+            since (float): Optional timestamp; entries with an older lastmod are skipped
+
+        Yields:
+            tuple: The page URL and its lastmod as a timestamp, or None
+        """
+        pending = [(sitemap_url, 0)]
+        visited = set()
+
+        while pending:
+            url, depth = pending.pop()
+            if url in visited or depth > self.max_depth:
+                continue
+            visited.add(url)
+
+            try:
+                response = self.session.get(url, timeout=config.REQUEST_TIMEOUT, stream=True)
+            except Exception:
+                continue
+            try:
+                if response.status_code != 200:
+                    continue
+                for kind, loc, lastmod in self.parse(self.open_stream(response)):
+                    if kind == 'sitemap':
+                        pending.append((loc, depth + 1))
+                    elif since is None or lastmod is None or lastmod > since:
+                        yield loc, lastmod
+            except ET.ParseError:
+                continue
+            finally:
+                response.close()
+
+    def open_stream(self, response):
+        """Wrap a streamed response body, transparently un-gzipping it"""
+        response.raw.decode_content = True
+        # Keep the raw stream readable through the buffer once the body is drained
+        response.raw.auto_close = False
+        stream = io.BufferedReader(response.raw)
+        if stream.peek(2)[:2] == b'\x1f\x8b':
+            return gzip.GzipFile(fileobj=stream)
+        return stream
+
+    def parse(self, stream):
+        """
+        Parse a sitemap document incrementally.
+
+        Yields ('url', loc, lastmod) for pages and ('sitemap', loc, lastmod) for
+        entries of a sitemap index. Parsed elements are discarded as soon as
+        they are read.
+        """
+        root = None
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+
+            tag = element.tag.rsplit('}', 1)[-1]
+            if tag not in ('url', 'sitemap'):
+                continue
+
+            loc = None
+            lastmod = None
+            for child in element:
+                child_tag = child.tag.rsplit('}', 1)[-1]
+                if child_tag == 'loc' and child.text:
+                    loc = child.text.strip()
+                elif child_tag == 'lastmod' and child.text:
+                    lastmod = parse_lastmod(child.text.strip())
+
+            if loc:
+                yield tag, loc, lastmod
+            root.clear()
+
+def parse_lastmod(value):
+    """Convert a W3C datetime string to a UTC timestamp"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
@@ -0,0 +1,341 @@
+"""
+Translation of saved pages, off the crawl path.
+
+scrape_page() hands the Markdown of a saved page to
+TranslationPipeline.submit() and moves on. The content is split into
+segments (a heading, list item or paragraph each, long paragraphs at
+sentence boundaries) while code blocks, tables, bare links and text without
+letters are kept as they are. Segments are identified by the hash of their
+text, so navigation, footers and other boilerplate shared by many pages is
+translated once per crawl, and every translation is cached persistently, so
+recrawled pages only send their new segments. New segments are grouped
+into batches for the backend, and once every segment of a page is resolved
+the translation is written next to the page as <name>.<target>.md.
+
+Backends are looked up by name in `backends`: 'googletrans' uses the
+googletrans package and 'http' posts batches to a LibreTranslate-compatible
+service (benchmarks/translation_stub.py serves one locally for testing).
+Other services are added with register_backend().
+"""
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from cache_manager import CacheManager
+from error_log import log_error
+
+FENCE = re.compile(r'^\s*(```|~~~)')
+PREFIX = re.compile(r'^(\s*(?:#{1,6}\s+|>\s*|[-*+]\s+|\d+[.)]\s+)*)(.*?)(\s*)$')
+LETTER = re.compile(r'[^\W\d_]')
+LINK_ONLY = re.compile(r'(?:!?\[[^\]]*\]\([^)]*\)\s*)+')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+backends = {}
+
+def register_backend(name, factory):
+    """
+    Make a translation service available as TRANSLATION_BACKEND = name.
+
+    The factory is called as factory(session) and returns an object with a
+    name attribute (part of the cache key) and a method
+    translate(texts, source, target) returning one translation per text.
+    """
+    backends[name] = factory
+
+def create_backend(name, session=None):
+    """Instantiate a registered backend; raises ImportError if its package is missing"""
+    try:
+        factory = backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown translation backend {name!r}; "
+                         f"available: {', '.join(sorted(backends))}") from None
+    return factory(session)
+
+class GoogleBackend:
+    """Google Translate through the googletrans package"""
+
+    name = 'googletrans'
+
+    def __init__(self, session=None):
+        import googletrans
+        self.googletrans = googletrans
+        self.local = threading.local()
+
+    def translate(self, texts, source, target):
+        # One client per worker thread; the package's client is not thread-safe
+        translator = getattr(self.local, 'translator', None)
+        if translator is None:
+            translator = self.local.translator = self.googletrans.Translator()
+        return [result.text for result in translator.translate(texts, src=source, dest=target)]
+
+class HttpBackend:
+    """A LibreTranslate-compatible service at TRANSLATION_URL"""
+
+    name = 'http'
+
+    def __init__(self, session=None):
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.url = config.TRANSLATION_URL
+
+    def translate(self, texts, source, target):
+        payload = {'q': texts, 'source': source, 'target': target, 'format': 'text'}
+        if config.TRANSLATION_API_KEY:
+            payload['api_key'] = config.TRANSLATION_API_KEY
+        response = self.session.post(self.url, json=payload, timeout=config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()['translatedText']
+
+register_backend('googletrans', GoogleBackend)
+register_backend('http', HttpBackend)
+
+def split_sentences(text, max_chars):
+    """Split a long paragraph into pieces of at most about max_chars at sentence ends"""
+    if len(text) <= max_chars:
+        return [text]
+    pieces = []
+    for sentence in SENTENCE_END.split(text):
+        if pieces and len(pieces[-1]) + len(sentence) < max_chars:
+            pieces[-1] += ' ' + sentence
+        else:
+            pieces.append(sentence)
+    return pieces
+
+def segment(markdown, max_chars=None):
+    """
+    Split Markdown into literal text and translatable segments.
+
+    Args:
+        markdown (str): Page content
+        max_chars (int): Longest segment; longer paragraphs are split at
+            sentence ends. Defaults to TRANSLATION_MAX_SEGMENT_CHARS
+
+    Returns:
+        list: One entry per line: a str kept as it is, or a tuple
+            (prefix, pieces, suffix) whose pieces are translated and joined
+            with spaces between the Markdown prefix and trailing whitespace
+    """
+    max_chars = max_chars or config.TRANSLATION_MAX_SEGMENT_CHARS
+    lines = []
+    in_code = False
+    for line in markdown.split('\n'):
+        if FENCE.match(line):
+            in_code = not in_code
+            lines.append(line)
+            continue
+        if in_code or line.lstrip().startswith('|'):
+            lines.append(line)
+            continue
+        prefix, text, suffix = PREFIX.match(line).groups()
+        if not LETTER.search(text) or LINK_ONLY.fullmatch(text):
+            lines.append(line)
+        else:
+            lines.append((prefix, split_sentences(text, max_chars), suffix))
+    return lines
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def translated_path(file_name, target):
+    """Path of a page's translation: page.md -> page.<target>.md"""
+    base, extension = os.path.splitext(file_name)
+    return f"{base}.{target}{extension}"
+
+class PageJob:
+    """The segments of one page and the translations resolved so far"""
+
+    __slots__ = ('url', 'file_name', 'lines', 'translations', 'remaining')
+
+    def __init__(self, url, file_name, lines, hashes):
+        self.url = url
+        self.file_name = file_name
+        self.lines = lines
+        self.translations = {}
+        self.remaining = len(hashes)
+
+class TranslationPipeline:
+    """
+    Segments, deduplicates and translates pages in the background.
+
+    Segments are deduplicated by the SHA-1 of their text: a segment already
+    translated in this crawl, or waiting for a batch, is never sent again,
+    and the cache keeps translations for TRANSLATION_CACHE_TTL. A batch that
+    fails leaves its segments untranslated; they are not cached, so the next
+    crawl tries them again.
+    """
+
+    def __init__(self, backend, cache_file=None, source=None, target=None):
+        self.backend = backend
+        self.source = source or config.TRANSLATION_SOURCE
+        self.target = target or config.TRANSLATION_TARGET
+        self.cache = CacheManager(cache_file or config.TRANSLATION_CACHE_FILE)
+        self.workers = ThreadPoolExecutor(max_workers=config.TRANSLATION_WORKERS,
+                                          thread_name_prefix='translation')
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.texts = {}
+        self.waiters = {}
+        self.jobs = 0
+        self.stats = dict.fromkeys(('pages', 'segments', 'unique', 'cached', 'translated',
+                                    'failed', 'requests', 'characters'), 0)
+        self.pending = queue.Queue()
+        self.batcher = threading.Thread(target=self._batch_loop, name='translation-batcher',
+                                        daemon=True)
+        self.batcher.start()
+
+    def submit(self, page_url, markdown, file_name):
+        """
+        Queue a saved page for translation; never blocks on I/O.
+
+        Args:
+            page_url (str): URL of the page
+            markdown (str): Content of the page
+            file_name (str): Markdown file of the page; the translation is
+                written to translated_path(file_name, target)
+        """
+        lines = segment(markdown)
+        segments = {text_hash(piece): piece
+                    for line in lines if isinstance(line, tuple) for piece in line[1]}
+        if not segments:
+            return
+        job = PageJob(page_url, file_name, lines, segments)
+        ready = []
+        with self.lock:
+            self.jobs += 1
+            self.stats['pages'] += 1
+            self.stats['segments'] += len(segments)
+            for key, text in segments.items():
+                if key in self.texts:
+                    ready.append((key, self.texts[key]))
+                elif key in self.waiters:
+                    self.waiters[key].append(job)
+                else:
+                    self.waiters[key] = [job]
+                    self.stats['unique'] += 1
+                    self.pending.put((key, text))
+        for key, translation in ready:
+            self._finish_segment(job, key, translation)
+
+    def close(self):
+        """Wait for every submitted page to be written and stop the workers"""
+        with self.lock:
+            while self.jobs:
+                self.idle.wait()
+        self.pending.put(None)
+        self.batcher.join()
+        self.workers.shutdown()
+        self.cache.close()
+        return dict(self.stats)
+
+    def cache_key(self, key):
+        return f"translation:{self.backend.name}:{self.source}:{self.target}:{key}"
+
+    def _batch_loop(self):
+        """Answer new segments from the cache and group the rest into batches"""
+        batch = []
+        characters = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self.pending.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # the batch waited long enough
+            if item:
+                cached = self._cached(item[0])
+                if cached is not None:
+                    self._resolved({item[0]: cached})
+                else:
+                    batch.append(item)
+                    characters += len(item[1])
+                    deadline = deadline or time.monotonic() + config.TRANSLATION_BATCH_WAIT
+            if batch and (not item or len(batch) >= config.TRANSLATION_BATCH_SIZE
+                          or characters >= config.TRANSLATION_BATCH_CHARS):
+                self.workers.submit(self._translate, batch)
+                batch, characters, deadline = [], 0, None
+            if item is None:
+                return
+
+    def _cached(self, key):
+        try:
+            cached = self.cache.get(self.cache_key(key))
+        except Exception as e:
+            log_error(f"Translation cache lookup failed: {e}", stage='translation', error=e)
+            return None
+        if cached is not None:
+            with self.lock:
+                self.stats['cached'] += 1
+        return cached
+
+    def _translate(self, batch):
+        """Worker thread: translate a batch, falling back to the original text on failure"""
+        texts = [text for _, text in batch]
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['characters'] += sum(len(text) for text in texts)
+        try:
+            translations = list(self.backend.translate(texts, self.source, self.target))
+            # A short answer would leave segments unresolved and close() waiting forever
+            if len(translations) != len(texts):
+                raise ValueError(f"expected {len(texts)} translations, got {len(translations)}")
+        except Exception as e:
+            log_error(f"Translation of {len(batch)} segments failed: {type(e).__name__}: {e}",
+                      stage='translation', error=e)
+            with self.lock:
+                self.stats['failed'] += len(batch)
+            self._resolved({key: text for key, text in batch})
+            return
+        results = {key: translation for (key, _), translation in zip(batch, translations)}
+        try:
+            for key, translation in results.items():
+                self.cache.set(self.cache_key(key), translation, config.TRANSLATION_CACHE_TTL)
+        except Exception as e:
+            log_error(f"Translation cache update failed: {e}", stage='translation', error=e)
+        with self.lock:
+            self.stats['translated'] += len(results)
+        self._resolved(results)
+
+    def _resolved(self, results):
+        """Record translations and hand them to every page waiting for them"""
+        finished = []
+        with self.lock:
+            for key, translation in results.items():
+                self.texts[key] = translation
+                finished += [(job, key, translation) for job in self.waiters.pop(key, [])]
+        for job, key, translation in finished:
+            self._finish_segment(job, key, translation)
+
+    def _finish_segment(self, job, key, translation):
+        with self.lock:
+            job.translations[key] = translation
+            job.remaining -= 1
+            if job.remaining:
+                return
+        try:
+            self._write(job)
+        finally:
+            with self.lock:
+                self.jobs -= 1
+                if not self.jobs:
+                    self.idle.notify_all()
+
+    def _write(self, job):
+        """Reassemble a page from its translated segments and save it"""
+        content = '\n'.join(
+            line if isinstance(line, str) else
+            line[0] + ' '.join(job.translations[text_hash(piece)] for piece in line[1]) + line[2]
+            for line in job.lines
+        )
+        file_name = translated_path(job.file_name, self.target)
+        try:
+            with open(file_name, 'w', encoding='utf-8') as f:
+                f.write(content)
+        except OSError as e:
+            log_error(f"Error saving translation of {job.url}: {e}", url=job.url,
+                      stage='translation', error=e)
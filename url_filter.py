@@ -0,0 +1,172 @@
+import re
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+# scheme, netloc, path and query of a lowercased absolute URL
+URL_PARTS = re.compile(r'([a-z][a-z0-9+.-]*)://([^/?#]*)([^?#]*)(?:\?([^#]*))?')
+
+class UrlFilter:
+    """
+    Compiled include/exclude rules deciding which URLs enter the frontier.
+
+    Rules is a dict with any of these keys:
+        schemes: allowed URL schemes (default http and https)
+        allowed_domains: hosts in scope, subdomains included (empty means any)
+        blocked_domains: hosts out of scope, subdomains included
+        include_paths / exclude_paths: path prefixes
+        include_patterns / exclude_patterns: regexes searched in the full URL
+        blocked_extensions: file extensions that are never fetched
+        blocked_query_params: query parameter names that mark a URL as a trap
+        max_query_params: maximum number of query parameters
+        max_url_length: maximum URL length
+        depth_limits: {regex: max depth} for URLs matching the regex
+
+    Domains are resolved with a label trie whose verdicts are cached per
+    host. Path prefixes and patterns are each folded into one regex, and
+    extensions and query parameters are set lookups, so most URLs cost one
+    split and a couple of regex calls. Matching is case-insensitive: the
+    URL is lowercased and patterns should be written in lowercase.
+    """
+
+    def __init__(self, rules=None):
+        rules = rules or {}
+        self.schemes = frozenset(s.lower() for s in rules.get('schemes', ['http', 'https']))
+        self.max_url_length = rules.get('max_url_length') or 0
+        self.max_query_params = rules.get('max_query_params') or 0
+        self.blocked_extensions = frozenset(
+            ext.lower().lstrip('.') for ext in rules.get('blocked_extensions', [])
+        )
+        self.blocked_query_params = frozenset(
+            name.lower() for name in rules.get('blocked_query_params', [])
+        )
+
+        self.domain_trie = {}
+        self.default_domain_verdict = not rules.get('allowed_domains')
+        for domain in rules.get('allowed_domains', []):
+            self.add_domain(domain, True)
+        for domain in rules.get('blocked_domains', []):
+            self.add_domain(domain, False)
+        self.host_verdicts = {}
+
+        self.exclude_paths = self.compile_prefixes(rules.get('exclude_paths', []))
+        self.include_paths = self.compile_prefixes(rules.get('include_paths', []))
+        self.exclude_patterns = self.compile_alternatives(rules.get('exclude_patterns', []))
+        self.include_patterns = self.compile_alternatives(rules.get('include_patterns', []))
+        self.has_includes = bool(self.include_paths or self.include_patterns)
+
+        self.depth_limits = []
+        depth_patterns = []
+        for index, (pattern, max_depth) in enumerate(rules.get('depth_limits', {}).items()):
+            depth_patterns.append(f"(?P<d{index}>{pattern})")
+            self.depth_limits.append(max_depth)
+        self.depth_matcher = re.compile('|'.join(depth_patterns)) if depth_patterns else None
+
+    def add_domain(self, domain, allowed):
+        """Store a domain verdict in the reversed-label trie"""
+        node = self.domain_trie
+        for label in reversed(domain.lower().strip('.').split('.')):
+            node = node.setdefault(label, {})
+        node[None] = allowed
+
+    def host_allowed(self, host):
+        """Resolve a host against the domain trie, most specific entry wins"""
+        verdict = self.host_verdicts.get(host)
+        if verdict is not None:
+            return verdict
+
+        verdict = self.default_domain_verdict
+        node = self.domain_trie
+        for label in reversed(host.rpartition('@')[2].split(':', 1)[0].split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            if None in node:
+                verdict = node[None]
+
+        if len(self.host_verdicts) < 100000:
+            self.host_verdicts[host] = verdict
+        return verdict
+
+    def check(self, url, depth=0):
+        """
+        Check a URL against the rules.
+
+        Returns:
+            str: The reason the URL was rejected, or None if it is in scope
+        """
+        if self.max_url_length and len(url) > self.max_url_length:
+            return 'url too long'
+
+        url = url.lower()
+        parts = URL_PARTS.match(url)
+        if parts is None:
+            return 'not an absolute url'
+        scheme, netloc, path, query = parts.groups()
+        if scheme not in self.schemes:
+            return 'scheme not allowed'
+        if not self.host_allowed(netloc):
+            return 'domain out of scope'
+
+        if self.blocked_extensions:
+            last_segment = path.rpartition('/')[2]
+            if '.' in last_segment and last_segment.rpartition('.')[2] in self.blocked_extensions:
+                return 'blocked extension'
+        if query:
+            if self.max_query_params and query.count('&') >= self.max_query_params:
+                return 'too many query parameters'
+            if self.blocked_query_params:
+                for param in query.split('&'):
+                    if param.partition('=')[0] in self.blocked_query_params:
+                        return 'blocked query parameter'
+
+        if self.exclude_paths is not None and self.exclude_paths.match(path):
+            return 'excluded path'
+        if self.exclude_patterns is not None and self.exclude_patterns.search(url):
+            return 'excluded pattern'
+        if self.has_includes and not (
+            (self.include_paths is not None and self.include_paths.match(path))
+            or (self.include_patterns is not None and self.include_patterns.search(url))
+        ):
+            return 'not included'
+
+        if self.depth_matcher is not None:
+            match = self.depth_matcher.search(url)
+            if match is not None and depth > self.depth_limits[int(match.lastgroup[1:])]:
+                return 'depth limit'
+        return None
+
+    def allows(self, url, depth=0):
+        """Check if a URL is in scope"""
+        return self.check(url, depth) is None
+
+    def filter_urls(self, urls, depth=0):
+        """Keep the URLs that are in scope, preserving order"""
+        check = self.check
+        return [url for url in urls if check(url, depth) is None]
+
+    @staticmethod
+    def compile_prefixes(prefixes):
+        if not prefixes:
+            return None
+        return re.compile('|'.join(re.escape(p.lower()) for p in prefixes))
+
+    @staticmethod
+    def compile_alternatives(patterns):
+        if not patterns:
+            return None
+        return re.compile('|'.join(f"(?:{p})" for p in patterns))
+
+def normalize_url(url):
+    """Drop the fragment and lowercase the scheme and host of a URL"""
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+
+def scope_rules(rules, start_url):
+    """Restrict a rule set to the start URL's domain if it names no domains"""
+    rules = dict(rules or {})
+    if not rules.get('allowed_domains'):
+        host = urlsplit(start_url).hostname or ''
+        if host.startswith('www.'):
+            host = host[4:]
+        rules['allowed_domains'] = [host]
+    return rules